@@ -2,6 +2,7 @@ import asyncio
 import uuid
 from abc import ABC, abstractmethod
 
+from brokers.broker_pool import BrokerPool
 from brokers.broker_proxy import Broker
 from dto.QueueMessage import QueueMessage
 from misc_utils.bot_logger import BotLogger
@@ -28,10 +29,14 @@ class RegistrationAwareAgent(ABC):
         # Initialize synchronization primitives
         self.execution_lock = asyncio.Lock()
         self.client_registered_event = asyncio.Event()
-        self.broker = Broker()
 
         self.logger.info(f"Initializing routine {self.agent} with id {self.id}")
 
+    @property
+    def broker(self):
+        # Con il pool di broker ogni configurazione opera sul proprio account; risolto ad ogni accesso perché il pool parte dopo le routine
+        return BrokerPool().for_configuration(self.trading_config) if BrokerPool().is_initialized else Broker()
+
     @exception_handler
     async def routine_start(self):
         self.logger.info(f"Starting routine {self.agent} with id {self.id}")
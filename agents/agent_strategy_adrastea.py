@@ -3,11 +3,13 @@ import asyncio
 from datetime import datetime
 from typing import Tuple, Optional
 
+import numpy as np
 import pandas as pd
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from pandas import Series
 
 from agents.agent_registration_aware import RegistrationAwareAgent
+from brokers.market_data_hub import MarketDataHub
 from csv_loggers.logger_candles import CandlesLogger
 from csv_loggers.logger_strategy_events import StrategyEventsLogger
 from dto.EconomicEvent import get_symbol_countries_of_interest, EconomicEvent
@@ -16,12 +18,12 @@ from dto.SymbolInfo import SymbolInfo
 from misc_utils.config import ConfigReader, TradingConfiguration
 from misc_utils.enums import Indicators, Timeframe, TradingDirection, RabbitExchange
 from misc_utils.error_handler import exception_handler
-from misc_utils.utils_functions import describe_candle, dt_to_unix, unix_to_datetime, round_to_point, to_serializable, extract_properties
+from misc_utils.utils_functions import describe_candle, dt_to_unix, unix_to_datetime, to_serializable, extract_properties
 from notifiers.notifier_economic_events import NotifierEconomicEvents
 from notifiers.notifier_tick_updates import NotifierTickUpdates
 from services.service_rabbitmq import RabbitMQService
 from strategies.base_strategy import SignalGeneratorAgent
-from strategies.indicators import supertrend, stochastic, average_true_range
+from strategies.indicators import heikin_ashi, IndicatorEngine, IncrementalATR, IncrementalStochastic, IncrementalSupertrend
 
 leverages = {
     "FOREX": [10, 30, 100],
@@ -75,6 +77,13 @@ class AdrasteaSignalGeneratorAgent(SignalGeneratorAgent, RegistrationAwareAgent)
         self.bootstrap_completed_event = asyncio.Event()
         self.live_candles_logger = CandlesLogger(trading_config.get_symbol(), trading_config.get_timeframe(), trading_config.get_trading_direction())
         self.countries_of_interest = []
+        # Indicatori incrementali: a ogni candela chiusa si elaborano solo le candele nuove
+        self.indicator_engine = IndicatorEngine() \
+            .add((supertrend_fast_key,), lambda: IncrementalSupertrend(super_trend_fast_period, super_trend_fast_multiplier)) \
+            .add((supertrend_slow_key,), lambda: IncrementalSupertrend(super_trend_slow_period, super_trend_slow_multiplier)) \
+            .add((stoch_k_key, stoch_d_key), lambda: IncrementalStochastic(stoch_k_period, stoch_d_period, stoch_smooth_k)) \
+            .add((ATR + '_5',), lambda: IncrementalATR(5)) \
+            .add((ATR + '_2',), lambda: IncrementalATR(2))
 
     @exception_handler
     async def start(self):
@@ -89,8 +98,10 @@ class AdrasteaSignalGeneratorAgent(SignalGeneratorAgent, RegistrationAwareAgent)
         await NotifierTickUpdates().register_observer(
             self.trading_config.timeframe,
             self.on_new_tick,
-            self.id
+            self.id,
+            self.trading_config.get_symbol()
         )
+        MarketDataHub().subscribe(self.id, self.trading_config.get_symbol(), self.trading_config.get_timeframe(), self.trading_config.get_account_id())
 
         asyncio.create_task(self.bootstrap())
 
@@ -109,6 +120,7 @@ class AdrasteaSignalGeneratorAgent(SignalGeneratorAgent, RegistrationAwareAgent)
             self.trading_config.timeframe,
             self.id
         )
+        MarketDataHub().unsubscribe(self.id, self.trading_config.get_symbol(), self.trading_config.get_timeframe(), self.trading_config.get_account_id())
 
     def get_minimum_frames_count(self):
         return max(super_trend_fast_period,
@@ -232,7 +244,7 @@ class AdrasteaSignalGeneratorAgent(SignalGeneratorAgent, RegistrationAwareAgent)
             try:
                 bootstrap_candles_logger = CandlesLogger(symbol, timeframe, trading_direction, custom_name='bootstrap')
 
-                candles = await self.broker.get_last_candles(self.trading_config.get_symbol(), self.trading_config.get_timeframe(), tot_candles_count)
+                candles = await MarketDataHub().get_candles(self.broker, symbol, timeframe, tot_candles_count, self.trading_config.get_account_id())
 
                 self.logger.info("Calculating indicators on historical candles.")
                 await self.calculate_indicators(candles)
@@ -240,14 +252,11 @@ class AdrasteaSignalGeneratorAgent(SignalGeneratorAgent, RegistrationAwareAgent)
                 first_index = self.heikin_ashi_candles_buffer + self.get_minimum_frames_count() - 1
                 last_index = tot_candles_count - 1
 
-                for i in range(first_index, last_index):
-                    self.logger.debug(f"Bootstrap frame {i + 1}, Candle data: {describe_candle(candles.iloc[i])}")
-
-                    bootstrap_candles_logger.add_candle(candles.iloc[i])
-                    self.should_enter, self.prev_state, self.cur_state, self.prev_condition_candle, self.cur_condition_candle = self.check_signals(
-                        rates=candles, i=i, trading_direction=trading_direction, state=self.cur_state,
-                        cur_condition_candle=self.cur_condition_candle
-                    )
+                bootstrap_candles_logger.add_candles(candles.iloc[first_index:last_index])
+                self.should_enter, self.prev_state, self.cur_state, self.prev_condition_candle, self.cur_condition_candle = self.replay_signals(
+                    rates=candles, first_index=first_index, last_index=last_index, trading_direction=trading_direction,
+                    state=self.cur_state, cur_condition_candle=self.cur_condition_candle
+                )
 
                 self.logger.info(f"Bootstrap complete - Initial State: {self.cur_state}")
 
@@ -293,7 +302,8 @@ class AdrasteaSignalGeneratorAgent(SignalGeneratorAgent, RegistrationAwareAgent)
 
             candles_count = self.heikin_ashi_candles_buffer + self.get_minimum_frames_count()
 
-            candles = await self.broker.get_last_candles(self.trading_config.get_symbol(), self.trading_config.get_timeframe(), candles_count)
+            # Fetched once per bar close for all the agents on the same symbol and timeframe, this agent gets its own frame on the shared candles
+            candles = await MarketDataHub().get_candles(self.broker, self.trading_config.get_symbol(), self.trading_config.get_timeframe(), candles_count, self.trading_config.get_account_id())
             await self.calculate_indicators(candles)
 
             last_candle = candles.iloc[-1]
@@ -342,12 +352,8 @@ class AdrasteaSignalGeneratorAgent(SignalGeneratorAgent, RegistrationAwareAgent)
         # Convert candlestick to Heikin Ashi
         await self.heikin_ashi_values(rates)
 
-        # Calculate indicators
-        supertrend(super_trend_fast_period, super_trend_fast_multiplier, rates)
-        supertrend(super_trend_slow_period, super_trend_slow_multiplier, rates)
-        stochastic(stoch_k_period, stoch_d_period, stoch_smooth_k, rates)
-        average_true_range(5, rates)
-        average_true_range(2, rates)
+        # Calculate indicators (same values of the supertrend, stochastic and average_true_range batch functions)
+        self.indicator_engine.apply(rates)
 
         return rates
 
@@ -360,28 +366,9 @@ class AdrasteaSignalGeneratorAgent(SignalGeneratorAgent, RegistrationAwareAgent)
         # Get the symbol's point precision (e.g., 0.01, 0.0001)
         symbol_info: SymbolInfo = await self.broker.get_market_info(self.trading_config.get_symbol())
 
-        # Calculate HA_close without rounding
-        df['HA_close'] = (df['open'] + df['high'] + df['low'] + df['close']) / 4
-
-        # Initialize the first HA_open as the average of the first open and close
-        ha_open = [(df['open'][0] + df['close'][0]) / 2]
-
-        # Calculate subsequent HA_open values without rounding
-        for i in range(1, len(df)):
-            ha_open.append((ha_open[i - 1] + df['HA_close'].iloc[i - 1]) / 2)
-
-        # Add the calculated HA_open values to the DataFrame (without rounding)
-        df['HA_open'] = pd.Series(ha_open, index=df.index)
-
-        # Calculate HA_high and HA_low without rounding
-        df['HA_high'] = df[['HA_open', 'HA_close', 'high']].max(axis=1)
-        df['HA_low'] = df[['HA_open', 'HA_close', 'low']].min(axis=1)
-
-        # Now, round all final Heikin-Ashi values to the appropriate precision
-        df['HA_open'] = round_to_point(df['HA_open'], symbol_info.point)
-        df['HA_close'] = round_to_point(df['HA_close'], symbol_info.point)
-        df['HA_high'] = round_to_point(df['HA_high'], symbol_info.point)
-        df['HA_low'] = round_to_point(df['HA_low'], symbol_info.point)
+        # HA_open recurrence solved as a linear filter, high/low and rounding to the symbol point in one pass
+        ha = heikin_ashi(df['open'].values, df['high'].values, df['low'].values, df['close'].values, symbol_info.point)
+        df['HA_open'], df['HA_high'], df['HA_low'], df['HA_close'] = ha[0], ha[1], ha[2], ha[3]
 
         return df
 
@@ -491,6 +478,103 @@ class AdrasteaSignalGeneratorAgent(SignalGeneratorAgent, RegistrationAwareAgent)
         self.logger.debug(f"Returning: should_enter={should_enter}, prev_state={prev_state}, cur_state={cur_state}, cur_condition_candle={describe_candle(cur_condition_candle)}")
         return should_enter, prev_state, cur_state, prev_condition_candle, cur_condition_candle
 
+    def replay_signals(
+            self,
+            rates: pd.DataFrame,
+            first_index: int,
+            last_index: int,
+            trading_direction: TradingDirection,
+            state: Optional[int] = None,
+            cur_condition_candle: Optional[Series] = None
+    ) -> Tuple[bool, int, int, Optional[Series], Optional[Series]]:
+        """
+        Same result as calling check_signals on each candle from first_index to last_index (excluded), carrying
+        state and condition candle from one call to the next, as done by the bootstrap.
+
+        The four indicator conditions are computed for all the candles at once as numpy boolean arrays; the state
+        transitions then run in a single pass over plain lists, tracking condition candles by index and building
+        the returned Series only at the end.
+
+        Returns:
+        - the values returned by check_signals for the candle at last_index - 1.
+        """
+        state = state if state is not None else 0
+        if last_index <= first_index:
+            return False, state, state, cur_condition_candle, cur_condition_candle
+
+        close = rates['HA_close'].values
+        supert_fast = rates[supertrend_fast_key].values
+        supert_slow = rates[supertrend_slow_key].values
+        stoch_k = rates[stoch_k_key].values
+        stoch_d = rates[stoch_d_key].values
+        window = slice(first_index, last_index)
+        prev_window = slice(first_index - 1, last_index - 1)
+        cur_close = close[window]
+
+        # Confronti con NaN falsi, come nei confronti scalari di check_signals
+        with np.errstate(invalid='ignore'):
+            if trading_direction == TradingDirection.LONG:
+                cond1 = cur_close >= supert_slow[prev_window]
+                cond2 = cur_close <= supert_fast[window]
+                cond3 = cur_close >= supert_fast[prev_window]
+                cond4 = (stoch_k[window] > stoch_d[window]) & (stoch_d[window] < 50)
+            elif trading_direction == TradingDirection.SHORT:
+                cond1 = cur_close < supert_slow[prev_window]
+                cond2 = cur_close > supert_fast[window]
+                cond3 = cur_close < supert_fast[prev_window]
+                cond4 = (stoch_k[window] < stoch_d[window]) & (stoch_d[window] > 50)
+            else:
+                cond1 = cond2 = cond3 = cond4 = np.zeros(last_index - first_index, dtype=bool)
+
+        # Tempi in secondi: indici delle candele della finestra, -1 per nessuna candela, 'external' per la candela iniziale
+        open_times = rates['time_open'].values.astype('datetime64[s]').astype(np.int64).tolist()
+        close_times = rates['time_close'].values.astype('datetime64[s]').astype(np.int64).tolist()
+        external = len(open_times)
+        if cur_condition_candle is not None:
+            open_times.append(int(cur_condition_candle['time_open'].timestamp()))
+            close_times.append(int(cur_condition_candle['time_close'].timestamp()))
+        condition = external if cur_condition_candle is not None else -1
+        condition_open = open_times[condition] if condition >= 0 else -1
+        time_tolerance = 30
+
+        should_enter, prev_state, prev_condition = False, state, condition
+        for i, c1, c2, c3, c4 in zip(range(first_index, last_index), cond1.tolist(), cond2.tolist(), cond3.tolist(), cond4.tolist()):
+            time_open = open_times[i]
+            should_enter, prev_state, prev_condition = False, state, condition
+
+            # Condition 1
+            if time_open >= condition_open:
+                if c1:
+                    if state == 0:
+                        prev_state, state, prev_condition, condition, condition_open = state, 1, condition, i, time_open
+                elif state >= 1:
+                    prev_state, state, prev_condition, condition, condition_open = state, 0, condition, -1, -1
+            # Condition 2
+            if state == 1 and c2 and time_open > condition_open:
+                prev_state, state, prev_condition, condition, condition_open = state, 2, condition, i, time_open
+            # Condition 3
+            if state >= 2 and time_open >= condition_open:
+                if c3:
+                    if state == 2:
+                        prev_state, state, prev_condition, condition, condition_open = state, 3, condition, i, time_open
+                elif state >= 3:
+                    prev_state, state, prev_condition, condition, condition_open = state, 2, condition, i, time_open
+            # Condition 4 (Stochastic)
+            if state == 3 and c4:
+                prev_state, state, prev_condition, condition, condition_open = state, 4, condition, i, time_open
+            # Condition 5 (Final condition for entry)
+            if state == 4 and time_open > condition_open and close_times[condition] <= time_open <= close_times[condition] + time_tolerance:
+                prev_state, state, prev_condition, condition, condition_open = state, 5, condition, i, time_open
+                should_enter = True
+
+        def to_candle(index: int) -> Optional[Series]:
+            if index < 0:
+                return None
+            return cur_condition_candle if index == external else rates.iloc[index]
+
+        self.logger.debug(f"Replayed {last_index - first_index} candles: prev_state={prev_state}, cur_state={state}, should_enter={should_enter}")
+        return should_enter, prev_state, state, to_candle(prev_condition), to_candle(condition)
+
     def update_state(
             self,
             cur_candle: Series,
@@ -5,6 +5,7 @@ from abc import ABC, abstractmethod
 from collections import defaultdict
 from typing import List, Optional
 
+from brokers.broker_pool import BrokerPool
 from brokers.broker_proxy import Broker
 from dto.QueueMessage import QueueMessage
 from misc_utils.bot_logger import BotLogger
@@ -63,6 +64,13 @@ class SymbolUnifiedNotifier(ABC):
         self.logger.info(f"Grouped symbols: {grouped_configs}")
         return grouped_configs
 
+    def brokers_for_symbol(self, symbol: str) -> list:
+        """Brokers of the accounts trading the symbol: one per account with the broker pool, the Broker proxy otherwise."""
+        if not BrokerPool().is_initialized:
+            return [Broker()]
+        accounts = dict.fromkeys(config.get_account_id() for config in self.trading_configs if config.symbol == symbol)
+        return [BrokerPool().get(account_id) for account_id in accounts]
+
     async def routine_start(self):
         """
         Start the routine to register clients for all symbols and configurations.
@@ -2,7 +2,6 @@ from collections import defaultdict
 from typing import List
 
 from agents.agent_symbol_unified_notifier import SymbolUnifiedNotifier
-from brokers.broker_proxy import Broker
 from dto.EconomicEvent import get_symbol_countries_of_interest, EconomicEvent
 from dto.QueueMessage import QueueMessage
 from dto.RequestResult import RequestResult
@@ -48,7 +47,6 @@ class EconomicEventsManagerAgent(SymbolUnifiedNotifier):
     @exception_handler
     async def on_economic_event(self, routing_key: str, message: QueueMessage):
         self.logger.info(f"Received economic event: {message.payload}")
-        broker = Broker()
         event = EconomicEvent.from_json(message.payload)
 
         event_country = event.country
@@ -81,26 +79,27 @@ class EconomicEventsManagerAgent(SymbolUnifiedNotifier):
             await self.send_message_to_all_clients_for_symbol(message, impacted_symbol)
 
         for impacted_symbol in impacted_symbols:
+            # Con il pool di broker le posizioni vanno chiuse su ogni account che opera il simbolo
+            for broker in self.brokers_for_symbol(impacted_symbol):
+                positions = await broker.get_open_positions(symbol=impacted_symbol)
 
-            positions = await broker.get_open_positions(symbol=impacted_symbol)
-
-            if not positions:
-                message = f"ℹ️ No open positions found for forced closure due to the economic event <b>{event_name}</b>."
-                self.logger.warning(message)
-                await self.send_message_to_all_clients_for_symbol(message, impacted_symbol)
-            else:
-                for position in positions:
-                    # Attempt to close the position
-                    result: RequestResult = await broker.close_position(position=position, comment=f"'{event_name}'", magic_number=self.config.get_bot_magic_number())
-                    if result and result.success:
-                        message = (
-                            f"✅ Position {position.position_id} closed successfully due to the economic event <b>{event_name}</b>.\n"
-                            f"ℹ️ This action was taken to mitigate potential risks associated with the event's impact on the markets."
-                        )
-                    else:
-                        message = (
-                            f"❌ Failed to close position {position.position_id} due to the economic event <b>{event_name}</b>.\n"
-                            f"⚠️ Potential risks remain as the position could not be closed."
-                        )
-                    self.logger.info(message)
+                if not positions:
+                    message = f"ℹ️ No open positions found for forced closure due to the economic event <b>{event_name}</b>."
+                    self.logger.warning(message)
                     await self.send_message_to_all_clients_for_symbol(message, impacted_symbol)
+                else:
+                    for position in positions:
+                        # Attempt to close the position
+                        result: RequestResult = await broker.close_position(position=position, comment=f"'{event_name}'", magic_number=self.config.get_bot_magic_number())
+                        if result and result.success:
+                            message = (
+                                f"✅ Position {position.position_id} closed successfully due to the economic event <b>{event_name}</b>.\n"
+                                f"ℹ️ This action was taken to mitigate potential risks associated with the event's impact on the markets."
+                            )
+                        else:
+                            message = (
+                                f"❌ Failed to close position {position.position_id} due to the economic event <b>{event_name}</b>.\n"
+                                f"⚠️ Potential risks remain as the position could not be closed."
+                            )
+                        self.logger.info(message)
+                        await self.send_message_to_all_clients_for_symbol(message, impacted_symbol)
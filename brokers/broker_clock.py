@@ -0,0 +1,132 @@
+import asyncio
+import calendar
+from datetime import datetime, timedelta
+from typing import Optional, Callable, Awaitable, List
+
+from misc_utils.bot_logger import BotLogger
+from misc_utils.utils_functions import now_utc, unix_to_datetime
+
+OffsetFetcher = Callable[[], Awaitable[Optional[int]]]
+OffsetChangeListener = Callable[[Optional[int], int], Awaitable[None]]
+
+
+def _last_sunday(year: int, month: int) -> int:
+    return max(week[calendar.SUNDAY] for week in calendar.monthcalendar(year, month))
+
+
+def _nth_sunday(year: int, month: int, n: int) -> int:
+    sundays = [week[calendar.SUNDAY] for week in calendar.monthcalendar(year, month) if week[calendar.SUNDAY] != 0]
+    return sundays[n - 1]
+
+
+def dst_transitions_utc(year: int) -> List[datetime]:
+    """
+    Returns the UTC instants of the European and US daylight saving time transitions of the given year.
+    Broker servers usually follow one of these two calendars (e.g. GMT+2/GMT+3 aligned to New York close).
+    """
+    return sorted([
+        # EU: last Sunday of March and October at 01:00 UTC
+        datetime(year, 3, _last_sunday(year, 3), 1, 0),
+        datetime(year, 10, _last_sunday(year, 10), 1, 0),
+        # US: second Sunday of March at 02:00 EST (07:00 UTC) and first Sunday of November at 02:00 EDT (06:00 UTC)
+        datetime(year, 3, _nth_sunday(year, 3, 2), 7, 0),
+        datetime(year, 11, _nth_sunday(year, 11, 1), 6, 0),
+    ])
+
+
+class BrokerClock:
+    """
+    Caches the broker timezone offset (in hours) so that the hot path does not need a round-trip
+    to the ServerTime service.
+
+    The offset is refreshed lazily once the refresh interval has elapsed, using a shorter interval
+    around the known DST transition dates, when the broker offset is expected to change.
+    Offset changes are logged and notified to the registered listeners.
+    If a refresh fails the last known offset keeps being served.
+    """
+
+    def __init__(self,
+                 agent: str,
+                 fetch_offset: OffsetFetcher,
+                 refresh_interval: timedelta = timedelta(hours=1),
+                 dst_refresh_interval: timedelta = timedelta(minutes=1),
+                 dst_window: timedelta = timedelta(hours=12)):
+        self.logger = BotLogger.get_logger(agent)
+        self._fetch_offset = fetch_offset
+        self.refresh_interval = refresh_interval
+        self.dst_refresh_interval = dst_refresh_interval
+        self.dst_window = dst_window
+        self._offset: Optional[int] = None
+        self._last_refresh: Optional[datetime] = None
+        self._refresh_lock = asyncio.Lock()
+        self._listeners: List[OffsetChangeListener] = []
+        self.last_change: Optional[datetime] = None
+
+    def add_change_listener(self, listener: OffsetChangeListener):
+        self._listeners.append(listener)
+
+    def is_near_dst_transition(self, utc_timestamp: datetime) -> bool:
+        transitions = dst_transitions_utc(utc_timestamp.year - 1) + dst_transitions_utc(utc_timestamp.year) + dst_transitions_utc(utc_timestamp.year + 1)
+        return any(abs(utc_timestamp - transition) <= self.dst_window for transition in transitions)
+
+    def _is_stale(self, utc_timestamp: datetime) -> bool:
+        if self._offset is None or self._last_refresh is None:
+            return True
+        interval = self.dst_refresh_interval if self.is_near_dst_transition(utc_timestamp) else self.refresh_interval
+        return utc_timestamp - self._last_refresh >= interval
+
+    async def get_offset(self) -> Optional[int]:
+        """Returns the cached broker offset in hours, refreshing it first if it is stale."""
+        if self._is_stale(now_utc()):
+            await self.refresh()
+        return self._offset
+
+    async def refresh(self, force: bool = False) -> Optional[int]:
+        async with self._refresh_lock:
+            current_time = now_utc()
+            # Another caller may have refreshed the offset while this one was waiting for the lock
+            if not force and not self._is_stale(current_time):
+                return self._offset
+
+            try:
+                new_offset = await self._fetch_offset()
+            except Exception as e:
+                self.logger.error(f"Error while refreshing broker timezone offset, keeping {self._offset}: {e}")
+                new_offset = None
+
+            if new_offset is None:
+                # Retry at the next access only if nothing is known yet
+                if self._offset is not None:
+                    self._last_refresh = current_time
+                return self._offset
+
+            previous_offset = self._offset
+            self._offset = int(new_offset)
+            self._last_refresh = current_time
+
+            if previous_offset is not None and previous_offset != self._offset:
+                self.last_change = current_time
+                self.logger.warning(f"Broker timezone offset changed from {previous_offset} to {self._offset} hours")
+                for listener in self._listeners:
+                    try:
+                        await listener(previous_offset, self._offset)
+                    except Exception as e:
+                        self.logger.error(f"Error notifying broker offset change: {e}")
+
+            return self._offset
+
+    def _require_offset(self, offset: Optional[int]) -> int:
+        offset = self._offset if offset is None else offset
+        if offset is None:
+            raise ValueError("Broker timezone offset not available")
+        return offset
+
+    def broker_to_utc(self, broker_timestamp: datetime, offset: Optional[int] = None) -> datetime:
+        return broker_timestamp - timedelta(hours=self._require_offset(offset))
+
+    def utc_to_broker(self, utc_timestamp: datetime, offset: Optional[int] = None) -> datetime:
+        return utc_timestamp + timedelta(hours=self._require_offset(offset))
+
+    def broker_unix_to_utc(self, broker_unix: float, offset: Optional[int] = None) -> datetime:
+        """Converts a broker 'unix' timestamp (broker wall clock expressed as epoch seconds) to a naive UTC datetime."""
+        return unix_to_datetime(broker_unix) - timedelta(hours=self._require_offset(offset))
@@ -0,0 +1,150 @@
+import asyncio
+import inspect
+import time
+from contextlib import asynccontextmanager
+from enum import Enum, auto
+from typing import Dict, Optional, Callable, Any, Tuple
+
+from misc_utils.latency_stats import LatencyRegistry
+
+
+class ConcurrencyClass(Enum):
+    UNLOCKED = auto()  # Cheap or cached reads, never wait for anything
+    READ = auto()  # Market data and history reads, share a bounded pool of concurrent readers
+    WRITE = auto()  # Order and position mutations, exclusive per symbol with priority over reads
+
+
+# Methods not listed here are treated as READ
+METHOD_CONCURRENCY: Dict[str, ConcurrencyClass] = {
+    'get_broker_timezone_offset': ConcurrencyClass.UNLOCKED,
+    'get_working_directory': ConcurrencyClass.UNLOCKED,
+    'get_broker_name': ConcurrencyClass.UNLOCKED,
+    'get_account_id': ConcurrencyClass.UNLOCKED,
+    'is_active_session': ConcurrencyClass.UNLOCKED,
+    'get_next_market_open': ConcurrencyClass.UNLOCKED,
+    'get_next_market_close': ConcurrencyClass.UNLOCKED,
+    'place_order': ConcurrencyClass.WRITE,
+    'close_position': ConcurrencyClass.WRITE,
+}
+
+
+class _SymbolGate:
+    """Reader/writer gate for a single symbol. Waiting writers block new readers (writer priority)."""
+
+    def __init__(self):
+        self.readers = 0
+        self.writers_waiting = 0
+        self.writer_active = False
+        self.condition = asyncio.Condition()
+
+    async def acquire_read(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: not self.writer_active and self.writers_waiting == 0)
+            self.readers += 1
+
+    async def release_read(self):
+        async with self.condition:
+            self.readers -= 1
+            self.condition.notify_all()
+
+    async def acquire_write(self):
+        async with self.condition:
+            self.writers_waiting += 1
+            try:
+                await self.condition.wait_for(lambda: not self.writer_active and self.readers == 0)
+            finally:
+                self.writers_waiting -= 1
+                # Un writer cancellato in attesa deve risvegliare i reader bloccati da writers_waiting
+                self.condition.notify_all()
+            self.writer_active = True
+
+    async def release_write(self):
+        async with self.condition:
+            self.writer_active = False
+            self.condition.notify_all()
+
+
+class BrokerConcurrencyPolicy:
+    """
+    Decides how concurrent broker calls are admitted, based on the concurrency class of each method:
+    - UNLOCKED methods run immediately;
+    - READ methods share a bounded pool of concurrent readers and wait while a write on the same symbol is pending;
+    - WRITE methods are exclusive per symbol and do not consume reader slots.
+
+    The time spent waiting for admission is recorded per method.
+    """
+
+    def __init__(self, max_concurrent_reads: int = 4, method_concurrency: Optional[Dict[str, ConcurrencyClass]] = None):
+        self.method_concurrency = dict(METHOD_CONCURRENCY if method_concurrency is None else method_concurrency)
+        self._read_pool = asyncio.Semaphore(max_concurrent_reads)
+        self._symbol_gates: Dict[Optional[str], _SymbolGate] = {}
+        self._symbol_arguments: Dict[str, Optional[Tuple[str, Optional[int]]]] = {}
+        self.lock_wait_stats = LatencyRegistry()
+
+    def get_concurrency_class(self, method_name: str) -> ConcurrencyClass:
+        return self.method_concurrency.get(method_name, ConcurrencyClass.READ)
+
+    def _get_gate(self, symbol: Optional[str]) -> _SymbolGate:
+        gate = self._symbol_gates.get(symbol)
+        if gate is None:
+            gate = self._symbol_gates[symbol] = _SymbolGate()
+        return gate
+
+    def _symbol_argument(self, method_name: str, method: Callable[..., Any]) -> Optional[Tuple[str, Optional[int]]]:
+        """Name and positional index (None if keyword-only) of the argument carrying the symbol, looked up once per method."""
+        if method_name in self._symbol_arguments:
+            return self._symbol_arguments[method_name]
+        try:
+            parameters = list(inspect.signature(method).parameters.values())
+        except (TypeError, ValueError):
+            parameters = None
+
+        argument = None
+        if parameters is not None:
+            positional = [p.name for p in parameters if p.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)]
+            names = {p.name for p in parameters}
+            for name in ('symbol', 'request', 'position'):
+                if name in names:
+                    argument = (name, positional.index(name) if name in positional else None)
+                    break
+        self._symbol_arguments[method_name] = argument
+        return argument
+
+    def resolve_symbol(self, method_name: str, method: Callable[..., Any], args: tuple, kwargs: dict) -> Optional[str]:
+        """Extracts the symbol a broker call refers to, looking at 'symbol', 'request' or 'position' arguments."""
+        argument = self._symbol_argument(method_name, method)
+        if argument is None:
+            return kwargs.get('symbol')
+
+        name, index = argument
+        value = args[index] if index is not None and index < len(args) else kwargs.get(name)
+        if name == 'symbol':
+            return value
+        return getattr(value, 'symbol', None)
+
+    @asynccontextmanager
+    async def admit(self, method_name: str, symbol: Optional[str]):
+        concurrency_class = self.get_concurrency_class(method_name)
+        if concurrency_class == ConcurrencyClass.UNLOCKED:
+            yield
+            return
+
+        gate = self._get_gate(symbol)
+        wait_start = time.perf_counter()
+
+        if concurrency_class == ConcurrencyClass.WRITE:
+            await gate.acquire_write()
+            self.lock_wait_stats.record(method_name, time.perf_counter() - wait_start)
+            try:
+                yield
+            finally:
+                await gate.release_write()
+            return
+
+        await gate.acquire_read()
+        try:
+            async with self._read_pool:
+                self.lock_wait_stats.record(method_name, time.perf_counter() - wait_start)
+                yield
+        finally:
+            await gate.release_read()
@@ -7,7 +7,7 @@ from pandas import Series
 from dto import SymbolInfo, SymbolPrice
 from dto.BrokerOrder import BrokerOrder
 from dto.Deal import Deal
-from dto.EconomicEvent import EconomicEvent
+from dto.EconomicEvent import EconomicEvent, EventImportance
 from dto.OrderRequest import OrderRequest
 from dto.Position import Position
 from dto.RequestResult import RequestResult
@@ -24,6 +24,10 @@ class BrokerAPI(ABC):
     async def get_last_candles(self, symbol: str, timeframe: Timeframe, count: int = 1, position: int = 0) -> Series:
         pass
 
+    @abstractmethod
+    async def get_rolling_candles(self, symbol: str, timeframe: Timeframe, count: int = 1) -> Series:
+        pass
+
     @abstractmethod
     async def get_symbol_price(self, symbol: str) -> SymbolPrice:
         pass
@@ -41,7 +45,15 @@ class BrokerAPI(ABC):
         pass
 
     @abstractmethod
-    async def is_market_open(self, symbol: str) -> bool:
+    async def is_market_open(self, symbol: str, utc_timestamp: Optional[datetime] = None) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_next_market_open(self, symbol: str, utc_timestamp: Optional[datetime] = None) -> Optional[datetime]:
+        pass
+
+    @abstractmethod
+    async def get_next_market_close(self, symbol: str, utc_timestamp: Optional[datetime] = None) -> Optional[datetime]:
         pass
 
     @abstractmethod
@@ -84,6 +96,10 @@ class BrokerAPI(ABC):
     async def get_deals_in_range(self, from_tms_utc: datetime, to_tms_utc: datetime, symbol: str, magic_number: Optional[int] = None, include_orders: bool = True) -> List[Deal]:
         pass
 
+    @abstractmethod
+    async def get_deals_since(self, last_ticket: int, from_tms_utc: datetime, include_orders: bool = True) -> List[Deal]:
+        pass
+
     @abstractmethod
     async def get_open_positions(self, symbol: str, magic_number: Optional[int] = None) -> List[Position]:
         pass
@@ -96,6 +112,15 @@ class BrokerAPI(ABC):
     async def get_broker_name(self) -> str:
         pass
 
+    @abstractmethod
+    async def get_account_id(self) -> int:
+        pass
+
     @abstractmethod
     async def get_economic_calendar(self, country: str, from_datetime: datetime, to_datetime: datetime) -> List[EconomicEvent]:
+        pass
+
+    @abstractmethod
+    async def get_economic_calendar_events(self, countries: List[str], from_datetime: datetime, to_datetime: datetime,
+                                           min_importance: EventImportance = EventImportance.NONE) -> List[EconomicEvent]:
         pass
\ No newline at end of file
@@ -0,0 +1,283 @@
+import asyncio
+import multiprocessing
+import secrets
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from brokers.gateway_broker import GatewayBroker
+from misc_utils.bot_logger import BotLogger
+from misc_utils.config import TradingConfiguration
+from misc_utils.error_handler import exception_handler
+from misc_utils.latency_stats import LatencyRegistry
+
+DEFAULT_POOL_BASE_PORT = 5610
+
+
+def _run_gateway_worker(agent: str, configuration: Dict, endpoint: str, token: str, stop_event):
+    """Entry point of a worker process: serves one MT5 account through an MT5Gateway until stop_event is set."""
+    # Importato nel processo figlio: ogni processo ha la propria connessione al terminale MT5
+    from brokers.mt5_gateway import MT5Gateway
+
+    async def serve():
+        gateway = MT5Gateway(agent, configuration, endpoint, token)
+        await gateway.start()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, stop_event.wait)
+        finally:
+            await gateway.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+class AccountBroker:
+    """
+    Broker of a single pool account: forwards every call to the GatewayBroker client of the account worker,
+    admitting at most max_concurrency calls at a time. Calls fail fast while the worker is unhealthy.
+    """
+
+    def __init__(self, account_id: int, client: GatewayBroker, max_concurrency: int):
+        self.account_id = account_id
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.healthy = False
+        self.last_healthy_at: Optional[float] = None
+        self.consecutive_failures = 0
+        self.restarts = 0
+        self.in_flight = 0
+        self.admission_wait = LatencyRegistry()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        attr = getattr(self.client, name)
+
+        if callable(attr):
+            async def account_wrapper(*args, **kwargs):
+                if not self.healthy:
+                    raise ConnectionError(f"Broker worker of account {self.account_id} is not healthy")
+                start = time.perf_counter()
+                async with self.semaphore:
+                    self.admission_wait.record(name, time.perf_counter() - start)
+                    self.in_flight += 1
+                    try:
+                        return await attr(*args, **kwargs)
+                    finally:
+                        self.in_flight -= 1
+
+            return account_wrapper
+        return attr
+
+
+class BrokerPool:
+    """
+    Pool of MT5 brokers, one per account, for driving several accounts from a single bot process.
+
+    The MetaTrader5 API is bound to one terminal per process, so every account is served by an MT5Gateway
+    running in its own worker process, on a dedicated local endpoint; the pool talks to each worker with a
+    GatewayBroker client. Calls are routed by account id (the 'account' of a TradingConfiguration, or the
+    default account) and limited per account by a semaphore. A background health check pings every worker:
+    a dead worker, or one failing max_failures pings in a row, is restarted.
+    """
+    _instance: Optional['BrokerPool'] = None
+    _lock = threading.Lock()
+
+    def __new__(cls) -> 'BrokerPool':
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    @property
+    def is_initialized(self) -> bool:
+        return self._initialized
+
+    @exception_handler
+    async def initialize(self, agent: str, accounts: List[Dict], default_account: Optional[int] = None,
+                         base_port: int = DEFAULT_POOL_BASE_PORT, timeout: Optional[int] = None, max_concurrency: int = 8,
+                         health_check_interval: float = 5.0, health_check_timeout: float = 2.0, max_failures: int = 3,
+                         startup_timeout: float = 120.0) -> 'BrokerPool':
+        if self._initialized:
+            raise Exception("Broker pool is already initialized")
+        if not accounts:
+            raise ValueError("The broker pool needs at least one account")
+
+        self.agent = agent
+        self.logger = BotLogger.get_logger(agent)
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.max_failures = max_failures
+        self.startup_timeout = startup_timeout
+        # Le API MT5 non sopravvivono a una fork: i worker partono sempre con spawn
+        self._mp_context = multiprocessing.get_context("spawn")
+        # Token condiviso con i worker: le richieste di altri processi locali vengono scartate
+        self.token = secrets.token_hex(32)
+        self._configurations: Dict[int, Dict] = {}
+        self._endpoints: Dict[int, str] = {}
+        self._processes: Dict[int, Any] = {}
+        self._stop_events: Dict[int, Any] = {}
+        self._brokers: Dict[int, AccountBroker] = {}
+        self._health_task: Optional[asyncio.Task] = None
+
+        for index, account in enumerate(accounts):
+            account_id = int(account['account'])
+            if account_id in self._configurations:
+                raise ValueError(f"Account {account_id} configured more than once")
+            self._configurations[account_id] = {
+                'account': account_id,
+                'password': account['password'],
+                'server': account['server'],
+                'path': account['path']
+            }
+            self._endpoints[account_id] = f"tcp://127.0.0.1:{base_port + index}"
+            client = GatewayBroker(f"{agent}_{account_id}", {'gateway_endpoint': self._endpoints[account_id], 'gateway_token': self.token, 'timeout': timeout})
+            self._brokers[account_id] = AccountBroker(account_id, client, account.get('max_concurrency') or max_concurrency)
+
+        self.default_account = default_account if default_account is not None else next(iter(self._brokers))
+        if self.default_account not in self._brokers:
+            raise ValueError(f"Default account {self.default_account} is not configured in the broker pool")
+        self._initialized = True
+        return self
+
+    @property
+    def accounts(self) -> List[int]:
+        return list(self._brokers)
+
+    def get(self, account_id: Optional[int] = None) -> AccountBroker:
+        account_id = self.default_account if account_id is None else account_id
+        broker = self._brokers.get(account_id)
+        if broker is None:
+            raise KeyError(f"Account {account_id} is not configured in the broker pool")
+        return broker
+
+    def for_configuration(self, trading_config: TradingConfiguration) -> AccountBroker:
+        return self.get(trading_config.get_account_id())
+
+    def get_endpoint(self, account_id: Optional[int] = None) -> str:
+        return self._endpoints[self.get(account_id).account_id]
+
+    # Worker lifecycle
+
+    def _spawn_worker(self, account_id: int):
+        stop_event = self._mp_context.Event()
+        process = self._mp_context.Process(
+            target=_run_gateway_worker,
+            args=(f"{self.agent}_{account_id}_Worker", self._configurations[account_id], self._endpoints[account_id], self.token, stop_event),
+            name=f"BrokerWorker-{account_id}",
+            daemon=True
+        )
+        process.start()
+        self._processes[account_id] = process
+        self._stop_events[account_id] = stop_event
+        self.logger.info(f"Broker worker for account {account_id} started with pid {process.pid} on {self._endpoints[account_id]}")
+
+    async def _stop_worker(self, account_id: int, timeout: float = 10.0):
+        process = self._processes.pop(account_id, None)
+        stop_event = self._stop_events.pop(account_id, None)
+        if process is None:
+            return
+        # Un worker terminato può aver lasciato acquisito il lock dell'evento: si segnala solo a quelli vivi
+        if process.is_alive():
+            stop_event.set()
+        await asyncio.get_running_loop().run_in_executor(None, process.join, timeout)
+        if process.is_alive():
+            self.logger.warning(f"Broker worker for account {account_id} did not stop in {timeout} s, terminating it.")
+            process.terminate()
+            await asyncio.get_running_loop().run_in_executor(None, process.join, timeout)
+
+    async def _wait_healthy(self, account_id: int) -> bool:
+        broker = self._brokers[account_id]
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            process = self._processes.get(account_id)
+            if process is None or not process.is_alive():
+                break
+            if await broker.client.ping(self.health_check_timeout):
+                self._mark_healthy(broker)
+                return True
+        self.logger.error(f"Broker worker for account {account_id} not available after {self.startup_timeout} s")
+        return False
+
+    def _mark_healthy(self, broker: AccountBroker):
+        if not broker.healthy:
+            self.logger.info(f"Broker worker for account {broker.account_id} is healthy")
+        broker.healthy = True
+        broker.consecutive_failures = 0
+        broker.last_healthy_at = time.time()
+
+    async def start(self) -> bool:
+        for account_id in self._brokers:
+            self._spawn_worker(account_id)
+            self._brokers[account_id].client.connect()
+        results = await asyncio.gather(*(self._wait_healthy(account_id) for account_id in self._brokers))
+        self._health_task = asyncio.create_task(self._health_loop())
+        return all(results)
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for account_id, broker in self._brokers.items():
+            broker.healthy = False
+            await broker.client.shutdown()
+        await asyncio.gather(*(self._stop_worker(account_id) for account_id in list(self._processes)))
+
+    async def _health_loop(self):
+        try:
+            while True:
+                await asyncio.sleep(self.health_check_interval)
+                await asyncio.gather(*(self._check(account_id) for account_id in self._brokers))
+        except asyncio.CancelledError:
+            pass
+
+    async def _check(self, account_id: int):
+        broker = self._brokers[account_id]
+        process = self._processes.get(account_id)
+        if process is not None and process.is_alive() and await broker.client.ping(self.health_check_timeout):
+            self._mark_healthy(broker)
+            return
+
+        broker.consecutive_failures += 1
+        alive = process is not None and process.is_alive()
+        if alive and broker.consecutive_failures < self.max_failures:
+            self.logger.warning(f"Broker worker for account {account_id} missed {broker.consecutive_failures} health checks")
+            return
+
+        broker.healthy = False
+        self.logger.error(f"Broker worker for account {account_id} {'unresponsive' if alive else 'not running'}, restarting it.")
+        try:
+            await self._stop_worker(account_id)
+            self._spawn_worker(account_id)
+            broker.restarts += 1
+            await self._wait_healthy(account_id)
+        except Exception as e:
+            self.logger.error(f"Error while restarting the broker worker for account {account_id}: {e}")
+
+    def get_stats(self) -> Dict[int, Dict[str, Any]]:
+        stats = {}
+        for account_id, broker in self._brokers.items():
+            process = self._processes.get(account_id)
+            stats[account_id] = {
+                "endpoint": self._endpoints[account_id],
+                "pid": process.pid if process is not None else None,
+                "alive": process is not None and process.is_alive(),
+                "healthy": broker.healthy,
+                "last_healthy_at": broker.last_healthy_at,
+                "consecutive_failures": broker.consecutive_failures,
+                "restarts": broker.restarts,
+                "in_flight": broker.in_flight,
+                "max_concurrency": broker.max_concurrency,
+                "admission_wait": broker.admission_wait.snapshot()
+            }
+        return stats
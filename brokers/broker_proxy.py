@@ -1,9 +1,12 @@
 import asyncio
 import threading
-from typing import TypeVar, Generic, Optional, Type, Dict
+import time
+from typing import TypeVar, Generic, Optional, Type, Dict, Any
 
+from brokers.broker_concurrency import BrokerConcurrencyPolicy
 from misc_utils.bot_logger import BotLogger
-from misc_utils.error_handler import exception_handler
+from misc_utils.call_metrics import CallMetrics
+from misc_utils.error_handler import exception_handler, log_exception
 
 T = TypeVar('T')
 
@@ -19,6 +22,8 @@ class Broker(Generic[T]):
                     cls._instance = super().__new__(cls)
                     cls._instance._broker_instance = None
                     cls._instance.async_lock = asyncio.Lock()
+                    cls._instance.concurrency_policy = BrokerConcurrencyPolicy()
+                    cls._instance.call_metrics = CallMetrics()
                     cls._instance.logger = None  # Create direct logger field to avoid __getattr__ lock recursion
         return cls._instance
 
@@ -40,6 +45,18 @@ class Broker(Generic[T]):
     def is_initialized(self) -> bool:
         return self._broker_instance is not None
 
+    def get_lock_wait_stats(self) -> Dict[str, Dict[str, float]]:
+        """Returns the time spent by each broker method waiting for admission by the concurrency policy."""
+        return self.concurrency_policy.lock_wait_stats.snapshot()
+
+    def get_call_metrics(self, method: Optional[str] = None, symbol: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Returns calls, errors, lock wait and execution time histograms of the broker methods, per method and symbol."""
+        return self.call_metrics.snapshot(method, symbol)
+
+    def dump_call_metrics(self, path: Optional[str] = None) -> str:
+        """Writes the call metrics to a JSON file and returns its path."""
+        return self.call_metrics.dump(path)
+
     def __getattr__(self, name):
         if not self.is_initialized:
             raise Exception("Broker not initialized. Call initialize() first")
@@ -47,9 +64,29 @@ class Broker(Generic[T]):
         attr = getattr(self._broker_instance, name)
 
         if callable(attr):
+            # Metodi con exception_handler: il proxy chiama la funzione originale e gestisce l'eccezione, così sa se la chiamata è fallita
+            handled_function = getattr(attr, 'handled_function', None)
+            instance = getattr(attr, '__self__', None)
+
             async def proxy_wrapper(*args, **kwargs):
-                async with self.async_lock:
-                    return await attr(*args, **kwargs)
+                symbol = self.concurrency_policy.resolve_symbol(name, attr, args, kwargs)
+                started = admitted = time.perf_counter_ns()
+                failed = True
+                try:
+                    async with self.concurrency_policy.admit(name, symbol):
+                        admitted = time.perf_counter_ns()
+                        if handled_function is None or instance is None:
+                            result = await attr(*args, **kwargs)
+                        else:
+                            try:
+                                result = await handled_function(instance, *args, **kwargs)
+                            except Exception as e:
+                                log_exception(handled_function, (instance,) + args, e)
+                                return None
+                        failed = False
+                        return result
+                finally:
+                    self.call_metrics.record(name, symbol, admitted - started, time.perf_counter_ns() - admitted, failed)
 
             return proxy_wrapper
         return attr
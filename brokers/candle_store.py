@@ -0,0 +1,138 @@
+import asyncio
+from typing import Callable, Awaitable, Optional, Dict, Tuple
+
+import numpy as np
+
+from misc_utils.bot_logger import BotLogger
+from misc_utils.enums import Timeframe
+
+# fetch_rates(symbol, timeframe, position, count) -> structured rates array (oldest first), as returned by copy_rates_from_pos
+RatesFetcher = Callable[[str, Timeframe, int, int], Awaitable[Optional[np.ndarray]]]
+
+
+class RollingCandleStore:
+    """
+    Rolling buffer of the most recent raw rates of a (symbol, timeframe), in broker time.
+
+    Each update downloads only the last few bars (the open bar plus a bounded tail that the broker may
+    still revise) and merges them over the stored ones; a larger download happens only when the
+    incremental fetch does not overlap the stored bars (e.g. after a disconnection) or when more bars
+    than stored are requested. Rates are kept in a preallocated array twice the capacity, so that
+    appends are amortized O(1) and windows are returned as contiguous views without copies.
+    """
+
+    def __init__(self, agent: str, symbol: str, timeframe: Timeframe, fetch_rates: RatesFetcher, repair_bars: int = 3):
+        self.logger = BotLogger.get_logger(agent)
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.repair_bars = repair_bars
+        self._fetch_rates = fetch_rates
+        self._buffer: Optional[np.ndarray] = None
+        self._start = 0
+        self._size = 0
+        self.capacity = 0
+        self._lock = asyncio.Lock()
+        self.counters: Dict[str, int] = {"updates": 0, "fetch_calls": 0, "bars_fetched": 0, "full_loads": 0, "revised_bars": 0}
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _rates(self) -> np.ndarray:
+        return self._buffer[self._start:self._start + self._size]
+
+    async def _fetch(self, count: int) -> np.ndarray:
+        rates = await self._fetch_rates(self.symbol, self.timeframe, 0, count)
+        self.counters["fetch_calls"] += 1
+        if rates is None:
+            raise Exception(f"Unable to fetch rates for {self.symbol} {self.timeframe.name}")
+        self.counters["bars_fetched"] += len(rates)
+        return rates
+
+    def _reset(self, rates: np.ndarray, capacity: int):
+        self.capacity = capacity
+        self._buffer = np.empty(2 * capacity, dtype=rates.dtype)
+        rates = rates[-capacity:]
+        self._buffer[:len(rates)] = rates
+        self._start = 0
+        self._size = len(rates)
+
+    def _merge(self, rates: np.ndarray):
+        """Replaces the stored bars from the first fetched bar onward with the fetched ones."""
+        stored = self._rates()
+        keep = int(np.searchsorted(stored['time'], rates['time'][0], side='left'))
+
+        # Count bars whose values were revised by the broker (open bar excluded)
+        overlap = min(self._size - keep, len(rates)) - 1
+        if overlap > 0:
+            self.counters["revised_bars"] += int(np.count_nonzero(stored[keep:keep + overlap] != rates[:overlap]))
+
+        new_size = keep + len(rates)
+        if self._start + new_size > len(self._buffer):
+            # Compact: move the most recent bars to the beginning of the buffer
+            drop = max(0, new_size - self.capacity)
+            retained = self._buffer[self._start + drop:self._start + keep].copy()
+            self._buffer[:len(retained)] = retained
+            self._start = 0
+            keep = len(retained)
+            new_size = keep + len(rates)
+        self._buffer[self._start + keep:self._start + new_size] = rates
+        self._size = new_size
+        if self._size > self.capacity:
+            self._start += self._size - self.capacity
+            self._size = self.capacity
+
+    async def update(self, min_bars: int) -> np.ndarray:
+        """Brings the store up to date, holding at least min_bars bars (if available), and returns a view of all stored rates."""
+        async with self._lock:
+            self.counters["updates"] += 1
+
+            if self._buffer is None or min_bars > self.capacity or self._size < min_bars:
+                capacity = max(min_bars, self.capacity)
+                self._reset(await self._fetch(capacity), capacity)
+                self.counters["full_loads"] += 1
+                return self._rates()
+
+            fetch_count = self.repair_bars + 1
+            while True:
+                rates = await self._fetch(fetch_count)
+                if len(rates) == 0:
+                    return self._rates()
+                last_stored_time = self._rates()['time'][-1]
+                if rates['time'][0] <= last_stored_time or len(rates) < fetch_count:
+                    self._merge(rates)
+                    return self._rates()
+                if fetch_count >= self.capacity:
+                    # No overlap with the stored bars: reload the whole window
+                    self._reset(rates, self.capacity)
+                    self.counters["full_loads"] += 1
+                    return self._rates()
+                fetch_count = min(fetch_count * 4, self.capacity)
+
+    async def get_rates(self, count: int) -> np.ndarray:
+        """Returns a view of the last count stored rates (open bar included), after updating the store."""
+        rates = await self.update(count)
+        return rates[-count:]
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"size": self._size, "capacity": self.capacity, **self.counters}
+
+
+class CandleStoreRegistry:
+    """Keeps one RollingCandleStore per (symbol, timeframe)."""
+
+    def __init__(self, agent: str, fetch_rates: RatesFetcher, repair_bars: int = 3):
+        self.agent = agent
+        self.repair_bars = repair_bars
+        self._fetch_rates = fetch_rates
+        self._stores: Dict[Tuple[str, Timeframe], RollingCandleStore] = {}
+
+    def get_store(self, symbol: str, timeframe: Timeframe) -> RollingCandleStore:
+        key = (symbol, timeframe)
+        store = self._stores.get(key)
+        if store is None:
+            store = self._stores[key] = RollingCandleStore(self.agent, symbol, timeframe, self._fetch_rates, self.repair_bars)
+        return store
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        return {f"{symbol}_{timeframe.name}": store.get_stats() for (symbol, timeframe), store in self._stores.items()}
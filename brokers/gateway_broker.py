@@ -0,0 +1,264 @@
+import asyncio
+import itertools
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import zmq
+import zmq.asyncio
+
+from brokers.broker_interface import BrokerAPI
+from brokers.gateway_protocol import DEFAULT_GATEWAY_ENDPOINT, GATEWAY_PING, GATEWAY_STATS, encode_request, decode_response, encode_token
+from dto.BrokerOrder import BrokerOrder
+from dto.Deal import Deal
+from dto.EconomicEvent import EconomicEvent, EventImportance
+from dto.OrderRequest import OrderRequest
+from dto.Position import Position
+from dto.RequestResult import RequestResult
+from dto.SymbolInfo import SymbolInfo
+from dto.SymbolPrice import SymbolPrice
+from misc_utils.bot_logger import BotLogger
+from misc_utils.enums import Timeframe, FillingType
+from misc_utils.error_handler import exception_handler
+from misc_utils.latency_stats import LatencyRegistry
+
+
+class GatewayBroker(BrokerAPI):
+    """
+    BrokerAPI client of the MT5Gateway process.
+
+    Every call is forwarded over a single DEALER socket and many calls can be in flight at once: responses
+    are matched to their request id. Methods not declared by BrokerAPI (stats, warm up, ...) are forwarded
+    as well. The round-trip latency of each method is recorded on the client side.
+
+    Configuration keys: 'gateway_endpoint', 'gateway_token' (sent with every request) and 'timeout' (milliseconds).
+    """
+
+    def __init__(self, agent: str, configuration: Dict):
+        self.agent = agent
+        self.logger = BotLogger.get_logger(agent)
+        self.endpoint = configuration.get('gateway_endpoint') or DEFAULT_GATEWAY_ENDPOINT
+        self.timeout = configuration.get('timeout') or 30 * 1000
+        self._token = encode_token(configuration.get('gateway_token'))
+        self.identity = f"{agent}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._socket: Optional[zmq.asyncio.Socket] = None
+        self._receiver_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._request_ids = itertools.count(1)
+        self.latency_stats = LatencyRegistry()
+        self.counters: Dict[str, int] = {"requests": 0, "timeouts": 0, "errors": 0, "late_responses": 0}
+
+    async def _receive_loop(self):
+        try:
+            while True:
+                id_frame, response = await self._socket.recv_multipart()
+                future = self._pending.pop(int.from_bytes(id_frame, "little"), None)
+                if future is None or future.done():
+                    # La richiesta è già andata in timeout
+                    self.counters["late_responses"] += 1
+                    continue
+                future.set_result(response)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.logger.error(f"Gateway client receive loop terminated: {e}")
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"Connection to the gateway {self.endpoint} lost: {e}"))
+            self._pending.clear()
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        if self._socket is None:
+            raise ConnectionError(f"Gateway client for {self.endpoint} not started")
+
+        request_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self.counters["requests"] += 1
+        start = time.perf_counter()
+        try:
+            await self._socket.send_multipart(encode_request(self._token, request_id, method, args, kwargs))
+            response = await asyncio.wait_for(future, self.timeout / 1000)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise TimeoutError(f"Gateway call {method} timed out after {self.timeout} ms.")
+        finally:
+            self._pending.pop(request_id, None)
+        self.latency_stats.record(method, time.perf_counter() - start)
+
+        ok, payload = decode_response(response)
+        if not ok:
+            self.counters["errors"] += 1
+            raise Exception(payload)
+        return payload
+
+    def __getattr__(self, name: str):
+        # Metodi specifici di MT5Broker non dichiarati in BrokerAPI
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def forward(*args, **kwargs):
+            return await self._call(name, *args, **kwargs)
+
+        forward.__name__ = name
+        return forward
+
+    # Lifecycle
+
+    def connect(self):
+        """Opens the socket without waiting for the gateway: requests are queued until it is reachable."""
+        if self._socket is not None:
+            return
+        socket = zmq.asyncio.Context.instance().socket(zmq.DEALER)
+        socket.setsockopt_string(zmq.IDENTITY, self.identity)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect(self.endpoint)
+        self._socket = socket
+        self._receiver_task = asyncio.create_task(self._receive_loop())
+
+    @exception_handler
+    async def startup(self) -> bool:
+        self.connect()
+        if not await self._call(GATEWAY_PING):
+            raise Exception(f"MT5 gateway at {self.endpoint} not available")
+        self.logger.info(f"Connected to the MT5 gateway at {self.endpoint} as {self.identity}")
+        return True
+
+    async def ping(self, timeout: float) -> bool:
+        """True if the gateway answers within timeout seconds."""
+        try:
+            return bool(await asyncio.wait_for(self._call(GATEWAY_PING), timeout))
+        except Exception:
+            return False
+
+    @exception_handler
+    async def shutdown(self):
+        # La connessione MT5 appartiene al gateway: si chiude solo il socket del client
+        if self._receiver_task is not None:
+            self._receiver_task.cancel()
+            try:
+                await self._receiver_task
+            except asyncio.CancelledError:
+                pass
+            self._receiver_task = None
+        if self._socket is not None:
+            self._socket.close(linger=0)
+            self._socket = None
+        self.logger.info("Disconnected from the MT5 gateway.")
+
+    @exception_handler
+    async def get_gateway_stats(self) -> Dict[str, Any]:
+        """Returns the gateway side counters and per client service latencies."""
+        return await self._call(GATEWAY_STATS)
+
+    @exception_handler
+    async def get_gateway_client_stats(self) -> Dict[str, Any]:
+        """Returns the round-trip latency of each method measured by this client."""
+        return {"endpoint": self.endpoint, "identity": self.identity, "in_flight": len(self._pending),
+                **self.counters, "latency": self.latency_stats.snapshot()}
+
+    # BrokerAPI
+
+    @exception_handler
+    async def get_last_candles(self, symbol: str, timeframe: Timeframe, count: int = 1, position: int = 0) -> pd.DataFrame:
+        return await self._call("get_last_candles", symbol, timeframe, count, position)
+
+    @exception_handler
+    async def get_rolling_candles(self, symbol: str, timeframe: Timeframe, count: int = 1) -> pd.DataFrame:
+        return await self._call("get_rolling_candles", symbol, timeframe, count)
+
+    @exception_handler
+    async def get_symbol_price(self, symbol: str) -> Optional[SymbolPrice]:
+        return await self._call("get_symbol_price", symbol)
+
+    @exception_handler
+    async def place_order(self, request: OrderRequest) -> RequestResult:
+        return await self._call("place_order", request)
+
+    @exception_handler
+    async def get_market_info(self, symbol: str) -> Optional[SymbolInfo]:
+        return await self._call("get_market_info", symbol)
+
+    @exception_handler
+    async def get_filling_mode(self, symbol: str) -> FillingType:
+        return await self._call("get_filling_mode", symbol)
+
+    @exception_handler
+    async def is_market_open(self, symbol: str, utc_timestamp: Optional[datetime] = None) -> bool:
+        return await self._call("is_market_open", symbol, utc_timestamp)
+
+    @exception_handler
+    async def get_next_market_open(self, symbol: str, utc_timestamp: Optional[datetime] = None) -> Optional[datetime]:
+        return await self._call("get_next_market_open", symbol, utc_timestamp)
+
+    @exception_handler
+    async def get_next_market_close(self, symbol: str, utc_timestamp: Optional[datetime] = None) -> Optional[datetime]:
+        return await self._call("get_next_market_close", symbol, utc_timestamp)
+
+    @exception_handler
+    async def get_broker_timezone_offset(self) -> Optional[int]:
+        return await self._call("get_broker_timezone_offset")
+
+    @exception_handler
+    async def get_working_directory(self) -> str:
+        return await self._call("get_working_directory")
+
+    @exception_handler
+    async def get_account_balance(self) -> float:
+        return await self._call("get_account_balance")
+
+    @exception_handler
+    async def get_account_leverage(self) -> float:
+        return await self._call("get_account_leverage")
+
+    @exception_handler
+    async def close_position(self, position: Position, comment: Optional[str] = None, magic_number: Optional[int] = None) -> RequestResult:
+        return await self._call("close_position", position, comment, magic_number)
+
+    @exception_handler
+    async def get_orders_by_ticket(self, orders_ticket: List[int], symbol: str, magic_number: Optional[int]) -> List[BrokerOrder]:
+        return await self._call("get_orders_by_ticket", orders_ticket, symbol, magic_number)
+
+    @exception_handler
+    async def get_orders_in_range(self, from_tms_utc: datetime, to_tms_utc: datetime, symbol: str, magic_number: Optional[int]) -> List[BrokerOrder]:
+        return await self._call("get_orders_in_range", from_tms_utc, to_tms_utc, symbol, magic_number)
+
+    @exception_handler
+    async def get_deals_by_position(self, positions_id: List[int], symbol: str, magic_number: Optional[int] = None, include_orders: bool = True) -> dict[int, List[Deal]]:
+        return await self._call("get_deals_by_position", positions_id, symbol, magic_number, include_orders)
+
+    @exception_handler
+    async def get_deals_in_range(self, from_tms_utc: datetime, to_tms_utc: datetime, symbol: str, magic_number: Optional[int] = None, include_orders: bool = True) -> List[Deal]:
+        return await self._call("get_deals_in_range", from_tms_utc, to_tms_utc, symbol, magic_number, include_orders)
+
+    @exception_handler
+    async def get_deals_since(self, last_ticket: int, from_tms_utc: datetime, include_orders: bool = True) -> List[Deal]:
+        return await self._call("get_deals_since", last_ticket, from_tms_utc, include_orders)
+
+    @exception_handler
+    async def get_open_positions(self, symbol: str, magic_number: Optional[int] = None) -> List[Position]:
+        return await self._call("get_open_positions", symbol, magic_number)
+
+    @exception_handler
+    async def get_historical_positions(self, open_from_tms_utc: datetime, open_to_tms_utc: datetime, symbol: str, magic_number: Optional[int] = None) -> List[Position]:
+        return await self._call("get_historical_positions", open_from_tms_utc, open_to_tms_utc, symbol, magic_number)
+
+    @exception_handler
+    async def get_broker_name(self) -> str:
+        return await self._call("get_broker_name")
+
+    @exception_handler
+    async def get_account_id(self) -> int:
+        return await self._call("get_account_id")
+
+    @exception_handler
+    async def get_economic_calendar(self, country: str, from_datetime: datetime, to_datetime: datetime) -> List[EconomicEvent]:
+        return await self._call("get_economic_calendar", country, from_datetime, to_datetime)
+
+    @exception_handler
+    async def get_economic_calendar_events(self, countries: List[str], from_datetime: datetime, to_datetime: datetime,
+                                           min_importance: EventImportance = EventImportance.NONE) -> List[EconomicEvent]:
+        return await self._call("get_economic_calendar_events", countries, from_datetime, to_datetime, min_importance)
@@ -0,0 +1,93 @@
+import hmac
+import io
+import pickle
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_GATEWAY_ENDPOINT = "tcp://127.0.0.1:5600"
+
+# Methods answered by the gateway itself instead of the broker
+GATEWAY_PING = "__ping__"
+GATEWAY_STATS = "__gateway_stats__"
+
+# The gateway owns the MT5 connection lifecycle, clients can not start or stop it
+GATEWAY_FORBIDDEN_METHODS = {"startup", "shutdown"}
+
+PICKLE_PROTOCOL = pickle.HIGHEST_PROTOCOL
+
+# Globals a gateway frame may reference: builtin containers, datetimes, numpy arrays and the pandas objects of the candles
+ALLOWED_GLOBALS = {
+    ("builtins", "set"), ("builtins", "frozenset"), ("builtins", "slice"), ("builtins", "range"), ("builtins", "complex"),
+    ("datetime", "datetime"), ("datetime", "date"), ("datetime", "time"), ("datetime", "timedelta"), ("datetime", "timezone"),
+    ("pytz", "_UTC"),
+    ("numpy", "dtype"), ("numpy", "ndarray"),
+    ("numpy.core.multiarray", "_reconstruct"), ("numpy.core.multiarray", "scalar"), ("numpy.core.numeric", "_frombuffer"),
+    ("numpy._core.multiarray", "_reconstruct"), ("numpy._core.multiarray", "scalar"), ("numpy._core.numeric", "_frombuffer"),
+    ("pandas._libs.arrays", "__pyx_unpickle_NDArrayBacked"),
+    ("pandas._libs.internals", "_unpickle_block"),
+    ("pandas._libs.tslibs.timestamps", "_unpickle_timestamp"),
+    ("pandas._libs.tslibs.timedeltas", "_timedelta_unpickle"),
+    ("pandas.core.arrays.datetimes", "DatetimeArray"),
+    ("pandas.core.dtypes.dtypes", "DatetimeTZDtype"),
+    ("pandas.core.frame", "DataFrame"),
+    ("pandas.core.series", "Series"),
+    ("pandas.core.indexes.base", "Index"), ("pandas.core.indexes.base", "_new_Index"),
+    ("pandas.core.indexes.range", "RangeIndex"),
+    ("pandas.core.indexes.datetimes", "DatetimeIndex"),
+    ("pandas.core.internals.managers", "BlockManager"), ("pandas.core.internals.managers", "SingleBlockManager"),
+}
+
+
+class GatewayUnpickler(pickle.Unpickler):
+    """
+    Unpickler of the gateway frames: only the allowed globals, the classes defined in the dto package and the
+    enums of misc_utils.enums can be loaded, so a crafted frame can not call arbitrary functions.
+    """
+
+    def find_class(self, module: str, name: str):
+        if (module, name) in ALLOWED_GLOBALS:
+            return super().find_class(module, name)
+        if module.startswith("dto.") or module == "misc_utils.enums":
+            cls = super().find_class(module, name)
+            # Solo classi definite nel modulo: niente funzioni o classi importate da altri moduli
+            if isinstance(cls, type) and cls.__module__ == module and (module != "misc_utils.enums" or issubclass(cls, Enum)):
+                return cls
+        raise pickle.UnpicklingError(f"Global {module}.{name} is not allowed in gateway frames")
+
+
+def _loads(frame: bytes) -> Any:
+    return GatewayUnpickler(io.BytesIO(frame)).load()
+
+
+def encode_token(token: Optional[str]) -> bytes:
+    return token.encode("utf-8") if token else b""
+
+
+def is_authorized(token_frame: bytes, token: bytes) -> bool:
+    """Checks the token frame of a request against the gateway token, in constant time."""
+    return hmac.compare_digest(token_frame, token)
+
+
+def encode_request(token: bytes, request_id: int, method: str, args: tuple, kwargs: Dict[str, Any]) -> Tuple[bytes, bytes, bytes]:
+    """
+    Encodes a broker call as three frames: the auth token, the request id and the pickled (method, args, kwargs) call.
+    Identical calls produce identical call frames, which is what the gateway uses to deduplicate them.
+    """
+    return token, request_id.to_bytes(8, "little"), pickle.dumps((method, args, kwargs), protocol=PICKLE_PROTOCOL)
+
+
+def decode_request(id_frame: bytes, call_frame: bytes) -> Tuple[int, str, tuple, Dict[str, Any]]:
+    """Decodes a call frame, only after its token frame has been checked with is_authorized."""
+    method, args, kwargs = _loads(call_frame)
+    if not isinstance(method, str) or not isinstance(args, tuple) or not isinstance(kwargs, dict):
+        raise ValueError("Malformed gateway call")
+    return int.from_bytes(id_frame, "little"), method, args, kwargs
+
+
+def encode_response(result: Any = None, error: Optional[str] = None) -> bytes:
+    return pickle.dumps((error is None, error if error is not None else result), protocol=PICKLE_PROTOCOL)
+
+
+def decode_response(frame: bytes) -> Tuple[bool, Any]:
+    """Returns (ok, payload): the call result when ok, otherwise the error message."""
+    return _loads(frame)
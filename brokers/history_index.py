@@ -0,0 +1,151 @@
+import asyncio
+from typing import Any, Callable, Awaitable, Dict, List, Optional, Iterable, Tuple
+
+from misc_utils.bot_logger import BotLogger
+
+# fetch(**filters) -> tuple of MT5 history records, e.g. history_deals_get(date_from=..., date_to=...) or (position=...)
+HistoryFetcher = Callable[..., Awaitable[Optional[Tuple[Any, ...]]]]
+
+DEAL_ENTRY_IN = 0
+
+
+class _RecordIndex:
+    """Raw MT5 history records (deals or orders) indexed by ticket, position id, symbol and magic number."""
+
+    def __init__(self, time_attr: str, order_attr: Optional[str] = None):
+        self.time_attr = time_attr
+        self.order_attr = order_attr
+        self.by_ticket: Dict[int, Any] = {}
+        self.by_position: Dict[int, Dict[int, Any]] = {}
+        self.by_order: Dict[int, Dict[int, Any]] = {}
+        self.by_symbol: Dict[str, Dict[int, Any]] = {}
+        self.by_magic: Dict[int, Dict[int, Any]] = {}
+
+    def add(self, records: Optional[Iterable[Any]]) -> int:
+        added = 0
+        for record in records or ():
+            if record.ticket not in self.by_ticket:
+                added += 1
+            self.by_ticket[record.ticket] = record
+            self.by_position.setdefault(record.position_id, {})[record.ticket] = record
+            self.by_symbol.setdefault(record.symbol, {})[record.ticket] = record
+            self.by_magic.setdefault(record.magic, {})[record.ticket] = record
+            if self.order_attr is not None:
+                self.by_order.setdefault(getattr(record, self.order_attr), {})[record.ticket] = record
+        return added
+
+    def _sorted(self, records: Iterable[Any]) -> List[Any]:
+        return sorted(records, key=lambda r: (r.symbol, getattr(r, self.time_attr), r.ticket))
+
+    def in_range(self, from_unix: int, to_unix: int, symbol: str, magic_number: Optional[int]) -> List[Any]:
+        # Stessa semantica del filtro group=f"*{symbol}*" di MT5
+        candidates = [r for key, records in self.by_symbol.items() if symbol in key for r in records.values()]
+        return self._sorted(r for r in candidates
+                            if from_unix <= getattr(r, self.time_attr) <= to_unix and (not magic_number or r.magic == magic_number))
+
+    def for_position(self, position_id: int) -> List[Any]:
+        return self._sorted(self.by_position.get(position_id, {}).values())
+
+    def for_order(self, order_ticket: int) -> List[Any]:
+        return self._sorted(self.by_order.get(order_ticket, {}).values())
+
+
+class HistoryIndex:
+    """
+    In-memory index of the account deal and order history.
+
+    A time range is loaded with one history_deals_get and one history_orders_get call for the whole account;
+    extending the range fetches only the missing parts. Since new deals keep arriving at the right edge,
+    a query reaching past the loaded range (minus a small overlap for late records) re-fetches only that tail.
+    Records are kept in their raw MT5 form and indexed by ticket, position id, order ticket, symbol and magic
+    number, so callers always map fresh DTOs. Records outside the loaded range (e.g. a deal of an old position)
+    are fetched individually and added to the index.
+    """
+
+    def __init__(self, agent: str, fetch_deals: HistoryFetcher, fetch_orders: HistoryFetcher, right_edge_overlap: int = 5 * 60):
+        self.logger = BotLogger.get_logger(agent)
+        self._fetch_deals = fetch_deals
+        self._fetch_orders = fetch_orders
+        self.right_edge_overlap = right_edge_overlap
+        self.deals = _RecordIndex(time_attr='time', order_attr='order')
+        self.orders = _RecordIndex(time_attr='time_setup')
+        self.loaded_from: Optional[int] = None
+        self.loaded_to: Optional[int] = None
+        self._lock = asyncio.Lock()
+        self.counters: Dict[str, int] = {"range_fetches": 0, "single_fetches": 0, "deals": 0, "orders": 0}
+
+    async def _load(self, from_unix: int, to_unix: int):
+        deals, orders = await asyncio.gather(
+            self._fetch_deals(date_from=from_unix, date_to=to_unix),
+            self._fetch_orders(date_from=from_unix, date_to=to_unix)
+        )
+        self.counters["range_fetches"] += 1
+        self.counters["deals"] += self.deals.add(deals)
+        self.counters["orders"] += self.orders.add(orders)
+
+    async def ensure_range(self, from_unix: int, to_unix: int):
+        """Makes sure that all the account history between the two broker unix timestamps is indexed."""
+        async with self._lock:
+            if self.loaded_from is None:
+                await self._load(from_unix, to_unix)
+                self.loaded_from, self.loaded_to = from_unix, to_unix
+                return
+
+            # The missing parts are loaded from the current bounds, so that no gap is left in the indexed range
+            if from_unix < self.loaded_from:
+                await self._load(from_unix, self.loaded_from)
+                self.loaded_from = from_unix
+
+            if to_unix > self.loaded_to - self.right_edge_overlap:
+                await self._load(self.loaded_to - self.right_edge_overlap, to_unix)
+                self.loaded_to = max(self.loaded_to, to_unix)
+
+    async def refresh(self, now_unix: int):
+        """Fetches the records added since the last load, up to now."""
+        if self.loaded_to is not None:
+            await self.ensure_range(self.loaded_from, now_unix)
+
+    def deals_in_range(self, from_unix: int, to_unix: int, symbol: str, magic_number: Optional[int] = None) -> List[Any]:
+        return self.deals.in_range(from_unix, to_unix, symbol, magic_number)
+
+    def deals_after(self, last_ticket: int, from_unix: int) -> List[Any]:
+        """Returns the indexed deals of any symbol with a ticket greater than last_ticket and time >= from_unix, sorted by ticket."""
+        return sorted((deal for deal in self.deals.by_ticket.values() if deal.ticket > last_ticket and deal.time >= from_unix), key=lambda deal: deal.ticket)
+
+    def orders_in_range(self, from_unix: int, to_unix: int, symbol: str, magic_number: Optional[int] = None) -> List[Any]:
+        return self.orders.in_range(from_unix, to_unix, symbol, magic_number)
+
+    async def deals_by_position(self, position_id: int, refetch: bool = False) -> List[Any]:
+        """Returns the deals of the position; refetch reads them again, e.g. after a partial close outside the loaded range."""
+        deals = self.deals.for_position(position_id)
+        # Without its entry deal the position was opened before the loaded range: fetch all its deals
+        if refetch or not any(deal.entry == DEAL_ENTRY_IN for deal in deals):
+            self.counters["single_fetches"] += 1
+            self.counters["deals"] += self.deals.add(await self._fetch_deals(position=position_id))
+            deals = self.deals.for_position(position_id)
+        return deals
+
+    async def deals_by_order(self, order_ticket: int) -> List[Any]:
+        deals = self.deals.for_order(order_ticket)
+        if not deals:
+            self.counters["single_fetches"] += 1
+            self.counters["deals"] += self.deals.add(await self._fetch_deals(ticket=order_ticket))
+            deals = self.deals.for_order(order_ticket)
+        return deals
+
+    async def order_by_ticket(self, order_ticket: int) -> Optional[Any]:
+        order = self.orders.by_ticket.get(order_ticket)
+        if order is None:
+            self.counters["single_fetches"] += 1
+            self.counters["orders"] += self.orders.add(await self._fetch_orders(ticket=order_ticket))
+            order = self.orders.by_ticket.get(order_ticket)
+        return order
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "loaded_from": self.loaded_from,
+            "loaded_to": self.loaded_to,
+            "indexed_deals": len(self.deals.by_ticket),
+            "indexed_orders": len(self.orders.by_ticket),
+            **self.counters
+        }
@@ -0,0 +1,231 @@
+import asyncio
+import calendar
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from brokers.candle_store import RatesFetcher
+from misc_utils.bot_logger import BotLogger
+from misc_utils.enums import Timeframe
+from misc_utils.utils_functions import create_directories, unix_to_datetime
+
+# fetch_range(symbol, timeframe, from_unix, to_unix) -> structured rates array with broker times in [from, to], as returned by copy_rates_range
+RangeFetcher = Callable[[str, Timeframe, int, int], Awaitable[Optional[np.ndarray]]]
+
+PartitionKey = Tuple[str, Timeframe, int]
+
+
+def month_start(unix: int) -> int:
+    dt = unix_to_datetime(unix)
+    return calendar.timegm((dt.year, dt.month, 1, 0, 0, 0))
+
+
+def next_month(month: int) -> int:
+    dt = unix_to_datetime(month)
+    return calendar.timegm((dt.year + dt.month // 12, dt.month % 12 + 1, 1, 0, 0, 0))
+
+
+def previous_month(month: int) -> int:
+    return month_start(month - 1)
+
+
+class HistoryStore:
+    """
+    Local cache of the historical rates of each (symbol, timeframe), partitioned by month of broker time.
+
+    Every partition is a npz file (cache_path/<symbol>/<timeframe>/<YYYY-MM>.npz) holding one array per rates
+    field, plus a flag telling whether the month is over. Missing months are downloaded with copy_rates_range,
+    one chunk per month, several chunks at a time; the current month is completed incrementally, downloading
+    only from its last stored bar onward. A past month is closed, and never downloaded again, once its bars reach
+    the last bar slot before the month end, or end at most max_closing_gap seconds before it (market closed over
+    a weekend or holiday) once completion_grace seconds have passed since the month end. Months returned empty
+    or with a longer gap, e.g. while the terminal is still synchronizing its history, are downloaded again.
+
+    get_rates serves windows of the last bars from the cache plus a small live tail read with copy_rates_from_pos,
+    so long lookbacks cost a couple of terminal calls once the cache is warm.
+    """
+
+    def __init__(self, agent: str, fetch_range: RangeFetcher, fetch_rates: RatesFetcher, cache_path: str = "output/history",
+                 max_concurrency: int = 4, tail_bars: int = 8, max_empty_months: int = 3, max_cached_partitions: int = 256,
+                 max_closing_gap: int = 4 * 86400, completion_grace: int = 86400):
+        self.logger = BotLogger.get_logger(agent)
+        self.cache_path = cache_path
+        self.max_concurrency = max_concurrency
+        self.tail_bars = tail_bars
+        self.max_empty_months = max_empty_months
+        self.max_cached_partitions = max_cached_partitions
+        self.max_closing_gap = max_closing_gap
+        self.completion_grace = completion_grace
+        self._fetch_range = fetch_range
+        self._fetch_rates = fetch_rates
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Partizioni in memoria (LRU): rates e flag di mese chiuso
+        self._partitions: OrderedDict[PartitionKey, Tuple[np.ndarray, bool]] = OrderedDict()
+        self._locks: Dict[PartitionKey, asyncio.Lock] = {}
+        self.counters: Dict[str, int] = {"window_reads": 0, "tail_fetches": 0, "memory_hits": 0, "disk_loads": 0,
+                                         "chunk_downloads": 0, "bars_downloaded": 0, "disk_writes": 0}
+
+    # Disk partitions
+
+    def _file_path(self, symbol: str, timeframe: Timeframe, month: int) -> str:
+        return os.path.join(self.cache_path, symbol, timeframe.name, f"{unix_to_datetime(month).strftime('%Y-%m')}.npz")
+
+    @staticmethod
+    def _read_partition(path: str) -> Optional[Tuple[np.ndarray, bool]]:
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            names = [name for name in data.files if name != '__complete__']
+            rates = np.empty(len(data['time']), dtype=[(name, data[name].dtype) for name in names])
+            for name in names:
+                rates[name] = data[name]
+            return rates, bool(data['__complete__'])
+
+    @staticmethod
+    def _write_partition(path: str, rates: np.ndarray, complete: bool):
+        create_directories(os.path.dirname(path))
+        # Scrittura atomica: file temporaneo e poi rename
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, __complete__=np.bool_(complete), **{name: rates[name] for name in rates.dtype.names})
+        os.replace(tmp_path, path)
+
+    def _cache(self, key: PartitionKey, rates: np.ndarray, complete: bool):
+        self._partitions[key] = (rates, complete)
+        self._partitions.move_to_end(key)
+        while len(self._partitions) > self.max_cached_partitions:
+            self._partitions.popitem(last=False)
+
+    async def _load_partition(self, key: PartitionKey) -> Optional[Tuple[np.ndarray, bool]]:
+        partition = self._partitions.get(key)
+        if partition is not None:
+            self._partitions.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            return partition
+        path = self._file_path(*key)
+        try:
+            partition = await asyncio.get_running_loop().run_in_executor(None, self._read_partition, path)
+        except Exception as e:
+            self.logger.error(f"Error reading history partition {path}, downloading it again: {e}")
+            return None
+        if partition is not None:
+            self.counters["disk_loads"] += 1
+            self._cache(key, *partition)
+        return partition
+
+    def _is_month_complete(self, rates: np.ndarray, timeframe: Timeframe, month_end: int, now_unix: int) -> bool:
+        """A past month is complete when its bars reach the month end, apart from a market closure once the grace period is over."""
+        if month_end > now_unix or len(rates) == 0:
+            return False
+        # Chiusura dell'ultima barra scaricata rispetto alla fine del mese
+        gap = month_end - (int(rates['time'][-1]) + timeframe.to_seconds())
+        return gap <= 0 or (gap <= self.max_closing_gap and now_unix >= month_end + self.completion_grace)
+
+    async def _ensure_partition(self, symbol: str, timeframe: Timeframe, month: int, now_unix: int) -> np.ndarray:
+        """Returns the rates of a month, downloading the bars not in the cache yet."""
+        key = (symbol, timeframe, month)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            partition = await self._load_partition(key)
+            if partition is not None and partition[1]:
+                return partition[0]
+
+            stored = partition[0] if partition is not None else None
+            month_end = next_month(month)
+            # L'ultima barra salvata potrebbe essere stata ancora aperta: si riscarica da lì
+            from_unix = int(stored['time'][-1]) if stored is not None and len(stored) > 0 else month
+            async with self._semaphore:
+                fetched = await self._fetch_range(symbol, timeframe, from_unix, month_end - 1)
+            if fetched is None:
+                raise Exception(f"Unable to download rates for {symbol} {timeframe.name} from {unix_to_datetime(from_unix)}")
+            self.counters["chunk_downloads"] += 1
+            self.counters["bars_downloaded"] += len(fetched)
+
+            if stored is not None and len(stored) > 0 and len(fetched) > 0:
+                keep = int(np.searchsorted(stored['time'], fetched['time'][0], side='left'))
+                rates = np.concatenate([stored[:keep], fetched.astype(stored.dtype, copy=False)])
+            elif stored is not None and len(fetched) == 0:
+                rates = stored
+            else:
+                rates = fetched
+            complete = self._is_month_complete(rates, timeframe, month_end, now_unix)
+
+            # Il mese corrente viene riscritto solo quando si aggiungono barre
+            if partition is None or complete or len(rates) > len(stored):
+                path = self._file_path(*key)
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, self._write_partition, path, rates, complete)
+                    self.counters["disk_writes"] += 1
+                except Exception as e:
+                    self.logger.error(f"Error writing history partition {path}: {e}")
+            self._cache(key, rates, complete)
+            return rates
+
+    # Public API
+
+    async def download(self, symbol: str, timeframe: Timeframe, from_unix: int, to_unix: int, now_unix: int) -> np.ndarray:
+        """
+        Returns the rates with broker time in [from_unix, to_unix], downloading the missing months concurrently.
+        now_unix is the current broker time: months ended before it are stored as closed.
+        """
+        months: List[int] = []
+        month = month_start(from_unix)
+        while month <= to_unix:
+            months.append(month)
+            month = next_month(month)
+        parts = await asyncio.gather(*(self._ensure_partition(symbol, timeframe, month, now_unix) for month in months))
+        rates = np.concatenate([part.astype(parts[-1].dtype, copy=False) for part in parts]) if len(parts) > 1 else parts[0]
+        times = rates['time']
+        return rates[int(np.searchsorted(times, from_unix, side='left')):int(np.searchsorted(times, to_unix, side='right'))]
+
+    async def get_rates(self, symbol: str, timeframe: Timeframe, position: int, count: int) -> Optional[np.ndarray]:
+        """
+        Same result as copy_rates_from_pos(symbol, timeframe, position, count): the last count bars (oldest first)
+        ending position bars before the open one. Only the last tail_bars bars are read from the terminal,
+        the older ones come from the monthly partitions.
+        """
+        tail_count = min(count, self.tail_bars)
+        tail = await self._fetch_rates(symbol, timeframe, position, tail_count)
+        self.counters["tail_fetches"] += 1
+        if tail is None or len(tail) < tail_count or count <= tail_count:
+            # Nessuno storico oltre la coda (o richiesta già soddisfatta)
+            return tail
+
+        self.counters["window_reads"] += 1
+        # La barra più recente della coda non è successiva all'ora corrente del broker
+        now_unix = int(tail['time'][-1])
+        end = int(tail['time'][0])
+        need = count - len(tail)
+        chunks: List[np.ndarray] = []
+        collected = 0
+        empty_months = 0
+        month = month_start(end)
+        # Mesi scaricati insieme: stima dei mesi necessari, considerando i fine settimana
+        estimated_months = (need * timeframe.to_seconds() * 3 // 2) // (30 * 86400) + 1
+        months_per_round = max(1, min(self.max_concurrency, estimated_months))
+        while collected < need and empty_months < self.max_empty_months:
+            months = [month]
+            while len(months) < months_per_round:
+                months.append(previous_month(months[-1]))
+            month = previous_month(months[-1])
+            parts = await asyncio.gather(*(self._ensure_partition(symbol, timeframe, m, now_unix) for m in months))
+            for part in parts:
+                part = part[:int(np.searchsorted(part['time'], end, side='left'))] if len(part) > 0 else part
+                if len(part) == 0:
+                    empty_months += 1
+                    if empty_months >= self.max_empty_months:
+                        break
+                    continue
+                empty_months = 0
+                chunks.append(part)
+                collected += len(part)
+                if collected >= need:
+                    break
+
+        chunks.reverse()
+        chunks.append(tail.astype(chunks[0].dtype, copy=False) if chunks else tail)
+        return np.concatenate(chunks)[-count:]
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"cached_partitions": len(self._partitions), **self.counters}
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from misc_utils.bot_logger import BotLogger
+from misc_utils.enums import Timeframe
+from misc_utils.latency_stats import LatencyRegistry
+
+# (account, symbol, timeframe): account is None for the single broker
+FeedKey = Tuple[Optional[int], str, Timeframe]
+
+
+class CandleFeed:
+    """Candles of a (account, symbol, timeframe) fetched for the current bar, shared by all its subscribers."""
+
+    def __init__(self):
+        self.subscribers: Set[str] = set()
+        self.bar_close: Optional[int] = None
+        self.bar_requested_at: Optional[float] = None
+        self.columns: Optional[Dict[str, np.ndarray]] = None
+        self.rows = 0
+        self.inflight: Optional[asyncio.Future] = None
+        self.inflight_count = 0
+        self.inflight_bar_close: Optional[int] = None
+        self.counters: Dict[str, int] = {"requests": 0, "fetches": 0, "shared": 0, "failed": 0}
+
+
+class MarketDataHub:
+    """
+    Singleton owning candle retrieval per (account, symbol, timeframe).
+
+    All the agents on the same symbol and timeframe ask for their candles at the same bar close; the first request
+    of a bar fetches them from the broker, concurrent requests join the fetch in flight and later ones are served
+    from the fetched candles, until the next bar closes. Every agent receives its own DataFrame built on the same
+    read-only column arrays, so agents can add their own columns without copying or altering the shared ones.
+    """
+    _instance: Optional['MarketDataHub'] = None
+    _lock = threading.Lock()
+
+    def __new__(cls) -> 'MarketDataHub':
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._feeds: Dict[FeedKey, CandleFeed] = {}
+                    cls._instance.fetch_latency = LatencyRegistry()
+                    cls._instance.fanout_latency = LatencyRegistry()
+                    cls._instance.logger = BotLogger.get_logger("MarketDataHub")
+        return cls._instance
+
+    def subscribe(self, subscriber_id: str, symbol: str, timeframe: Timeframe, account: Optional[int] = None):
+        self._feeds.setdefault((account, symbol, timeframe), CandleFeed()).subscribers.add(subscriber_id)
+
+    def unsubscribe(self, subscriber_id: str, symbol: str, timeframe: Timeframe, account: Optional[int] = None):
+        key = (account, symbol, timeframe)
+        feed = self._feeds.get(key)
+        if feed is None:
+            return
+        feed.subscribers.discard(subscriber_id)
+        if not feed.subscribers and feed.inflight is None:
+            # Nessun altro consumatore: le candele condivise non servono più
+            del self._feeds[key]
+
+    async def get_candles(self, broker: Any, symbol: str, timeframe: Timeframe, count: int, account: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """
+        Same result as broker.get_rolling_candles(symbol, timeframe, count), fetched once per bar close for all the
+        callers of the (account, symbol, timeframe). Returns None if the fetch failed.
+        """
+        key = (account, symbol, timeframe)
+        feed = self._feeds.setdefault(key, CandleFeed())
+        feed.counters["requests"] += 1
+        timeframe_seconds = timeframe.to_seconds()
+        bar_close = int(time.time()) // timeframe_seconds * timeframe_seconds
+        if feed.bar_close != bar_close:
+            # Nuova barra: le candele della barra precedente non valgono più
+            feed.bar_close = bar_close
+            feed.bar_requested_at = time.perf_counter()
+            feed.columns = None
+            feed.rows = 0
+
+        if feed.columns is not None and feed.rows >= count:
+            feed.counters["shared"] += 1
+            columns = feed.columns
+        elif feed.inflight is not None and feed.inflight_bar_close == bar_close and feed.inflight_count >= count:
+            # Solo fetch avviati dopo la chiusura della stessa barra: uno della barra precedente non la contiene
+            feed.counters["shared"] += 1
+            columns = await asyncio.shield(feed.inflight)
+        else:
+            columns = await self._fetch(feed, broker, symbol, timeframe, count, bar_close)
+
+        self.fanout_latency.record(f"{symbol}_{timeframe.name}", time.perf_counter() - feed.bar_requested_at)
+        if columns is None:
+            return None
+        rows = len(next(iter(columns.values()))) if columns else 0
+        return pd.DataFrame({name: values[rows - min(count, rows):] for name, values in columns.items()}, copy=False)
+
+    async def _fetch(self, feed: CandleFeed, broker: Any, symbol: str, timeframe: Timeframe, count: int, bar_close: int) -> Optional[Dict[str, np.ndarray]]:
+        future = asyncio.get_running_loop().create_future()
+        feed.inflight, feed.inflight_count, feed.inflight_bar_close = future, count, bar_close
+        columns = None
+        start = time.perf_counter()
+        try:
+            candles = await broker.get_rolling_candles(symbol, timeframe, count)
+            feed.counters["fetches"] += 1
+            self.fetch_latency.record(f"{symbol}_{timeframe.name}", time.perf_counter() - start)
+            if candles is None:
+                feed.counters["failed"] += 1
+            else:
+                columns = {}
+                for name in candles.columns:
+                    values = candles[name].to_numpy()
+                    # Sola lettura: i DataFrame dei consumatori sono costruiti sugli stessi array
+                    values.flags.writeable = False
+                    columns[name] = values
+                if feed.bar_close == bar_close:
+                    feed.columns, feed.rows = columns, len(candles)
+        except Exception as e:
+            feed.counters["failed"] += 1
+            self.logger.error(f"Error fetching {count} {timeframe.name} candles of {symbol}: {e}")
+        finally:
+            if feed.inflight is future:
+                feed.inflight, feed.inflight_count, feed.inflight_bar_close = None, 0, None
+            future.set_result(columns)
+        return columns
+
+    def get_stats(self) -> Dict[str, Any]:
+        feeds = {}
+        for (account, symbol, timeframe), feed in self._feeds.items():
+            name = f"{symbol}_{timeframe.name}" if account is None else f"{account}_{symbol}_{timeframe.name}"
+            feeds[name] = {"subscribers": len(feed.subscribers), "rows": feed.rows, **feed.counters}
+        return {"feeds": feeds, "fetch_latency": self.fetch_latency.snapshot(), "fanout_latency": self.fanout_latency.snapshot()}
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+import zmq
+import zmq.asyncio
+
+from misc_utils.bot_logger import BotLogger
+from misc_utils.enums import Timeframe
+from misc_utils.latency_stats import LatencyRegistry
+from misc_utils.utils_functions import unix_to_datetime, dt_to_unix
+
+MARKET_STREAM_SERVICE_PORT = 5558
+
+TICK_TOPIC = "TICK"
+BAR_TOPIC = "BAR"
+HEARTBEAT_TOPIC = "HEARTBEAT"
+
+
+@dataclass
+class StreamTick:
+    symbol: str
+    time: datetime  # UTC
+    bid: float
+    ask: float
+    last: float
+    volume: int
+
+
+@dataclass
+class StreamBar:
+    symbol: str
+    timeframe: Timeframe
+    time_open: datetime  # UTC
+    time_close: datetime  # UTC
+    open: float
+    high: float
+    low: float
+    close: float
+    tick_volume: int
+    spread: int
+    real_volume: int
+
+
+TickCallback = Callable[[StreamTick], Awaitable[None]]
+BarCallback = Callable[[StreamBar], Awaitable[None]]
+
+
+def bar_topic(symbol: str, timeframe: Timeframe) -> str:
+    return f"{BAR_TOPIC}:{symbol}:{timeframe.name}"
+
+
+def tick_topic(symbol: str) -> str:
+    return f"{TICK_TOPIC}:{symbol}"
+
+
+class MarketStreamSubscriber:
+    """
+    asyncio SUB client of the MarketStream MQL5 service, which publishes ticks and finalized bars.
+
+    Messages are two frames: the topic ('TICK:<symbol>', 'BAR:<symbol>:<timeframe>' or 'HEARTBEAT') and a JSON
+    payload with broker times plus the server UTC offset, so that events are delivered with UTC datetimes.
+    Only the topics with registered observers are subscribed. Observers of a topic are notified concurrently
+    without blocking the receive loop. The heartbeat tells a quiet market apart from a stopped service:
+    is_alive() is False when nothing was received for stale_after seconds.
+    """
+
+    def __init__(self, agent: str, host: str = "127.0.0.1", port: int = MARKET_STREAM_SERVICE_PORT, stale_after: float = 10.0):
+        self.logger = BotLogger.get_logger(agent)
+        self.endpoint = f"tcp://{host}:{port}"
+        self.stale_after = stale_after
+        self._socket: Optional[zmq.asyncio.Socket] = None
+        self._receiver_task: Optional[asyncio.Task] = None
+        self._tick_observers: Dict[str, Dict[str, TickCallback]] = {}
+        self._bar_observers: Dict[str, Dict[str, BarCallback]] = {}
+        self._last_bar_time: Dict[str, datetime] = {}
+        self.last_message_at: Optional[float] = None
+        self.delivery_latency = LatencyRegistry()
+        self.counters: Dict[str, int] = {"ticks": 0, "bars": 0, "heartbeats": 0, "duplicated_bars": 0, "errors": 0}
+
+    @property
+    def is_running(self) -> bool:
+        return self._receiver_task is not None
+
+    def is_alive(self) -> bool:
+        return self.last_message_at is not None and time.monotonic() - self.last_message_at <= self.stale_after
+
+    def start(self):
+        if self._socket is not None:
+            return
+        self._socket = zmq.asyncio.Context.instance().socket(zmq.SUB)
+        self._socket.setsockopt(zmq.LINGER, 0)
+        self._socket.connect(self.endpoint)
+        self._socket.setsockopt_string(zmq.SUBSCRIBE, HEARTBEAT_TOPIC)
+        for topic in list(self._tick_observers) + list(self._bar_observers):
+            self._socket.setsockopt_string(zmq.SUBSCRIBE, topic)
+        self._receiver_task = asyncio.create_task(self._receive_loop())
+        self.logger.info(f"Market stream subscriber connected to {self.endpoint}")
+
+    async def stop(self):
+        if self._receiver_task is not None:
+            self._receiver_task.cancel()
+            try:
+                await self._receiver_task
+            except asyncio.CancelledError:
+                pass
+            self._receiver_task = None
+        if self._socket is not None:
+            self._socket.close(linger=0)
+            self._socket = None
+
+    def _subscribe(self, observers: Dict[str, Dict], topic: str, observer_id: str, callback):
+        if topic not in observers:
+            observers[topic] = {}
+            if self._socket is not None:
+                self._socket.setsockopt_string(zmq.SUBSCRIBE, topic)
+        observers[topic][observer_id] = callback
+
+    def _unsubscribe(self, observers: Dict[str, Dict], topic: str, observer_id: str):
+        topic_observers = observers.get(topic)
+        if topic_observers is None:
+            return
+        topic_observers.pop(observer_id, None)
+        if not topic_observers:
+            del observers[topic]
+            if self._socket is not None:
+                self._socket.setsockopt_string(zmq.UNSUBSCRIBE, topic)
+
+    def register_tick_observer(self, symbol: str, callback: TickCallback, observer_id: str):
+        self._subscribe(self._tick_observers, tick_topic(symbol), observer_id, callback)
+
+    def unregister_tick_observer(self, symbol: str, observer_id: str):
+        self._unsubscribe(self._tick_observers, tick_topic(symbol), observer_id)
+
+    def register_bar_observer(self, symbol: str, timeframe: Timeframe, callback: BarCallback, observer_id: str):
+        self._subscribe(self._bar_observers, bar_topic(symbol, timeframe), observer_id, callback)
+
+    def unregister_bar_observer(self, symbol: str, timeframe: Timeframe, observer_id: str):
+        self._unsubscribe(self._bar_observers, bar_topic(symbol, timeframe), observer_id)
+
+    async def _receive_loop(self):
+        try:
+            while True:
+                topic_frame, payload_frame = (await self._socket.recv_multipart())[-2:]
+                self.last_message_at = time.monotonic()
+                topic = topic_frame.decode("utf-8")
+                try:
+                    self._dispatch(topic, json.loads(payload_frame.decode("utf-8")))
+                except Exception as e:
+                    self.counters["errors"] += 1
+                    self.logger.error(f"Invalid market stream message on {topic}: {e}")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.logger.error(f"Market stream receive loop terminated: {e}")
+            self._receiver_task = None
+
+    def _dispatch(self, topic: str, payload: dict):
+        if topic == HEARTBEAT_TOPIC:
+            self.counters["heartbeats"] += 1
+            return
+
+        offset = timedelta(seconds=payload.get("server_offset", 0))
+        if topic.startswith(BAR_TOPIC):
+            bar = self._parse_bar(payload, offset)
+            # Dopo una riconnessione il servizio può ripubblicare l'ultima barra
+            if self._last_bar_time.get(topic) is not None and bar.time_open <= self._last_bar_time[topic]:
+                self.counters["duplicated_bars"] += 1
+                return
+            self._last_bar_time[topic] = bar.time_open
+            self.counters["bars"] += 1
+            self.delivery_latency.record(topic, max(0.0, time.time() - dt_to_unix(bar.time_close)))
+            self._notify(self._bar_observers.get(topic), bar)
+        elif topic.startswith(TICK_TOPIC):
+            self.counters["ticks"] += 1
+            tick = StreamTick(
+                symbol=payload["symbol"],
+                time=unix_to_datetime(payload["time_msc"] / 1000) - offset,
+                bid=payload["bid"],
+                ask=payload["ask"],
+                last=payload.get("last", 0.0),
+                volume=payload.get("volume", 0)
+            )
+            self._notify(self._tick_observers.get(topic), tick)
+
+    @staticmethod
+    def _parse_bar(payload: dict, offset: timedelta) -> StreamBar:
+        timeframe = Timeframe[payload["timeframe"]]
+        time_open = unix_to_datetime(payload["time"]) - offset
+        return StreamBar(
+            symbol=payload["symbol"],
+            timeframe=timeframe,
+            time_open=time_open,
+            time_close=time_open + timedelta(seconds=timeframe.to_seconds()),
+            open=payload["open"],
+            high=payload["high"],
+            low=payload["low"],
+            close=payload["close"],
+            tick_volume=payload.get("tick_volume", 0),
+            spread=payload.get("spread", 0),
+            real_volume=payload.get("real_volume", 0)
+        )
+
+    def _notify(self, observers: Optional[Dict[str, Callable]], event):
+        for observer_id, callback in list((observers or {}).items()):
+            task = asyncio.create_task(callback(event))
+            task.add_done_callback(lambda t, oid=observer_id: self._on_notified(t, oid))
+
+    def _on_notified(self, task: asyncio.Task, observer_id: str):
+        if not task.cancelled() and task.exception() is not None:
+            self.counters["errors"] += 1
+            self.logger.error(f"Error notifying market stream observer {observer_id}: {task.exception()}")
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            "endpoint": self.endpoint,
+            "alive": self.is_alive(),
+            "subscriptions": len(self._tick_observers) + len(self._bar_observers),
+            **self.counters,
+            "bar_delivery_latency": self.delivery_latency.snapshot()
+        }
@@ -1,26 +1,39 @@
 import asyncio
 import json
 import os
-import uuid
+import time
 from datetime import timedelta, datetime
-from typing import Any, Optional, Tuple, List, Dict
+from typing import Any, Optional, Tuple, List, Dict, Callable
 
 import MetaTrader5 as mt5
+import numpy as np
 import pandas as pd
-import zmq
 
+from brokers.broker_clock import BrokerClock
 from brokers.broker_interface import BrokerAPI
+from brokers.candle_store import CandleStoreRegistry
+from brokers.history_index import HistoryIndex
+from brokers.history_store import HistoryStore
+from brokers.mt5_executor import MT5Executor
+from brokers.position_snapshot import PositionSnapshot, RawPositionChange
+from brokers.quote_cache import QuoteCache
+from brokers.session_calendar import SessionCalendarCache
+from brokers.symbol_metadata_cache import SymbolMetadataCache, SymbolMetadata
+from brokers.zmq_client import ZmqClientPool
 from dto.BrokerOrder import BrokerOrder
 from dto.Deal import Deal
-from dto.EconomicEvent import EconomicEvent, map_from_metatrader
+from dto.EconomicEvent import EconomicEvent, EventImportance, map_from_metatrader
 from dto.OrderRequest import OrderRequest
+from dto.OrderTemplate import OrderTemplate
 from dto.Position import Position
+from dto.PositionChange import PositionChange, PositionChangeFeed, OpenPositionsSnapshot
 from dto.RequestResult import RequestResult
 from dto.SymbolInfo import SymbolInfo
 from dto.SymbolPrice import SymbolPrice
 from misc_utils.bot_logger import BotLogger
-from misc_utils.enums import Timeframe, FillingType, OpType, DealType, OrderSource, PositionType, OrderType
+from misc_utils.enums import Timeframe, FillingType, OpType, DealType, OrderSource, PositionType, OrderType, PositionChangeType
 from misc_utils.error_handler import exception_handler
+from misc_utils.latency_stats import LatencyRegistry
 from misc_utils.utils_functions import now_utc, dt_to_unix, unix_to_datetime
 
 # https://www.mql5.com/en/docs/constants/tradingconstants/dealproperties
@@ -28,6 +41,11 @@ from misc_utils.utils_functions import now_utc, dt_to_unix, unix_to_datetime
 # https://www.mql5.com/en/docs/python_metatrader5/mt5positionsget_py
 # https://www.mql5.com/en/docs/python_metatrader5/mt5historydealsget_py
 
+# Ports of the MQL5 ZMQ services
+SERVER_TIME_SERVICE_PORT = 5555
+MARKET_HOURS_SERVICE_PORT = 9999
+ECONOMIC_CALENDAR_SERVICE_PORT = 5557
+
 ORDER_TYPE_MAPPING = {
     0: OrderType.BUY,  # DEAL_TYPE_BUY
     1: OrderType.SELL,  # DEAL_TYPE_SELL
@@ -37,6 +55,8 @@ ORDER_TYPE_MAPPING = {
 DEAL_TYPE_MAPPING = {
     0: DealType.ENTER,  # DEAL_ENTRY_IN
     1: DealType.EXIT,  # DEAL_ENTRY_OUT
+    2: DealType.INOUT,  # DEAL_ENTRY_INOUT
+    3: DealType.EXIT_BY,  # DEAL_ENTRY_OUT_BY
     # Other types are classified as 'OTHER'
 }
 
@@ -61,6 +81,10 @@ REASON_MAPPING = {
 }
 
 
+def _symbols_info_tick(symbols: List[str]) -> List[Optional[Any]]:
+    return [mt5.symbol_info_tick(symbol) for symbol in symbols]
+
+
 class MT5Broker(BrokerAPI):
 
     def __init__(self, agent: str, configuration: Dict):
@@ -71,31 +95,61 @@ class MT5Broker(BrokerAPI):
         self.server = configuration['server']
         self.path = configuration['path']
         self._running = False
+        self.mt5_executor = MT5Executor(agent)
+        self.zmq_pool = ZmqClientPool(agent)
+        self.broker_clock = BrokerClock(agent, self._fetch_broker_timezone_offset)
+        self.session_calendars = SessionCalendarCache(agent, self._load_market_hours)
+        self.symbol_metadata = SymbolMetadataCache(agent, self._load_market_info, self._probe_filling_mode)
+        self.history_store = HistoryStore(agent, self._copy_rates_range, self._copy_rates_from_pos, configuration.get('history_cache_path') or "output/history")
+        # Le finestre lunghe (caricamenti completi degli store) sono servite dallo storico su disco
+        self.candle_stores = CandleStoreRegistry(agent, self.history_store.get_rates)
+        self.quote_cache = QuoteCache(agent, self._fetch_ticks)
+        self.order_latency = LatencyRegistry()
+        self.position_snapshot = PositionSnapshot(agent, lambda: self._mt5_call(mt5.positions_get), self._load_position_deals)
+        self._calendar_bulk_supported = True
+        self.history_index = HistoryIndex(agent,
+                                          lambda **filters: self._mt5_call(mt5.history_deals_get, **filters),
+                                          lambda **filters: self._mt5_call(mt5.history_orders_get, **filters))
+
+    async def _mt5_call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs a MetaTrader5 API function on the dedicated MT5 thread, keeping the event loop free."""
+        return await self.mt5_executor.call(func, *args, **kwargs)
+
+    @exception_handler
+    async def get_mt5_call_stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Returns per MT5 function queue-wait and execution timings of the MT5 thread."""
+        return self.mt5_executor.get_stats()
 
     @exception_handler
     async def startup(self) -> bool:
-        if not mt5.initialize(path=self.path):
-            self.logger.error(f"initialization failed, error code {mt5.last_error()}")
-            mt5.shutdown()
+        self.mt5_executor.start()
+
+        if not await self._mt5_call(mt5.initialize, path=self.path):
+            self.logger.error(f"initialization failed, error code {await self._mt5_call(mt5.last_error)}")
+            await self._mt5_call(mt5.shutdown)
             raise Exception("Failed to initialize MT5")
         self.logger.info("MT5 initialized successfully")
 
-        if not mt5.login(self.account, password=self.password, server=self.server):
-            e = Exception(mt5.last_error())
+        if not await self._mt5_call(mt5.login, self.account, password=self.password, server=self.server):
+            e = Exception(await self._mt5_call(mt5.last_error))
             self.logger.error(f"Failed to connect to account #{self.account}", e)
             raise Exception("Failed to initialize MT5")
 
         self.logger.info("Login success")
-        self.logger.info(mt5.account_info())
+        self.logger.info(await self._mt5_call(mt5.account_info))
 
         self._running = True
+        self.quote_cache.start()
         return True
 
     @exception_handler
     async def shutdown(self):
-        mt5.shutdown()
+        await self.quote_cache.stop()
+        await self._mt5_call(mt5.shutdown)
         self.logger.info("MT5 shutdown successfully.")
         self._running = False
+        await self.zmq_pool.close()
+        self.mt5_executor.stop()
 
     # Conversion Methods
     def filling_type_to_mt5(self, filling_type: FillingType) -> int:
@@ -144,131 +198,170 @@ class MT5Broker(BrokerAPI):
         return conversion_dict[mt5_order_type]
 
     # Utility and Market Data Methods
+    @exception_handler
+    async def get_account_id(self) -> int:
+        return int(self.account)
+
     @exception_handler
     async def get_broker_name(self) -> str:
-        return mt5.account_info().company
+        account_info = await self._mt5_call(mt5.account_info)
+        return account_info.company
 
     @exception_handler
-    async def is_market_open(self, symbol: str) -> bool:
+    async def is_market_open(self, symbol: str, utc_timestamp: Optional[datetime] = None) -> bool:
         """Check if the market is open for the given symbol, including session validation."""
         # Controlla se il simbolo è valido e recupera le informazioni
-        symbol_info = mt5.symbol_info(symbol)
+        symbol_info = await self._mt5_call(mt5.symbol_info, symbol)
         if symbol_info is None:
             self.logger.warning(f"{symbol} not found, cannot retrieve symbol info.")
             return False
 
+        # Un cambio di trade mode invalida i metadati del simbolo in cache
+        self.symbol_metadata.observe_trade_mode(symbol, symbol_info.trade_mode)
+
         # Verifica che il simbolo non sia in modalità di trade disabilitata
         if symbol_info.trade_mode == mt5.SYMBOL_TRADE_MODE_DISABLED:
             self.logger.info(f"{symbol} is in trade mode disabled.")
             return False
 
         # Controlla se ci si trova in una sessione di trading attiva
-        if not await self.is_active_session(symbol, now_utc()):
+        if not await self.is_active_session(symbol, utc_timestamp or now_utc()):
             self.logger.info(f"{symbol} is not in an active trading session.")
             return False
 
         # Il mercato è aperto e ci si trova in una sessione attiva
         return True
 
+    async def _load_market_hours(self, symbol: str) -> Optional[dict]:
+        return await self.do_zmq_request(MARKET_HOURS_SERVICE_PORT, symbol)
+
     @exception_handler
-    async def is_active_session(self, symbol: str, utc_timestamp: datetime):
+    async def is_active_session(self, symbol: str, utc_timestamp: datetime) -> bool:
         """
-        Verifica se la sessione indicata è attiva in base all'ora 'brokerizzata' (UTC + offset)
-        e alla configurazione delle fasce orarie per quel giorno della settimana.
-
-        NOTA: non si gestisce il wrapping oltre mezzanotte, per cui se start_time > end_time
-        è considerato invalido e la sessione risulta sempre inattiva.
+        Verifica se la sessione indicata è attiva in base all'ora 'brokerizzata' (UTC + offset),
+        usando il calendario settimanale delle sessioni del simbolo tenuto in memoria.
+        Sono gestite più sessioni per giorno e le sessioni che attraversano la mezzanotte.
         """
-        # 1. Calcolo dell'ora locale del broker
         broker_offset_hours = await self.get_broker_timezone_offset()
         if broker_offset_hours is None:
             self.logger.error("Broker timezone offset is None")
             return False
 
-        broker_timestamp = utc_timestamp + timedelta(hours=broker_offset_hours)
-
-        # 2. Ricavo il giorno della settimana in base all'ora del broker
-        day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        broker_day_index = broker_timestamp.weekday()  # Monday=0, Sunday=6
-        broker_day_name = day_names[broker_day_index]
-
-        # 3. Carico i dati di mercato (simulati)
-        market_hours = await self.do_zmq_request(9999, symbol)
-        if not market_hours or 'sessions' not in market_hours:
-            self.logger.error(f"Invalid market hours data received: {market_hours}")
-            return False
-
-        sessions = market_hours.get('sessions', [])
-        if not isinstance(sessions, list):
-            self.logger.error("Sessions data is not a list")
+        session_calendar = await self.session_calendars.get_calendar(symbol)
+        if session_calendar is None:
+            self.logger.error(f"Session calendar not available for {symbol}")
             return False
 
-        # 4. Trova la sessione (se presente) per il "broker_day_name"
-        session = next((s for s in sessions if s['day'] == broker_day_name), None)
-        if not session:
-            # Non ci sono fasce orarie per questo giorno
-            return False
+        broker_timestamp = self.broker_clock.utc_to_broker(utc_timestamp, broker_offset_hours)
+        is_active = session_calendar.is_open(broker_timestamp)
+        self.logger.debug(f"Broker time: {broker_timestamp}, Session active: {is_active}")
+        return is_active
 
-        # 5. Parsing dell'ora di inizio e fine
-        try:
-            start_time = datetime.strptime(session['start_time'], '%H:%M').time()
-            end_time = datetime.strptime(session['end_time'], '%H:%M').time()
-        except ValueError as ve:
-            self.logger.error(f"Invalid time format in session data: {session} -> Error: {ve}")
-            return False
+    @exception_handler
+    async def get_next_market_open(self, symbol: str, utc_timestamp: Optional[datetime] = None) -> Optional[datetime]:
+        """Returns the UTC time of the next trading session start of the symbol after utc_timestamp (default now)."""
+        return await self._next_session_event(symbol, utc_timestamp, open_event=True)
 
-        broker_time = broker_timestamp.time()
-        self.logger.debug(
-            f"Broker time: {broker_time}, "
-            f"Start time: {start_time}, "
-            f"End time: {end_time}, "
-            f"Day: {broker_day_name}"
-        )
+    @exception_handler
+    async def get_next_market_close(self, symbol: str, utc_timestamp: Optional[datetime] = None) -> Optional[datetime]:
+        """Returns the UTC time at which the current (or next) trading session of the symbol ends."""
+        return await self._next_session_event(symbol, utc_timestamp, open_event=False)
 
-        # 6. Verifica se broker_time rientra nella finestra [start_time, end_time]
-        #    Se start_time > end_time, consideriamo la sessione non valida (niente wrap)
-        if start_time > end_time:
-            is_active = False
-        else:
-            is_active = start_time <= broker_time <= end_time
+    async def _next_session_event(self, symbol: str, utc_timestamp: Optional[datetime], open_event: bool) -> Optional[datetime]:
+        broker_offset_hours = await self.get_broker_timezone_offset()
+        session_calendar = await self.session_calendars.get_calendar(symbol)
+        if broker_offset_hours is None or session_calendar is None:
+            return None
 
-        self.logger.debug(f"Session active: {is_active}")
-        return is_active
+        broker_timestamp = self.broker_clock.utc_to_broker(utc_timestamp or now_utc(), broker_offset_hours)
+        event = session_calendar.next_open(broker_timestamp) if open_event else session_calendar.next_close(broker_timestamp)
+        return self.broker_clock.broker_to_utc(event, broker_offset_hours) if event is not None else None
 
     @exception_handler
     async def get_economic_calendar(self, country: str, from_datetime: datetime, to_datetime: datetime) -> List[EconomicEvent]:
         # richiedi gli id
         events_ids_request = f"LIST_IDS:{country}:{dt_to_unix(from_datetime)}:{dt_to_unix(to_datetime)}"
-        events_ids = await self.do_zmq_request(5557, events_ids_request)
+        events_ids = await self.do_zmq_request(ECONOMIC_CALENDAR_SERVICE_PORT, events_ids_request)
         self.logger.debug(f"Events ids: {events_ids} ")
         broker_offset_hours = await self.get_broker_timezone_offset()
+
+        # richiedi i singoli eventi, inviando le richieste in pipeline sulla stessa connessione
+        events_details = await asyncio.gather(*(
+            self.do_zmq_request(ECONOMIC_CALENDAR_SERVICE_PORT, f"GET_EVENT:{country}:{dt_to_unix(from_datetime)}:{dt_to_unix(to_datetime)}:{event_id}")
+            for event_id in events_ids
+        ))
         events = []
-        for event_id in events_ids:
-            # richiedi il singoilo evento
-            event_details_request = f"GET_EVENT:{country}:{dt_to_unix(from_datetime)}:{dt_to_unix(to_datetime)}:{event_id}"
-            event = await self.do_zmq_request(5557, event_details_request)
+        for event in events_details:
             self.logger.debug(f"Event details: {event}")
             events.append(map_from_metatrader(event, broker_offset_hours))
 
         return events
 
+    @exception_handler
+    async def get_economic_calendar_events(self, countries: List[str], from_datetime: datetime, to_datetime: datetime,
+                                           min_importance: EventImportance = EventImportance.NONE) -> List[EconomicEvent]:
+        """
+        Returns the events of all the given countries with importance >= min_importance using a single LIST_EVENTS
+        request. If the calendar service does not support it, countries are fetched concurrently with get_economic_calendar.
+        """
+        countries = list(dict.fromkeys(countries))
+        if not countries:
+            return []
+
+        if self._calendar_bulk_supported:
+            request = f"LIST_EVENTS:{','.join(countries)}:{dt_to_unix(from_datetime)}:{dt_to_unix(to_datetime)}:{min_importance.value}"
+            response = await self.do_zmq_request(ECONOMIC_CALENDAR_SERVICE_PORT, request)
+            if isinstance(response, list):
+                broker_offset_hours = await self.get_broker_timezone_offset()
+                return [map_from_metatrader(event, broker_offset_hours) for event in response]
+            self.logger.warning(f"LIST_EVENTS not supported by the economic calendar service ({response}), falling back to per-country requests.")
+            self._calendar_bulk_supported = False
+
+        results = await asyncio.gather(*(self.get_economic_calendar(country, from_datetime, to_datetime) for country in countries))
+        return [event for country_events in results if country_events for event in country_events if event.importance.value >= min_importance.value]
+
     @exception_handler
     async def get_symbol_price(self, symbol: str) -> Optional[SymbolPrice]:
-        symbol_tick = mt5.symbol_info_tick(symbol)
-        if symbol_tick is None:
+        symbol_price = await self.quote_cache.get_price(symbol)
+        if symbol_price is None:
             self.logger.warning(f"{symbol} not found.")
-            return None
-        return SymbolPrice(symbol_tick.ask, symbol_tick.bid)
+        return symbol_price
+
+    @exception_handler
+    async def get_quote_stats(self) -> Dict[str, Any]:
+        """Returns the quote cache hit/miss counters and the age of the cached and served quotes."""
+        return self.quote_cache.get_stats()
+
+    async def _fetch_ticks(self, symbols: List[str]) -> List[Optional[Any]]:
+        # Una sola chiamata al thread MT5 per tutti i simboli da aggiornare
+        return await self._mt5_call(_symbols_info_tick, symbols)
 
     @exception_handler
     async def get_broker_timezone_offset(self) -> Optional[int]:
-        offset_hours = await self.do_zmq_request(5555, "GetBrokerTimezoneOffset")
+        # Servito dalla cache del BrokerClock, il servizio ZMQ viene interrogato solo al refresh
+        return await self.broker_clock.get_offset()
+
+    async def _fetch_broker_timezone_offset(self) -> Optional[int]:
+        offset_hours = await self.do_zmq_request(SERVER_TIME_SERVICE_PORT, "GetBrokerTimezoneOffset")
         self.logger.debug(f"Offset hours: {offset_hours} ")
         return offset_hours.get("time_difference")
 
     @exception_handler
     async def get_market_info(self, symbol: str) -> Optional[SymbolInfo]:
-        symbol_info = mt5.symbol_info(symbol)
+        # Servito dalla cache dei metadati, il terminale viene interrogato solo a scadenza o invalidazione
+        return await self.symbol_metadata.get_symbol_info(symbol)
+
+    @exception_handler
+    async def get_symbol_metadata(self, symbol: str) -> Optional[SymbolMetadata]:
+        return await self.symbol_metadata.get(symbol)
+
+    @exception_handler
+    async def warm_up_symbol_metadata(self, symbols: List[str]):
+        """Preloads symbol info and filling mode of the given symbols, keeping them off the order critical path."""
+        await self.symbol_metadata.warm_up(symbols)
+
+    async def _load_market_info(self, symbol: str) -> Optional[SymbolInfo]:
+        symbol_info = await self._mt5_call(mt5.symbol_info, symbol)
         if symbol_info is None:
             self.logger.warning(f"{symbol} not found.")
             return None
@@ -287,47 +380,95 @@ class MT5Broker(BrokerAPI):
     async def get_last_candles(self, symbol: str, timeframe: Timeframe, count: int = 1, position: int = 0) -> pd.DataFrame:
         timezone_offset = await self.get_broker_timezone_offset()
 
-        # Fetch one more candle than requested to potentially exclude the open candle
-        rates = mt5.copy_rates_from_pos(symbol, self.timeframe_to_mt5(timeframe), position, count + 1)
-        df = pd.DataFrame(rates)
+        # Fetch one more candle than requested to potentially exclude the open candle.
+        # Only a small live tail is read from the terminal, older candles come from the history cache
+        rates = await self.history_store.get_rates(symbol, timeframe, position, count + 1)
+        return self._rates_to_candles(rates, timeframe, timezone_offset, count)
 
-        # Rename 'time' to 'time_open' and convert to datetime
-        df['time_open'] = pd.to_datetime(df['time'], unit='s')
-        df.drop(columns=['time'], inplace=True)
+    @exception_handler
+    async def get_rolling_candles(self, symbol: str, timeframe: Timeframe, count: int = 1) -> pd.DataFrame:
+        """
+        Same result as get_last_candles(symbol, timeframe, count), served from the rolling candle store
+        of the (symbol, timeframe): only the most recent bars are downloaded from the terminal.
+        """
+        timezone_offset = await self.get_broker_timezone_offset()
 
-        # Calculate 'time_close' and add original broker times
-        timeframe_duration = timeframe.to_seconds()
-        df['time_close'] = df['time_open'] + pd.to_timedelta(timeframe_duration, unit='s')
-        df['time_open_broker'] = df['time_open']
-        df['time_close_broker'] = df['time_close']
+        # One more candle than requested to potentially exclude the open candle.
+        # The store buffer is rewritten by later updates, so the frame gets its own copy of the rates
+        rates = (await self.candle_stores.get_store(symbol, timeframe).get_rates(count + 1)).copy()
+        return self._rates_to_candles(rates, timeframe, timezone_offset, count)
 
-        # Convert from broker timezone to UTC
-        self.logger.debug(f"Timezone offset: {timezone_offset} hours")
-        df['time_open'] -= pd.to_timedelta(timezone_offset, unit='h')
-        df['time_close'] -= pd.to_timedelta(timezone_offset, unit='h')
+    @exception_handler
+    async def get_candle_store_stats(self) -> Dict[str, Dict[str, int]]:
+        return self.candle_stores.get_stats()
+
+    @exception_handler
+    async def download_history(self, symbol: str, timeframe: Timeframe, from_tms_utc: datetime, to_tms_utc: datetime) -> pd.DataFrame:
+        """
+        Candles opened between the two UTC times, downloaded month by month with concurrent copy_rates_range calls
+        and kept in the on-disk history cache, so that later requests only download the missing months.
+        """
+        timezone_offset = await self.get_broker_timezone_offset()
+        from_unix = int(dt_to_unix(self.broker_clock.utc_to_broker(from_tms_utc, timezone_offset)))
+        to_unix = int(dt_to_unix(self.broker_clock.utc_to_broker(to_tms_utc, timezone_offset)))
+        now_unix = int(dt_to_unix(self.broker_clock.utc_to_broker(now_utc(), timezone_offset)))
+        rates = await self.history_store.download(symbol, timeframe, from_unix, to_unix, now_unix)
+        return self._rates_to_candles(rates, timeframe, timezone_offset, len(rates))
+
+    @exception_handler
+    async def get_history_store_stats(self) -> Dict[str, int]:
+        return self.history_store.get_stats()
+
+    async def _copy_rates_from_pos(self, symbol: str, timeframe: Timeframe, position: int, count: int):
+        return await self._mt5_call(mt5.copy_rates_from_pos, symbol, self.timeframe_to_mt5(timeframe), position, count)
 
-        # Arrange columns for clarity
-        columns_order = ['time_open', 'time_close', 'time_open_broker', 'time_close_broker']
-        df = df[columns_order + [col for col in df.columns if col not in columns_order]]
+    async def _copy_rates_range(self, symbol: str, timeframe: Timeframe, from_unix: int, to_unix: int):
+        return await self._mt5_call(mt5.copy_rates_range, symbol, self.timeframe_to_mt5(timeframe), from_unix, to_unix)
+
+    def _rates_to_candles(self, rates: np.ndarray, timeframe: Timeframe, timezone_offset: int, count: int) -> pd.DataFrame:
+        """
+        Builds the candles frame on top of the rates record array: price and volume columns are views of the
+        record fields, times stay int64 epoch seconds viewed as datetime64[s], and only the derived close and
+        UTC times are computed. The open bar and the rows exceeding 'count' are trimmed with slices.
+        """
+        timeframe_duration = timeframe.to_seconds()
+        offset_seconds = timezone_offset * 3600
+        self.logger.debug(f"Timezone offset: {timezone_offset} hours")
 
         # Check and exclude the last candle if it's still open
         current_time = now_utc()
         self.logger.debug(f"Current UTC time: {current_time.strftime('%d/%m/%Y %H:%M:%S')}")
-        if current_time < df.iloc[-1]['time_close']:
-            self.logger.debug(f"Excluding last open candle with close time: {df.iloc[-1]['time_close'].strftime('%d/%m/%Y %H:%M:%S')}")
-            df = df.iloc[:-1]
+        if len(rates) > 0:
+            last_close_utc = int(rates['time'][-1]) + timeframe_duration - offset_seconds
+            if dt_to_unix(current_time) < last_close_utc:
+                self.logger.debug(f"Excluding last open candle with close time: {unix_to_datetime(last_close_utc).strftime('%d/%m/%Y %H:%M:%S')}")
+                rates = rates[:-1]
+
+        # Ensure the frame has exactly 'count' rows
+        rates = rates[-count:] if count > 0 else rates[:0]
+
+        time_open_broker = rates['time'].astype(np.int64, copy=False)
+        time_close_broker = time_open_broker + timeframe_duration
+        columns = {
+            'time_open': (time_open_broker - offset_seconds).view('datetime64[s]'),
+            'time_close': (time_close_broker - offset_seconds).view('datetime64[s]'),
+            'time_open_broker': time_open_broker.view('datetime64[s]'),
+            'time_close_broker': time_close_broker.view('datetime64[s]'),
+        }
+        for name in rates.dtype.names:
+            if name != 'time':
+                columns[name] = rates[name]
 
-        # Ensure DataFrame has exactly 'count' rows
-        return df.iloc[-count:].reset_index(drop=True)
+        return pd.DataFrame(columns, copy=False)
 
     @exception_handler
     async def get_working_directory(self):
-        terminal_info = mt5.terminal_info()
+        terminal_info = await self._mt5_call(mt5.terminal_info)
         return terminal_info.data_path + "\\MQL5\\Files"
 
     @exception_handler
     async def get_account_balance(self) -> float:
-        account_info = mt5.account_info()
+        account_info = await self._mt5_call(mt5.account_info)
         if account_info is None:
             raise Exception("Failed to retrieve account information")
         self.logger.info(f"Account balance: {account_info.balance}")
@@ -335,7 +476,7 @@ class MT5Broker(BrokerAPI):
 
     @exception_handler
     async def get_account_leverage(self) -> int:
-        account_info = mt5.account_info()
+        account_info = await self._mt5_call(mt5.account_info)
         if account_info is None:
             raise Exception("Failed to retrieve account information")
         self.logger.info(f"Account leverage: {account_info.leverage}")
@@ -344,7 +485,9 @@ class MT5Broker(BrokerAPI):
     # Order Placement Methods
     @exception_handler
     async def get_filling_mode(self, symbol) -> FillingType:
-        market_info = await self.get_market_info(symbol)
+        return await self.symbol_metadata.get_filling_mode(symbol)
+
+    async def _probe_filling_mode(self, symbol: str, market_info: SymbolInfo) -> FillingType:
         symbol_price = await self.get_symbol_price(symbol)
 
         result = None
@@ -358,17 +501,44 @@ class MT5Broker(BrokerAPI):
                 "type_filling": i,
                 "type_time": mt5.ORDER_TIME_GTC
             }
-            result = mt5.order_check(request)
+            result = await self._mt5_call(mt5.order_check, request)
             if result and not result.comment == "Unsupported filling mode" and result.comment == "Done":
                 return self.mt5_to_filling_type(i)
 
         add_part_log = f" Check response details: {result.comment}" if result is not None else ""
         raise ValueError(f"No valid filling mode found for symbol {symbol}.{add_part_log}")
 
+    @exception_handler
+    async def get_order_template(self, symbol: str) -> Optional[OrderTemplate]:
+        """Resolves with a single call everything an order on the symbol needs except the prices and the account balance."""
+        metadata = await self.symbol_metadata.get(symbol)
+        if metadata is None:
+            self.logger.warning(f"{symbol} not found, cannot build the order template.")
+            return None
+        filling_mode = await self.symbol_metadata.get_filling_mode(symbol)
+
+        symbol_info = metadata.symbol_info
+        return OrderTemplate(
+            symbol=symbol,
+            point=symbol_info.point,
+            point_decimals=metadata.point_decimals,
+            volume_min=symbol_info.volume_min,
+            volume_max=symbol_info.volume_max,
+            volume_step=symbol_info.volume_step,
+            trade_contract_size=symbol_info.trade_contract_size,
+            trade_mode=symbol_info.trade_mode,
+            filling_mode=filling_mode
+        )
+
+    @exception_handler
+    async def get_order_latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """Returns the signal to order_send latency of each symbol, for orders carrying the signal reception time."""
+        return self.order_latency.snapshot()
+
     @exception_handler
     async def place_order(self, request: OrderRequest) -> RequestResult:
-        # Implement order placement logic similar to the previous _place_order_sync
-        symbol_info = await self.get_market_info(request.symbol)
+        # Metadati letti direttamente dalla cache, senza passare da get_market_info
+        symbol_info = await self.symbol_metadata.get_symbol_info(request.symbol)
         if symbol_info is None:
             raise Exception(f"Symbol {request.symbol} not found")
 
@@ -393,7 +563,10 @@ class MT5Broker(BrokerAPI):
         }
 
         self.logger.debug(f"Send_order_request payload: {mt5_request}")
-        result = mt5.order_send(mt5_request)
+        if request.signal_received_at is not None:
+            self.order_latency.record(request.symbol, max(0.0, time.time() - request.signal_received_at))
+        result = await self._mt5_call(mt5.order_send, mt5_request)
+        self.position_snapshot.invalidate()
         response = RequestResult(request, result)
 
         if not response.success:
@@ -405,7 +578,9 @@ class MT5Broker(BrokerAPI):
     async def close_position(self, position: Position, comment: Optional[str] = None, magic_number: Optional[int] = None) -> RequestResult:
         # Prepare request for closing the position
         filling_mode = await self.get_filling_mode(position.symbol)
-        symbol_price = await self.get_symbol_price(position.symbol)
+        symbol_price = await self.quote_cache.get_order_price(position.symbol)
+        if symbol_price is None:
+            raise Exception(f"No price available for symbol {position.symbol}, cannot close position {position.ticket}.")
 
         if position.position_type == PositionType.LONG:
             price = symbol_price.bid
@@ -427,7 +602,8 @@ class MT5Broker(BrokerAPI):
             "type_filling": self.filling_type_to_mt5(filling_mode),
         }
 
-        result = mt5.order_send(close_request)
+        result = await self._mt5_call(mt5.order_send, close_request)
+        self.position_snapshot.invalidate()
         req_result = RequestResult(close_request, result)
         if req_result.success:
             self.logger.info(f"Position {position.ticket} successfully closed.")
@@ -438,6 +614,20 @@ class MT5Broker(BrokerAPI):
 
     # Orders, Deals and Positions
 
+    async def _ensure_history(self, from_tms_utc: datetime, to_tms_utc: datetime, timezone_offset: int) -> Tuple[int, int]:
+        """Loads (incrementally) the account history of the given UTC range in the history index and returns its broker unix bounds."""
+        from_unix = dt_to_unix(self.broker_clock.utc_to_broker(from_tms_utc, timezone_offset))
+        to_unix = dt_to_unix(self.broker_clock.utc_to_broker(to_tms_utc, timezone_offset))
+        await self.history_index.ensure_range(from_unix, to_unix)
+        return from_unix, to_unix
+
+    async def _refresh_history(self, timezone_offset: int):
+        await self.history_index.refresh(dt_to_unix(self.broker_clock.utc_to_broker(now_utc(), timezone_offset)))
+
+    @exception_handler
+    async def get_history_index_stats(self) -> Dict[str, Any]:
+        return self.history_index.get_stats()
+
     @exception_handler
     async def get_orders_by_ticket(self, orders_ticket: List[int], symbol: str, magic_number: Optional[int]) -> List[BrokerOrder]:
         orders_list = []
@@ -445,15 +635,12 @@ class MT5Broker(BrokerAPI):
 
         for order_ticket in orders_ticket:
             try:
-                orders = mt5.history_orders_get(ticket=order_ticket)
-                mapped_orders = [self.map_order(order, timezone_offset) for order in orders]
-                filtered_orders = list(filter(lambda order: order.magic_number == magic_number if magic_number else True, mapped_orders))
-
-                if not filtered_orders:
+                order = await self.history_index.order_by_ticket(order_ticket)
+                if order is None or (magic_number and order.magic != magic_number):
                     self.logger.warning(f"No order found with ticket {order_ticket}")
                     continue
 
-                orders_list.append(filtered_orders[0])
+                orders_list.append(self.map_order(order, timezone_offset))
             except Exception as e:
                 self.logger.error(f"Error retrieving orders: {e}")
 
@@ -462,23 +649,16 @@ class MT5Broker(BrokerAPI):
     @exception_handler
     async def get_orders_in_range(self, from_tms_utc: datetime, to_tms_utc: datetime, symbol: str, magic_number: Optional[int]) -> List[BrokerOrder]:
         timezone_offset = await self.get_broker_timezone_offset()
+        from_unix, to_unix = await self._ensure_history(from_tms_utc, to_tms_utc, timezone_offset)
 
-        from_tms_broker = from_tms_utc + timedelta(hours=timezone_offset)
-        to_tms_broker = to_tms_utc + timedelta(hours=timezone_offset)
-
-        from_unix = dt_to_unix(from_tms_broker)
-        to_unix = dt_to_unix(to_tms_broker)
-
-        orders = mt5.history_orders_get(date_from=from_unix, date_to=to_unix, group=f"*{symbol}*")
-
-        if orders is None:
-            return []
+        orders = self.history_index.orders_in_range(from_unix, to_unix, symbol, magic_number)
+        return [self.map_order(order, timezone_offset) for order in orders]
 
-        mapped_orders = [self.map_order(order, timezone_offset) for order in orders]
-        filtered_orders = list(filter(lambda order: order.magic_number == magic_number if magic_number else True, mapped_orders))
-        sorted_orders = sorted(filtered_orders, key=lambda x: (x.symbol, x.time))
-
-        return sorted_orders
+    async def _attach_orders(self, deals: List[Deal], timezone_offset: int):
+        """Sets on each deal the order that generated it."""
+        for deal in deals:
+            order = await self.history_index.order_by_ticket(deal.order_id)
+            deal.order = self.map_order(order, timezone_offset) if order is not None else None
 
     @exception_handler
     async def get_deals_by_orders_ticket(self, orders_ticket: List[int], symbol: str, magic_number: Optional[int] = None, include_orders: bool = True) -> List[Deal]:
@@ -488,120 +668,161 @@ class MT5Broker(BrokerAPI):
 
         for order_ticket in orders_ticket:
             try:
-                deals = mt5.history_deals_get(ticket=order_ticket)
-                mapped_deals: List[Deal] = [self.map_deal(deal, timezone_offset) for deal in deals]
-                filtered_deals = list(filter(lambda deal: deal.magic_number == magic_number if magic_number else True, mapped_deals))
+                deals = await self.history_index.deals_by_order(order_ticket)
+                filtered_deals = [self.map_deal(deal, timezone_offset) for deal in deals if not magic_number or deal.magic == magic_number]
 
                 if not filtered_deals:
                     self.logger.warning(f"No deal found with ticket {order_ticket}")
                     continue
 
                 if include_orders:
-                    orders = await self.get_orders_by_ticket([order_ticket], symbol)
-                    for deal in filtered_deals: deal.order = orders[0]
+                    await self._attach_orders(filtered_deals[:1], timezone_offset)
 
                 deal_list.append(filtered_deals[0])
 
             except Exception as e:
                 self.logger.error(f"Error retrieving orders: {e}")
 
-            return deal_list
+        return deal_list
 
     @exception_handler
     async def get_deals_by_position(self, positions_id: List[int], symbol: str, magic_number: Optional[int] = None, include_orders: bool = True) -> dict[int, List[Deal]]:
         timezone_offset = await self.get_broker_timezone_offset()
+        # Le posizioni potrebbero avere deal più recenti dell'ultimo caricamento dello storico
+        await self._refresh_history(timezone_offset)
 
         deal_list = {}
 
         for position_id in positions_id:
             try:
-                deals = mt5.history_deals_get(position=position_id)
-                mapped_deals: List[Deal] = [self.map_deal(deal, timezone_offset) for deal in deals]
-                filtered_deals = list(filter(lambda deal: deal.magic_number == magic_number if magic_number else True, mapped_deals))
+                deals = await self.history_index.deals_by_position(position_id)
+                filtered_deals = [self.map_deal(deal, timezone_offset) for deal in deals if not magic_number or deal.magic == magic_number]
 
                 if not filtered_deals:
                     self.logger.warning(f"No deal found with ticket {position_id}")
                     continue
 
                 if include_orders:
-                    order_tickets = list(deal.order_id for deal in filtered_deals)
-                    position_orders = await self.get_orders_by_ticket(order_tickets, symbol, magic_number)
-                    order_dict = {order.ticket: order for order in position_orders}
-
-                    for deal in filtered_deals: deal.order = order_dict.get(deal.order_id)
+                    await self._attach_orders(filtered_deals, timezone_offset)
 
-                ordered_deals = sorted(filtered_deals, key=lambda x: (x.symbol, x.time))
-                deal_list[position_id] = ordered_deals
+                deal_list[position_id] = filtered_deals
             except Exception as e:
                 self.logger.error(f"Error retrieving orders: {e}")
 
-            return deal_list
+        return deal_list
 
     @exception_handler
     async def get_deals_in_range(self, from_tms_utc: datetime, to_tms_utc: datetime, symbol: str, magic_number: Optional[int] = None, include_orders: bool = True) -> List[Deal]:
         timezone_offset = await self.get_broker_timezone_offset()
+        from_unix, to_unix = await self._ensure_history(from_tms_utc, to_tms_utc, timezone_offset)
 
-        from_tms_broker = from_tms_utc + timedelta(hours=timezone_offset)
-        to_tms_broker = to_tms_utc + timedelta(hours=timezone_offset)
-
-        from_unix = dt_to_unix(from_tms_broker)
-        to_unix = dt_to_unix(to_tms_broker)
-
-        deals = mt5.history_deals_get(from_unix, to_unix, group=f"*{symbol}*")
-
+        deals = self.history_index.deals_in_range(from_unix, to_unix, symbol, magic_number)
         if not deals:
             return []
 
-        mapped_deals: List[Deal] = [self.map_deal(deal, timezone_offset) for deal in deals]
-        filtered_deals = list(filter(lambda deal: deal.magic_number == magic_number if magic_number else True, mapped_deals))
-        sorted_deals = sorted(filtered_deals, key=lambda x: (x.symbol, x.time))
+        sorted_deals: List[Deal] = [self.map_deal(deal, timezone_offset) for deal in deals]
 
         if include_orders:
-            order_tickets = list(deal.order_id for deal in filtered_deals)
-            deals_orders = await self.get_orders_by_ticket(order_tickets, symbol, magic_number)
+            await self._attach_orders(sorted_deals, timezone_offset)
 
-            if not deals_orders:
-                self.logger.warning(f"No orders found for deals in range {from_tms_utc} to {to_tms_utc}")
-                return sorted_deals
+        return sorted_deals
 
-            for deal in sorted_deals:
-                deal.order = deals_orders[0]
+    @exception_handler
+    async def get_deals_since(self, last_ticket: int, from_tms_utc: datetime, include_orders: bool = True) -> List[Deal]:
+        """
+        Returns the account deals (all symbols) with a ticket greater than last_ticket, executed from from_tms_utc
+        (minus the history index overlap) up to now, sorted by ticket.
+        """
+        timezone_offset = await self.get_broker_timezone_offset()
+        from_unix, _ = await self._ensure_history(from_tms_utc, now_utc(), timezone_offset)
 
-        return sorted_deals
+        deals = [self.map_deal(deal, timezone_offset) for deal in self.history_index.deals_after(last_ticket, from_unix - self.history_index.right_edge_overlap)]
+
+        if include_orders:
+            await self._attach_orders(deals, timezone_offset)
+
+        return deals
 
     @exception_handler
     async def get_open_positions(self, symbol: str, magic_number: Optional[int] = None) -> List[Position]:
-        open_positions = mt5.positions_get(symbol=symbol)
+        await self.position_snapshot.refresh()
+        open_positions = self.position_snapshot.for_symbol(symbol)
 
         if not open_positions:
             return []
 
         timezone_offset = await self.get_broker_timezone_offset()
-        mapped_positions = [self.map_open_position(pos, timezone_offset) for pos in open_positions]
+        return await self._map_snapshot_positions(open_positions, timezone_offset, magic_number)
 
-        oldest_time = min(mapped_positions, key=lambda pos: pos.time).time
+    @exception_handler
+    async def get_open_positions_snapshot(self, symbol: Optional[str] = None, magic_number: Optional[int] = None) -> OpenPositionsSnapshot:
+        """Returns the open positions (all symbols when symbol is None) with the snapshot version to pass to get_position_changes."""
+        await self.position_snapshot.refresh()
+        version = self.position_snapshot.version
+        open_positions = self.position_snapshot.for_symbol(symbol)
+        timezone_offset = await self.get_broker_timezone_offset()
+        return OpenPositionsSnapshot(version, await self._map_snapshot_positions(open_positions, timezone_offset, magic_number))
+
+    @exception_handler
+    async def get_position_changes(self, since_version: int, symbol: Optional[str] = None, magic_number: Optional[int] = None) -> PositionChangeFeed:
+        """Returns the positions opened, modified or closed after since_version. Closed positions come without deals."""
+        await self.position_snapshot.refresh()
+        version, raw_changes, complete = self.position_snapshot.changes_since(since_version)
+        raw_changes = [change for change in raw_changes
+                       if (symbol is None or change.record.symbol == symbol) and (not magic_number or change.record.magic == magic_number)]
+        if not raw_changes:
+            return PositionChangeFeed(version, [], complete)
+
+        timezone_offset = await self.get_broker_timezone_offset()
+        changes = [await self._map_position_change(change, timezone_offset) for change in raw_changes]
+        return PositionChangeFeed(version, changes, complete)
+
+    @exception_handler
+    async def get_position_snapshot_stats(self) -> Dict[str, Any]:
+        return self.position_snapshot.get_stats()
 
-        deals = await self.get_deals_in_range(oldest_time, now_utc(), symbol, magic_number, include_orders=True)
+    async def _load_position_deals(self, position_ids: List[int], reload: bool) -> Optional[Dict[int, List[Deal]]]:
+        if reload:
+            # Il deal di una chiusura parziale può cadere fuori dall'intervallo indicizzato dello storico
+            for position_id in position_ids:
+                await self.history_index.deals_by_position(position_id, refetch=True)
+        return await self.get_deals_by_position(position_ids, "", include_orders=True)
+
+    async def _map_snapshot_positions(self, records: List[Any], timezone_offset: int, magic_number: Optional[int] = None) -> List[Position]:
+        mapped_positions = [self.map_open_position(record, timezone_offset) for record in records]
+        # Deal caricati una sola volta per posizione e poi serviti dallo snapshot
+        deals = await self.position_snapshot.get_deals([position.position_id for position in mapped_positions])
 
         for position in mapped_positions:
-            position.deals = list(filter(lambda deal: deal.position_id == position.position_id, deals))
+            position.deals = [deal for deal in deals.get(position.position_id, []) if not magic_number or deal.magic_number == magic_number]
 
         return mapped_positions
 
+    async def _map_position_change(self, change: RawPositionChange, timezone_offset: int) -> PositionChange:
+        if change.change_type == PositionChangeType.CLOSED:
+            position = self.map_open_position(change.record, timezone_offset)
+            position.open = False
+        else:
+            position = (await self._map_snapshot_positions([change.record], timezone_offset))[0]
+        return PositionChange(change.version, change.change_type, position)
+
     @exception_handler
     async def get_historical_positions(self, open_from_tms_utc: datetime, open_to_tms_utc: datetime, symbol: str, magic_number: Optional[int] = None) -> List[Position]:
         deals = await self.get_deals_in_range(open_from_tms_utc, open_to_tms_utc, symbol, magic_number, include_orders=False)
 
         if deals is None:
             self.logger.warning(f"No deals found for symbol {symbol} in the specified range.")
+            return []
 
-        position_ids = list(set(deal.position_id for deal in deals))
+        position_ids = list(dict.fromkeys(deal.position_id for deal in deals))
         positions = []
 
+        # Tutti i deal delle posizioni vengono risolti dall'indice dello storico con un'unica chiamata
+        deals_by_position = await self.get_deals_by_position(position_ids, symbol, magic_number, include_orders=True) or {}
+
         for position_id in position_ids:
             try:
-                position_deals = await self.get_deals_by_position([position_id], symbol, magic_number, include_orders=True)
-                position_deals = position_deals.get(position_id)
+                position_deals = deals_by_position.get(position_id)
 
                 total_profit = sum(deal.profit for deal in position_deals)
 
@@ -642,7 +863,7 @@ class MT5Broker(BrokerAPI):
             ticket=pos_obj.ticket,
             volume=pos_obj.volume,
             symbol=pos_obj.symbol,
-            time=unix_to_datetime(pos_obj.time) - timedelta(hours=timezone_offset) if pos_obj.time else None,
+            time=self.broker_clock.broker_unix_to_utc(pos_obj.time, timezone_offset) if pos_obj.time else None,
             price_open=pos_obj.price_open,
             price_current=pos_obj.price_current,
             swap=pos_obj.swap,
@@ -656,7 +877,7 @@ class MT5Broker(BrokerAPI):
         )
 
     def map_deal(self, deal_obj: Any, timezone_offset: int) -> Deal:
-        time = unix_to_datetime(deal_obj.time) - timedelta(hours=timezone_offset) if deal_obj.time else None
+        time = self.broker_clock.broker_unix_to_utc(deal_obj.time, timezone_offset) if deal_obj.time else None
         deal_type, order_source = self.classify_deal(deal_obj)
 
         return Deal(
@@ -704,46 +925,13 @@ class MT5Broker(BrokerAPI):
         )
 
     async def do_zmq_request(self, port: int, request: str, timeout: int = 30 * 1000) -> Dict[str, any]:
+        # Le richieste passano per un client DEALER persistente per porta, condiviso da tutte le chiamate
+        return await self.zmq_pool.request(port, request, timeout)
 
-        # Crea un contesto e un socket DEALER
-        context = zmq.Context()
-        try:
-            with context.socket(zmq.DEALER) as dealer:
-                # Genera un'identità unica per il socket
-                identity = str(uuid.uuid4())
-                dealer.setsockopt_string(zmq.IDENTITY, identity)
-
-                # Connettiti al server
-                dealer.connect(f"tcp://127.0.0.1:{port}")
-
-                # Invia la richiesta
-                dealer.send_string(request)
-
-                # Usa un poller per attendere la risposta
-                poller = zmq.Poller()
-                poller.register(dealer, zmq.POLLIN)
-
-                socks = dict(poller.poll(timeout))
-                if dealer in socks and socks[dealer] == zmq.POLLIN:
-                    # Ricevi tutti i frames del messaggio
-                    messages = []
-                    while True:
-                        try:
-                            part = dealer.recv_string()
-                            messages.append(part)
-                            # Controlla se ci sono altri frames
-                            if not dealer.getsockopt(zmq.RCVMORE):
-                                break
-                        except zmq.Again:
-                            break
-                    # Il messaggio di risposta è nell'ultimo frame
-                    response = messages[-1]
-                    return json.loads(response)
-                else:
-                    raise TimeoutError(f"Request timed out after {timeout} ms.")
-        finally:
-            # Termina il contesto per rilasciare le risorse
-            context.term()
+    @exception_handler
+    async def get_zmq_stats(self) -> Dict[int, Dict[str, Any]]:
+        """Returns request counters and latencies of the persistent ZMQ service clients."""
+        return self.zmq_pool.get_stats()
 
 
 class ServerTimeReader:
@@ -0,0 +1,92 @@
+import asyncio
+import concurrent.futures
+import queue
+import threading
+import time
+from typing import Callable, Any, Optional, Dict
+
+from misc_utils.bot_logger import BotLogger
+from misc_utils.latency_stats import LatencyRegistry
+
+_STOP = object()
+
+
+class MT5Executor:
+    """
+    Single-owner execution thread for the blocking MetaTrader5 API.
+
+    Every call is queued and executed by one dedicated thread, so the MT5 terminal is never
+    accessed concurrently while the event loop stays free during slow history queries.
+    For each MT5 function the executor tracks the time spent waiting in the queue and the
+    time spent executing the call.
+    """
+
+    def __init__(self, agent: str, thread_name: str = "MT5Executor"):
+        self.logger = BotLogger.get_logger(agent)
+        self.thread_name = thread_name
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self.queue_wait_stats = LatencyRegistry()
+        self.execution_stats = LatencyRegistry()
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+        self._thread.start()
+        self.logger.info(f"{self.thread_name} thread started")
+
+    def stop(self, timeout: Optional[float] = 10):
+        if not self.is_running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+        self.logger.info(f"{self.thread_name} thread stopped")
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> concurrent.futures.Future:
+        """Queues a call for the executor thread and returns a concurrent future for its result."""
+        if not self.is_running:
+            raise RuntimeError(f"{self.thread_name} is not running")
+        future = concurrent.futures.Future()
+        self._queue.put((func, args, kwargs, time.perf_counter(), future))
+        return future
+
+    async def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs func(*args, **kwargs) on the executor thread and awaits its result without blocking the loop."""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def get_stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Returns queue-wait and execution timings per MT5 function."""
+        return {
+            "queue_wait": self.queue_wait_stats.snapshot(),
+            "execution": self.execution_stats.snapshot()
+        }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            func, args, kwargs, enqueued_at, future = item
+            # Skip calls whose caller has already given up (e.g. cancelled by a timeout)
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            name = getattr(func, "__name__", repr(func))
+            started_at = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                finished_at = time.perf_counter()
+                self.queue_wait_stats.record(name, started_at - enqueued_at)
+                self.execution_stats.record(name, finished_at - started_at)
@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import time
+import traceback
+from typing import Any, Dict, Optional
+
+import zmq
+import zmq.asyncio
+
+from brokers.broker_concurrency import ConcurrencyClass
+from brokers.broker_proxy import Broker
+from brokers.gateway_protocol import (DEFAULT_GATEWAY_ENDPOINT, GATEWAY_PING, GATEWAY_STATS, GATEWAY_FORBIDDEN_METHODS,
+                                      decode_request, encode_response, encode_token, is_authorized)
+from brokers.mt5_broker import MT5Broker
+from misc_utils.bot_logger import BotLogger
+from misc_utils.config import ConfigReader
+from misc_utils.latency_stats import LatencyRegistry
+
+
+class _ClientStats:
+
+    def __init__(self):
+        self.latency = LatencyRegistry()
+        self.counters: Dict[str, int] = {"requests": 0, "deduplicated": 0, "errors": 0}
+        self.last_seen: float = 0.0
+
+
+class MT5Gateway:
+    """
+    Standalone process owning the MT5 terminal connection, shared by all the bot processes of a machine.
+
+    Exposes the BrokerAPI of an MT5Broker over a ZMQ ROUTER socket: each request carries a request id and a
+    pickled (method, args, kwargs) call, and is answered with the pickled result as soon as it completes, so
+    the requests of a client are served concurrently and may be answered out of order. Calls go through the
+    Broker proxy of the gateway process, so the usual concurrency policy applies across all clients.
+    Identical concurrent read calls (same method and arguments, from any client) share a single broker call
+    and a single encoded response; order and position mutations are never deduplicated. Service time,
+    request and deduplication counters are tracked per client.
+
+    Requests carrying a token different from the gateway token are dropped before being decoded, and frames
+    are decoded with the restricted GatewayUnpickler.
+    """
+
+    def __init__(self, agent: str, configuration: Dict, endpoint: str = DEFAULT_GATEWAY_ENDPOINT, token: Optional[str] = None):
+        self.agent = agent
+        self.logger = BotLogger.get_logger(agent)
+        self.configuration = configuration
+        self.endpoint = endpoint
+        self._token = encode_token(token)
+        self.rejected_requests = 0
+        self._context: Optional[zmq.asyncio.Context] = None
+        self._socket: Optional[zmq.asyncio.Socket] = None
+        self._receiver_task: Optional[asyncio.Task] = None
+        self._handlers: set = set()
+        self._in_flight: Dict[bytes, asyncio.Task] = {}
+        self._clients: Dict[str, _ClientStats] = {}
+        self.started_at: Optional[float] = None
+
+    async def start(self):
+        await Broker().initialize(MT5Broker, self.agent, self.configuration)
+        if not await Broker().startup():
+            raise Exception("Failed to start the MT5 broker")
+
+        self._context = zmq.asyncio.Context.instance()
+        self._socket = self._context.socket(zmq.ROUTER)
+        self._socket.setsockopt(zmq.LINGER, 0)
+        self._socket.bind(self.endpoint)
+        self._receiver_task = asyncio.create_task(self._receive_loop())
+        self.started_at = time.time()
+        self.logger.info(f"MT5 gateway listening on {self.endpoint}")
+        if not self._token:
+            self.logger.warning("No gateway token configured: requests of any local process are accepted.")
+
+    async def stop(self):
+        if self._receiver_task is not None:
+            self._receiver_task.cancel()
+            try:
+                await self._receiver_task
+            except asyncio.CancelledError:
+                pass
+            self._receiver_task = None
+        for handler in list(self._handlers):
+            handler.cancel()
+        if self._socket is not None:
+            self._socket.close(linger=0)
+            self._socket = None
+        if Broker().is_initialized:
+            await Broker().shutdown()
+        self.logger.info("MT5 gateway stopped")
+
+    async def _receive_loop(self):
+        try:
+            while True:
+                frames = await self._socket.recv_multipart()
+                if len(frames) != 4:
+                    self.logger.warning(f"Discarding malformed gateway request with {len(frames)} frames")
+                    continue
+                identity, token_frame, id_frame, call_frame = frames
+                if not is_authorized(token_frame, self._token):
+                    # Richiesta non autenticata: scartata senza decodificarla
+                    self.rejected_requests += 1
+                    self.logger.warning(f"Discarding gateway request with an invalid token from {identity.decode('utf-8', errors='replace')}")
+                    continue
+                handler = asyncio.create_task(self._handle(identity, id_frame, call_frame))
+                self._handlers.add(handler)
+                handler.add_done_callback(self._handlers.discard)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.logger.error(f"Gateway receive loop terminated: {e}")
+
+    def _get_client(self, identity: bytes) -> _ClientStats:
+        client_id = identity.decode("utf-8", errors="replace")
+        client = self._clients.get(client_id)
+        if client is None:
+            client = self._clients[client_id] = _ClientStats()
+            self.logger.info(f"New gateway client {client_id}")
+        return client
+
+    async def _handle(self, identity: bytes, id_frame: bytes, call_frame: bytes):
+        start = time.perf_counter()
+        client = self._get_client(identity)
+        client.counters["requests"] += 1
+        client.last_seen = time.time()
+
+        method = "invalid"
+        try:
+            _, method, args, kwargs = decode_request(id_frame, call_frame)
+            if method == GATEWAY_PING:
+                response = encode_response(True)
+            elif method == GATEWAY_STATS:
+                response = encode_response(self.get_stats())
+            elif method.startswith("_") or method in GATEWAY_FORBIDDEN_METHODS:
+                response = encode_response(error=f"Method {method} is not exposed by the gateway")
+            elif Broker().concurrency_policy.get_concurrency_class(method) == ConcurrencyClass.WRITE:
+                response = await self._invoke(method, args, kwargs)
+            else:
+                task = self._in_flight.get(call_frame)
+                if task is None:
+                    task = asyncio.create_task(self._invoke(method, args, kwargs))
+                    self._in_flight[call_frame] = task
+                    task.add_done_callback(lambda _, key=call_frame: self._in_flight.pop(key, None))
+                else:
+                    client.counters["deduplicated"] += 1
+                # Lo shield evita che la cancellazione di un client interrompa la chiamata condivisa
+                response = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            response = encode_response(error=f"Invalid gateway request: {e}")
+
+        try:
+            await self._socket.send_multipart([identity, id_frame, response])
+        except Exception as e:
+            client.counters["errors"] += 1
+            self.logger.error(f"Error sending the response of {method} to the gateway client: {e}")
+        client.latency.record(method, time.perf_counter() - start)
+
+    async def _invoke(self, method: str, args: tuple, kwargs: Dict[str, Any]) -> bytes:
+        try:
+            result = await getattr(Broker(), method)(*args, **kwargs)
+            return encode_response(result)
+        except Exception as e:
+            self.logger.error(f"Gateway call {method} failed: {e}")
+            return encode_response(error=f"{type(e).__name__}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.endpoint,
+            "uptime_s": time.time() - self.started_at if self.started_at else 0.0,
+            "in_flight": len(self._in_flight),
+            "rejected_requests": self.rejected_requests,
+            "clients": {
+                client_id: {**client.counters, "last_seen": client.last_seen, "latency": client.latency.snapshot()}
+                for client_id, client in self._clients.items()
+            }
+        }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='MT5 gateway shared by the bot processes.')
+    parser.add_argument('config_file', nargs='?', default='config.json', help='Path to the configuration file with the broker section.')
+    args = parser.parse_args()
+
+    config = ConfigReader.load_config(config_file_param=args.config_file)
+    gateway = MT5Gateway(
+        f"{config.get_bot_name()}_MT5Gateway",
+        {
+            'account': config.get_broker_account(),
+            'password': config.get_broker_password(),
+            'server': config.get_broker_server(),
+            'path': config.get_broker_mt5_path()
+        },
+        config.get_broker_gateway_endpoint() or DEFAULT_GATEWAY_ENDPOINT,
+        config.get_broker_gateway_token()
+    )
+    await gateway.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await gateway.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        traceback.print_exc()
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from dto.Deal import Deal
+from misc_utils.bot_logger import BotLogger
+from misc_utils.enums import PositionChangeType
+
+# fetch() -> tuple of the MT5 open positions of the whole account, as returned by positions_get()
+PositionsFetcher = Callable[[], Awaitable[Optional[Tuple[Any, ...]]]]
+# load(position_ids, reload) -> deals (with orders) of each position; reload asks to read again deals seen before
+PositionDealsLoader = Callable[[List[int], bool], Awaitable[Optional[Dict[int, List[Deal]]]]]
+
+
+@dataclass
+class RawPositionChange:
+    version: int
+    change_type: PositionChangeType
+    record: Any  # MT5 position record, the last one seen for closed positions
+
+
+def _position_key(record: Any) -> tuple:
+    # Prezzo corrente, profitto e swap cambiano ad ogni tick e non costituiscono una modifica
+    return record.identifier, record.volume, record.sl, record.tp, record.time_update_msc
+
+
+class PositionSnapshot:
+    """
+    Maintained snapshot of the account open positions, keyed by ticket.
+
+    A refresh reads all the open positions with a single positions_get call and diffs their compact
+    (id, volume, sl, tp, update time) tuples against the previous snapshot, classifying positions as opened,
+    modified or closed. Each refresh producing changes increments the snapshot version and appends the
+    changes to a bounded feed, so consumers can ask for what changed since the version they last saw.
+    Refreshes closer than max_age seconds are served by the current snapshot.
+
+    Deals of a position are loaded once and cached; they are reloaded only when the volume of the
+    position changes (partial close) and dropped when the position is closed.
+    """
+
+    def __init__(self, agent: str, fetch_positions: PositionsFetcher, load_deals: PositionDealsLoader, max_age: float = 1.0, feed_size: int = 1024):
+        self.logger = BotLogger.get_logger(agent)
+        self._fetch_positions = fetch_positions
+        self._load_deals = load_deals
+        self.max_age = max_age
+        self.positions: Dict[int, Any] = {}
+        self._keys: Dict[int, tuple] = {}
+        self._deals: Dict[int, List[Deal]] = {}
+        self._stale_deals: Set[int] = set()
+        self.version = 0
+        self._feed: Deque[RawPositionChange] = deque(maxlen=feed_size)
+        self.refreshed_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.counters: Dict[str, int] = {"refreshes": 0, "opened": 0, "modified": 0, "closed": 0, "deal_loads": 0}
+
+    def _is_fresh(self) -> bool:
+        return self.refreshed_at is not None and time.monotonic() - self.refreshed_at < self.max_age
+
+    def invalidate(self):
+        """Forces the next refresh to read the positions again, e.g. after an order was sent."""
+        self.refreshed_at = None
+
+    async def refresh(self, force: bool = False) -> List[RawPositionChange]:
+        if not force and self._is_fresh():
+            return []
+        async with self._lock:
+            # Un altro chiamante potrebbe aver aggiornato lo snapshot durante l'attesa
+            if not force and self._is_fresh():
+                return []
+            records = await self._fetch_positions()
+            if records is None:
+                raise Exception("Failed to retrieve open positions")
+            self.refreshed_at = time.monotonic()
+            self.counters["refreshes"] += 1
+            return self._apply(records)
+
+    def _apply(self, records: Tuple[Any, ...]) -> List[RawPositionChange]:
+        current = {record.ticket: record for record in records}
+        changes: List[Tuple[PositionChangeType, Any]] = []
+
+        for ticket, record in current.items():
+            key = _position_key(record)
+            previous_key = self._keys.get(ticket)
+            if previous_key is None:
+                changes.append((PositionChangeType.OPENED, record))
+            elif previous_key != key:
+                changes.append((PositionChangeType.MODIFIED, record))
+                if previous_key[1] != record.volume:
+                    self._deals.pop(record.identifier, None)
+                    self._stale_deals.add(record.identifier)
+            self._keys[ticket] = key
+
+        for ticket in [ticket for ticket in self.positions if ticket not in current]:
+            record = self.positions[ticket]
+            changes.append((PositionChangeType.CLOSED, record))
+            self._keys.pop(ticket, None)
+            self._deals.pop(record.identifier, None)
+            self._stale_deals.discard(record.identifier)
+
+        self.positions = current
+        if not changes:
+            return []
+
+        self.version += 1
+        feed_changes = [RawPositionChange(self.version, change_type, record) for change_type, record in changes]
+        self._feed.extend(feed_changes)
+        for change in feed_changes:
+            self.counters[change.change_type.name.lower()] += 1
+        return feed_changes
+
+    def for_symbol(self, symbol: Optional[str] = None) -> List[Any]:
+        return sorted((record for record in self.positions.values() if symbol is None or record.symbol == symbol), key=lambda r: (r.time_msc, r.ticket))
+
+    def changes_since(self, version: int) -> Tuple[int, List[RawPositionChange], bool]:
+        """
+        Returns the current version, the changes after the given version and whether they are complete:
+        when the feed no longer holds all of them the caller has to reload the whole snapshot.
+        """
+        complete = version >= self.version or (len(self._feed) > 0 and self._feed[0].version <= version + 1)
+        return self.version, [change for change in self._feed if change.version > version], complete
+
+    async def get_deals(self, position_ids: List[int]) -> Dict[int, List[Deal]]:
+        missing = [position_id for position_id in dict.fromkeys(position_ids) if position_id not in self._deals]
+        if missing:
+            loaded: Dict[int, List[Deal]] = {}
+            stale = [position_id for position_id in missing if position_id in self._stale_deals]
+            new = [position_id for position_id in missing if position_id not in self._stale_deals]
+            for position_ids_to_load, reload in ((new, False), (stale, True)):
+                if position_ids_to_load:
+                    loaded.update(await self._load_deals(position_ids_to_load, reload) or {})
+                    self.counters["deal_loads"] += 1
+            open_ids = {record.identifier for record in self.positions.values()}
+            for position_id, deals in loaded.items():
+                # Le posizioni chiuse nel frattempo non vengono messe in cache
+                if position_id in open_ids:
+                    self._deals[position_id] = deals
+                    self._stale_deals.discard(position_id)
+            return {position_id: self._deals.get(position_id, loaded.get(position_id, [])) for position_id in position_ids}
+        return {position_id: self._deals[position_id] for position_id in position_ids}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"version": self.version, "open_positions": len(self.positions), "cached_deals": len(self._deals),
+                "feed_size": len(self._feed), **self.counters}
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from typing import Any, Callable, Awaitable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from dto.SymbolPrice import SymbolPrice
+from misc_utils.bot_logger import BotLogger
+from misc_utils.latency_stats import LatencyRegistry
+
+# fetch_ticks(symbols) -> the MT5 ticks of the symbols (None for unknown ones), read with a single MT5 thread hop
+TicksFetcher = Callable[[List[str]], Awaitable[Sequence[Optional[Any]]]]
+
+
+class QuoteCache:
+    """
+    Latest bid/ask quote of each symbol.
+
+    Quotes are stored column-wise in preallocated numpy arrays (one slot per symbol): bid, ask, spread,
+    broker tick time and the local monotonic time of the update. A background task refreshes, with one
+    MT5 call per round, all the symbols read within the last active_window seconds; quotes can also be
+    pushed by a tick stream with update(). A read returns the cached quote when it is younger than the
+    requested max_age, otherwise the quote is fetched from MT5 synchronously; when MT5 returns no tick, or
+    one older than the cached quote, nothing younger than max_age is available and None is returned. Order
+    pricing uses a stricter threshold than plain price reads. The age of the served quotes is recorded as a metric.
+    """
+
+    def __init__(self, agent: str, fetch_ticks: TicksFetcher, refresh_interval: float = 0.25, max_age: float = 2.0,
+                 order_max_age: float = 0.5, active_window: float = 15 * 60, capacity: int = 64):
+        self.logger = BotLogger.get_logger(agent)
+        self._fetch_ticks = fetch_ticks
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.order_max_age = order_max_age
+        self.active_window = active_window
+        self._slots: Dict[str, int] = {}
+        self._bid = np.full(capacity, np.nan)
+        self._ask = np.full(capacity, np.nan)
+        self._spread = np.full(capacity, np.nan)
+        self._tick_time_msc = np.zeros(capacity, dtype=np.int64)
+        self._updated_at = np.full(capacity, -np.inf)
+        self._last_read_at = np.full(capacity, -np.inf)
+        self._refresher_task: Optional[asyncio.Task] = None
+        self.quote_age = LatencyRegistry()
+        self.counters: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0, "refresh_rounds": 0, "stream_updates": 0}
+
+    def _slot(self, symbol: str) -> int:
+        slot = self._slots.get(symbol)
+        if slot is None:
+            slot = len(self._slots)
+            if slot >= len(self._bid):
+                self._grow()
+            self._slots[symbol] = slot
+        return slot
+
+    def _grow(self):
+        extra = len(self._bid)
+        self._bid = np.concatenate([self._bid, np.full(extra, np.nan)])
+        self._ask = np.concatenate([self._ask, np.full(extra, np.nan)])
+        self._spread = np.concatenate([self._spread, np.full(extra, np.nan)])
+        self._tick_time_msc = np.concatenate([self._tick_time_msc, np.zeros(extra, dtype=np.int64)])
+        self._updated_at = np.concatenate([self._updated_at, np.full(extra, -np.inf)])
+        self._last_read_at = np.concatenate([self._last_read_at, np.full(extra, -np.inf)])
+
+    def update(self, symbol: str, bid: float, ask: float, tick_time_msc: int):
+        """Stores a quote pushed by a tick stream, unless a newer tick of the symbol is already stored."""
+        self.counters["stream_updates"] += 1
+        self._store(symbol, bid, ask, tick_time_msc)
+
+    def _store(self, symbol: str, bid: float, ask: float, tick_time_msc: int):
+        slot = self._slot(symbol)
+        if tick_time_msc < self._tick_time_msc[slot]:
+            return
+        self._bid[slot] = bid
+        self._ask[slot] = ask
+        self._spread[slot] = ask - bid
+        self._tick_time_msc[slot] = tick_time_msc
+        self._updated_at[slot] = time.monotonic()
+
+    def _store_ticks(self, symbols: List[str], ticks: Sequence[Optional[Any]]):
+        for symbol, tick in zip(symbols, ticks):
+            if tick is not None:
+                self._store(symbol, tick.bid, tick.ask, tick.time_msc)
+
+    def get_age(self, symbol: str) -> Optional[float]:
+        """Seconds since the quote of the symbol was last updated, None if never quoted."""
+        slot = self._slots.get(symbol)
+        if slot is None or not np.isfinite(self._updated_at[slot]):
+            return None
+        return time.monotonic() - self._updated_at[slot]
+
+    async def get_price(self, symbol: str, max_age: Optional[float] = None) -> Optional[SymbolPrice]:
+        max_age = self.max_age if max_age is None else max_age
+        slot = self._slot(symbol)
+        now = time.monotonic()
+        self._last_read_at[slot] = now
+
+        age = now - self._updated_at[slot]
+        if age > max_age:
+            self.counters["misses"] += 1
+            self._store_ticks([symbol], await self._fetch_ticks([symbol]))
+            age = time.monotonic() - self._updated_at[slot]
+            if age > max_age:
+                # Nessun tick (o un tick più vecchio) da MT5: la quotazione in cache non è utilizzabile
+                self.counters["stale"] += 1
+                return None
+        else:
+            self.counters["hits"] += 1
+
+        self.quote_age.record(symbol, age)
+        return SymbolPrice(float(self._ask[slot]), float(self._bid[slot]))
+
+    async def get_order_price(self, symbol: str) -> Optional[SymbolPrice]:
+        """Quote used to price an order: served from the cache only when younger than order_max_age."""
+        return await self.get_price(symbol, self.order_max_age)
+
+    # Background refresh
+
+    def start(self):
+        if self._refresher_task is None:
+            self._refresher_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresher_task is not None:
+            self._refresher_task.cancel()
+            try:
+                await self._refresher_task
+            except asyncio.CancelledError:
+                pass
+            self._refresher_task = None
+
+    def _active_symbols(self) -> List[str]:
+        threshold = time.monotonic() - self.active_window
+        return [symbol for symbol, slot in self._slots.items() if self._last_read_at[slot] >= threshold]
+
+    async def _refresh_loop(self):
+        try:
+            while True:
+                await asyncio.sleep(self.refresh_interval)
+                symbols = self._active_symbols()
+                if not symbols:
+                    continue
+                try:
+                    self._store_ticks(symbols, await self._fetch_ticks(symbols))
+                    self.counters["refresh_rounds"] += 1
+                except Exception as e:
+                    self.logger.error(f"Error refreshing quotes of {len(symbols)} symbols: {e}")
+        except asyncio.CancelledError:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        ages = {symbol: (now - self._updated_at[slot]) * 1000 for symbol, slot in self._slots.items() if np.isfinite(self._updated_at[slot])}
+        return {
+            "symbols": len(self._slots),
+            "active_symbols": len(self._active_symbols()),
+            **self.counters,
+            "current_age_ms": ages,
+            "served_age": self.quote_age.snapshot()
+        }
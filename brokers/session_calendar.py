@@ -0,0 +1,186 @@
+import asyncio
+import bisect
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple, Optional, Callable, Awaitable
+
+from misc_utils.bot_logger import BotLogger
+from misc_utils.utils_functions import now_utc
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+SECONDS_PER_DAY = 24 * 60 * 60
+SECONDS_PER_WEEK = 7 * SECONDS_PER_DAY
+
+MarketHoursLoader = Callable[[str], Awaitable[Optional[dict]]]
+
+
+def _parse_session_time(value: str) -> int:
+    """Parses a 'HH:MM' session time into seconds from midnight. '24:00' is accepted as end of day."""
+    hours, minutes = value.strip().split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or (hours == 24 and minutes != 0):
+        raise ValueError(f"Invalid session time '{value}'")
+    return hours * 3600 + minutes * 60
+
+
+class SymbolSessionCalendar:
+    """
+    Weekly trading sessions of a symbol, expressed in broker time.
+
+    Sessions are indexed by broker weekday (Monday=0) as sorted, non overlapping [start, end) intervals in
+    seconds from midnight, so a lookup is a binary search. Several sessions per day are supported, and a
+    session whose end time is earlier than its start time wraps past midnight into the following day.
+    A session with identical start and end time is considered open for the whole day, as MT5 reports
+    the 24:00 end of a full-day session as 00:00.
+    """
+
+    def __init__(self, symbol: str, day_intervals: Dict[int, List[Tuple[int, int]]]):
+        self.symbol = symbol
+        self._day_intervals: List[List[Tuple[int, int]]] = [self._merge(day_intervals.get(day, [])) for day in range(7)]
+        self._day_starts: List[List[int]] = [[start for start, _ in intervals] for intervals in self._day_intervals]
+        # The same sessions laid out on the whole week, contiguous sessions merged, used to find the next open/close
+        week = [(day * SECONDS_PER_DAY + start, day * SECONDS_PER_DAY + end) for day in range(7) for start, end in self._day_intervals[day]]
+        self._week_intervals: List[Tuple[int, int]] = self._merge(week)
+        self._week_starts: List[int] = [start for start, _ in self._week_intervals]
+        # A session starting on Monday at 00:00 is the continuation of a session ending with the week, not an open
+        wraps = len(self._week_intervals) > 1 and self._week_intervals[0][0] == 0 and self._week_intervals[-1][1] == SECONDS_PER_WEEK
+        self._open_starts: List[int] = self._week_starts[1:] if wraps else list(self._week_starts)
+        if self._week_intervals == [(0, SECONDS_PER_WEEK)]:
+            self._open_starts = []
+
+    @staticmethod
+    def _merge(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        merged: List[Tuple[int, int]] = []
+        for start, end in sorted(intervals):
+            if end <= start:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    @classmethod
+    def from_market_hours(cls, symbol: str, market_hours: dict) -> 'SymbolSessionCalendar':
+        """Builds the calendar from the MarketHours service payload: {'sessions': [{'day', 'start_time', 'end_time'}, ...]}."""
+        sessions = market_hours.get('sessions') if market_hours else None
+        if not isinstance(sessions, list):
+            raise ValueError(f"Invalid market hours data received: {market_hours}")
+
+        day_intervals: Dict[int, List[Tuple[int, int]]] = {}
+        for session in sessions:
+            day = DAY_NAMES.index(session['day'])
+            start = _parse_session_time(session['start_time'])
+            end = _parse_session_time(session['end_time'])
+
+            if start == end:
+                day_intervals.setdefault(day, []).append((0, SECONDS_PER_DAY))
+            elif start < end:
+                day_intervals.setdefault(day, []).append((start, end))
+            else:
+                # Overnight session: split it at midnight
+                day_intervals.setdefault(day, []).append((start, SECONDS_PER_DAY))
+                day_intervals.setdefault((day + 1) % 7, []).append((0, end))
+
+        return cls(symbol, day_intervals)
+
+    def is_open(self, broker_timestamp: datetime) -> bool:
+        day = broker_timestamp.weekday()
+        second = broker_timestamp.hour * 3600 + broker_timestamp.minute * 60 + broker_timestamp.second
+        index = bisect.bisect_right(self._day_starts[day], second) - 1
+        return index >= 0 and second < self._day_intervals[day][index][1]
+
+    def _week_second(self, broker_timestamp: datetime) -> Tuple[datetime, int]:
+        week_start = datetime(broker_timestamp.year, broker_timestamp.month, broker_timestamp.day) - timedelta(days=broker_timestamp.weekday())
+        return week_start, int((broker_timestamp - week_start).total_seconds())
+
+    def next_open(self, broker_timestamp: datetime) -> Optional[datetime]:
+        """Returns the broker time of the next session start after broker_timestamp, or None if always open or no sessions."""
+        if not self._open_starts:
+            return None
+        week_start, second = self._week_second(broker_timestamp)
+        index = bisect.bisect_right(self._open_starts, second)
+        if index < len(self._open_starts):
+            return week_start + timedelta(seconds=self._open_starts[index])
+        return week_start + timedelta(seconds=SECONDS_PER_WEEK + self._open_starts[0])
+
+    def next_close(self, broker_timestamp: datetime) -> Optional[datetime]:
+        """
+        Returns the broker time at which the session open at broker_timestamp (or the next one, if the market
+        is closed) ends, following sessions that continue across the end of the week. None if always open or no sessions.
+        """
+        if not self._open_starts:
+            return None
+
+        week_start, second = self._week_second(broker_timestamp)
+        index = bisect.bisect_right(self._week_starts, second) - 1
+        if index < 0 or second >= self._week_intervals[index][1]:
+            # Closed now: refer to the next session
+            index = (index + 1) % len(self._week_intervals)
+            if index == 0 and second >= self._week_intervals[0][0]:
+                week_start += timedelta(days=7)
+
+        end = self._week_intervals[index][1]
+        # A session ending with the week continues if the first session of the week starts at Monday 00:00
+        while end == SECONDS_PER_WEEK and self._week_intervals[0][0] == 0:
+            week_start += timedelta(days=7)
+            end = self._week_intervals[0][1]
+        return week_start + timedelta(seconds=end)
+
+
+class SessionCalendarCache:
+    """
+    Keeps one SymbolSessionCalendar per symbol, loaded from the MarketHours service on first use and
+    reloaded once the refresh interval has elapsed. If a reload fails, the previous calendar is kept;
+    if there is none, the load is not retried before retry_interval has elapsed.
+    """
+
+    def __init__(self, agent: str, loader: MarketHoursLoader, refresh_interval: timedelta = timedelta(hours=6),
+                 retry_interval: timedelta = timedelta(seconds=30)):
+        self.logger = BotLogger.get_logger(agent)
+        self._loader = loader
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self._calendars: Dict[str, SymbolSessionCalendar] = {}
+        self._loaded_at: Dict[str, datetime] = {}
+        self._failed_at: Dict[str, datetime] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _is_stale(self, symbol: str, current_time: datetime) -> bool:
+        loaded_at = self._loaded_at.get(symbol)
+        return loaded_at is None or current_time - loaded_at >= self.refresh_interval
+
+    async def get_calendar(self, symbol: str) -> Optional[SymbolSessionCalendar]:
+        if self._is_stale(symbol, now_utc()):
+            await self.refresh(symbol)
+        return self._calendars.get(symbol)
+
+    async def refresh(self, symbol: str, force: bool = False) -> Optional[SymbolSessionCalendar]:
+        lock = self._locks.setdefault(symbol, asyncio.Lock())
+        async with lock:
+            current_time = now_utc()
+            if not force and not self._is_stale(symbol, current_time):
+                return self._calendars.get(symbol)
+            failed_at = self._failed_at.get(symbol)
+            if not force and failed_at is not None and current_time - failed_at < self.retry_interval:
+                # Caricamento fallito da poco e nessun calendario: niente nuovi tentativi fino al retry_interval
+                return self._calendars.get(symbol)
+            try:
+                market_hours = await self._loader(symbol)
+                self._calendars[symbol] = SymbolSessionCalendar.from_market_hours(symbol, market_hours)
+                self._loaded_at[symbol] = current_time
+                self._failed_at.pop(symbol, None)
+                self.logger.debug(f"Session calendar loaded for {symbol}: {market_hours}")
+            except Exception as e:
+                self.logger.error(f"Error while loading session calendar for {symbol}: {e}")
+                if symbol in self._calendars:
+                    # Keep serving the previous calendar until the next refresh
+                    self._loaded_at[symbol] = current_time
+                else:
+                    self._failed_at[symbol] = current_time
+            return self._calendars.get(symbol)
+
+    def invalidate(self, symbol: Optional[str] = None):
+        if symbol is None:
+            self._loaded_at.clear()
+        else:
+            self._loaded_at.pop(symbol, None)
@@ -0,0 +1,112 @@
+import asyncio
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Callable, Awaitable, List
+
+from dto.SymbolInfo import SymbolInfo
+from misc_utils.bot_logger import BotLogger
+from misc_utils.enums import FillingType
+from misc_utils.utils_functions import now_utc
+
+SymbolInfoLoader = Callable[[str], Awaitable[Optional[SymbolInfo]]]
+FillingModeResolver = Callable[[str, SymbolInfo], Awaitable[FillingType]]
+
+
+class SymbolMetadata:
+    """Static trading metadata of a symbol, as resolved at loaded_at."""
+
+    def __init__(self, symbol_info: SymbolInfo, loaded_at: datetime):
+        self.symbol_info = symbol_info
+        self.loaded_at = loaded_at
+        self.filling_mode: Optional[FillingType] = None
+        # Same precision used by round_to_point
+        self.point_decimals = abs(int(math.log10(symbol_info.point))) if symbol_info.point else 0
+        self.volume_step = symbol_info.volume_step
+
+    def __repr__(self):
+        return f"SymbolMetadata(symbol='{self.symbol_info.symbol}', filling_mode={self.filling_mode}, point_decimals={self.point_decimals}, volume_step={self.volume_step})"
+
+
+class SymbolMetadataCache:
+    """
+    Caches SymbolInfo, resolved filling mode, point decimals and volume step of each symbol, so that
+    indicator calculations and order preparation do not query the terminal (or probe filling modes
+    with order_check) every time.
+
+    Entries expire after the TTL and are dropped as soon as a different trade mode is observed for the symbol.
+    """
+
+    def __init__(self, agent: str, load_symbol_info: SymbolInfoLoader, resolve_filling_mode: FillingModeResolver, ttl: timedelta = timedelta(hours=1)):
+        self.logger = BotLogger.get_logger(agent)
+        self._load_symbol_info = load_symbol_info
+        self._resolve_filling_mode = resolve_filling_mode
+        self.ttl = ttl
+        self._entries: Dict[str, SymbolMetadata] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _is_valid(self, entry: Optional[SymbolMetadata]) -> bool:
+        return entry is not None and now_utc() - entry.loaded_at < self.ttl
+
+    async def get(self, symbol: str) -> Optional[SymbolMetadata]:
+        entry = self._entries.get(symbol)
+        if self._is_valid(entry):
+            return entry
+
+        lock = self._locks.setdefault(symbol, asyncio.Lock())
+        async with lock:
+            # Another caller may have loaded the symbol while this one was waiting
+            entry = self._entries.get(symbol)
+            if self._is_valid(entry):
+                return entry
+
+            symbol_info = await self._load_symbol_info(symbol)
+            if symbol_info is None:
+                self._entries.pop(symbol, None)
+                return None
+
+            entry = SymbolMetadata(symbol_info, now_utc())
+            self._entries[symbol] = entry
+            self.logger.debug(f"Symbol metadata loaded: {entry}")
+            return entry
+
+    async def get_symbol_info(self, symbol: str) -> Optional[SymbolInfo]:
+        entry = await self.get(symbol)
+        return entry.symbol_info if entry is not None else None
+
+    async def get_filling_mode(self, symbol: str) -> FillingType:
+        entry = await self.get(symbol)
+        if entry is None:
+            raise ValueError(f"Symbol {symbol} not found, cannot resolve filling mode.")
+        if entry.filling_mode is None:
+            lock = self._locks.setdefault(symbol, asyncio.Lock())
+            async with lock:
+                if entry.filling_mode is None:
+                    entry.filling_mode = await self._resolve_filling_mode(symbol, entry.symbol_info)
+                    self.logger.debug(f"Filling mode resolved for {symbol}: {entry.filling_mode}")
+        return entry.filling_mode
+
+    async def warm_up(self, symbols: List[str], resolve_filling_mode: bool = True):
+        """Loads the metadata of the given symbols. Filling mode failures (e.g. market closed) are left to lazy resolution."""
+        for symbol in dict.fromkeys(symbols):
+            try:
+                entry = await self.get(symbol)
+                if entry is None:
+                    self.logger.warning(f"Symbol metadata warm-up: {symbol} not found.")
+                    continue
+                if resolve_filling_mode:
+                    await self.get_filling_mode(symbol)
+            except Exception as e:
+                self.logger.warning(f"Symbol metadata warm-up incomplete for {symbol}: {e}")
+
+    def observe_trade_mode(self, symbol: str, trade_mode: int):
+        """Invalidates the cached metadata of the symbol if its trade mode differs from the cached one."""
+        entry = self._entries.get(symbol)
+        if entry is not None and entry.symbol_info.trade_mode != trade_mode:
+            self.logger.info(f"Trade mode of {symbol} changed from {entry.symbol_info.trade_mode} to {trade_mode}, invalidating symbol metadata.")
+            self.invalidate(symbol)
+
+    def invalidate(self, symbol: Optional[str] = None):
+        if symbol is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(symbol, None)
@@ -0,0 +1,224 @@
+import asyncio
+import itertools
+import json
+import time
+import uuid
+from collections import deque
+from typing import Dict, Optional, Deque, Any
+
+import zmq
+import zmq.asyncio
+
+from misc_utils.bot_logger import BotLogger
+from misc_utils.latency_stats import LatencyRegistry
+
+
+class _PendingRequest:
+
+    def __init__(self, correlation_id: int, request: str, future: asyncio.Future):
+        self.correlation_id = correlation_id
+        self.request = request
+        self.future = future
+        self.sent_at = time.perf_counter()
+        self.socket: Optional[zmq.asyncio.Socket] = None
+
+
+class ZmqServiceClient:
+    """
+    Long-lived asyncio DEALER client for a single MQL5 ZMQ service port.
+
+    The MQL5 services answer the requests of a connection strictly one after the other and do not echo any
+    id, so replies are matched to requests by correlation id in FIFO order. This allows many requests to be
+    in flight on the same socket. A request left unanswered would shift every later reply onto the wrong
+    caller, so the first timeout drops the socket: a new one is created with a new identity (replies to the
+    old identity are discarded by the service ROUTER) and the requests still waiting are sent again on it,
+    in order. After max_consecutive_timeouts timeouts in a row the pending requests are failed instead.
+    """
+
+    def __init__(self, agent: str, port: int, host: str = "127.0.0.1", context: Optional[zmq.asyncio.Context] = None, max_consecutive_timeouts: int = 3):
+        self.logger = BotLogger.get_logger(agent)
+        self.port = port
+        self.host = host
+        self.max_consecutive_timeouts = max_consecutive_timeouts
+        self._context = context
+        self._socket: Optional[zmq.asyncio.Socket] = None
+        self._receiver_task: Optional[asyncio.Task] = None
+        self._pending: Deque[_PendingRequest] = deque()
+        self._correlation_ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+        self._consecutive_timeouts = 0
+        self.latency_stats = LatencyRegistry()
+        self.counters: Dict[str, int] = {"requests": 0, "responses": 0, "timeouts": 0, "late_responses": 0, "errors": 0, "reconnections": 0, "resent": 0}
+
+    @property
+    def endpoint(self) -> str:
+        return f"tcp://{self.host}:{self.port}"
+
+    async def _ensure_connected(self) -> zmq.asyncio.Socket:
+        socket = self._socket
+        if socket is not None:
+            return socket
+        async with self._connect_lock:
+            if self._socket is None:
+                self._connect()
+            return self._socket
+
+    def _connect(self):
+        if self._context is None:
+            self._context = zmq.asyncio.Context.instance()
+        socket = self._context.socket(zmq.DEALER)
+        socket.setsockopt_string(zmq.IDENTITY, str(uuid.uuid4()))
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect(self.endpoint)
+        self._socket = socket
+        self._receiver_task = asyncio.create_task(self._receive_loop(socket))
+        self.logger.debug(f"ZMQ client connected to {self.endpoint}")
+
+    async def _disconnect(self):
+        if self._receiver_task is not None:
+            self._receiver_task.cancel()
+            try:
+                await self._receiver_task
+            except asyncio.CancelledError:
+                pass
+            self._receiver_task = None
+        if self._socket is not None:
+            self._socket.close(linger=0)
+            self._socket = None
+
+    async def _replace_socket(self, stale: zmq.asyncio.Socket):
+        """Drops the socket of a timed out request and sends the requests still waiting again on a new socket."""
+        async with self._connect_lock:
+            if stale is None or self._socket is not stale:
+                # Già sostituito da un'altra richiesta andata in timeout
+                return
+            await self._disconnect()
+            self.counters["reconnections"] += 1
+            waiting = [pending for pending in self._pending if not pending.future.done()]
+            self._pending.clear()
+            self._connect()
+            socket, self._socket = self._socket, None
+            # Il nuovo socket viene pubblicato solo dopo il reinvio, così le nuove richieste restano in coda dietro a queste
+            try:
+                for pending in waiting:
+                    self._pending.append(pending)
+                    pending.socket = socket
+                    await socket.send_string(pending.request)
+                    self.counters["resent"] += 1
+            except Exception as e:
+                self.counters["errors"] += 1
+                self._fail_pending(ConnectionError(f"Unable to resend the pending requests to {self.endpoint}: {e}"))
+            finally:
+                self._socket = socket
+
+    async def _receive_loop(self, socket: zmq.asyncio.Socket):
+        try:
+            while True:
+                frames = await socket.recv_multipart()
+                if not self._pending:
+                    self.logger.warning(f"Unexpected ZMQ response from {self.endpoint} with no pending request")
+                    continue
+
+                pending = self._pending.popleft()
+                if pending.future.done():
+                    # The caller already timed out, drop the late response
+                    self.counters["late_responses"] += 1
+                    continue
+
+                self.counters["responses"] += 1
+                self.latency_stats.record("request", time.perf_counter() - pending.sent_at)
+                try:
+                    # The response payload is in the last frame
+                    pending.future.set_result(json.loads(frames[-1].decode("utf-8")))
+                except Exception as e:
+                    self.counters["errors"] += 1
+                    pending.future.set_exception(ValueError(f"Invalid response to request #{pending.correlation_id} '{pending.request}': {e}"))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.logger.error(f"ZMQ receive loop for {self.endpoint} terminated: {e}")
+            self._fail_pending(ConnectionError(f"ZMQ connection to {self.endpoint} lost: {e}"))
+
+    def _fail_pending(self, error: Exception):
+        while self._pending:
+            pending = self._pending.popleft()
+            if not pending.future.done():
+                pending.future.set_exception(error)
+
+    async def request(self, request: str, timeout: int = 30 * 1000) -> Dict[str, Any]:
+        """Sends a request and waits for its response. The timeout is expressed in milliseconds."""
+        # Il socket resta in una variabile locale: una reconnect concorrente può azzerare self._socket
+        socket = await self._ensure_connected()
+
+        pending = _PendingRequest(next(self._correlation_ids), request, asyncio.get_running_loop().create_future())
+        pending.socket = socket
+        self._pending.append(pending)
+        self.counters["requests"] += 1
+        try:
+            await socket.send_string(request)
+        except Exception:
+            if pending in self._pending:
+                self._pending.remove(pending)
+            self.counters["errors"] += 1
+            raise
+
+        try:
+            response = await asyncio.wait_for(pending.future, timeout / 1000)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            self._consecutive_timeouts += 1
+            if self._consecutive_timeouts >= self.max_consecutive_timeouts:
+                await self.reconnect()
+            else:
+                # Lo slot della richiesta senza risposta viene scartato insieme al socket
+                await self._replace_socket(pending.socket)
+            raise TimeoutError(f"Request '{request}' to {self.endpoint} timed out after {timeout} ms.")
+
+        self._consecutive_timeouts = 0
+        return response
+
+    async def reconnect(self):
+        """Drops the current socket, failing the pending requests, and connects with a new identity."""
+        self.logger.warning(f"Reconnecting ZMQ client to {self.endpoint}")
+        await self.close()
+        self._consecutive_timeouts = 0
+        self.counters["reconnections"] += 1
+        await self._ensure_connected()
+
+    async def close(self):
+        async with self._connect_lock:
+            await self._disconnect()
+            self._fail_pending(ConnectionError(f"ZMQ client for {self.endpoint} closed"))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.endpoint,
+            "in_flight": len(self._pending),
+            **self.counters,
+            "latency": self.latency_stats.get("request")
+        }
+
+
+class ZmqClientPool:
+    """Keeps one persistent ZmqServiceClient per service port."""
+
+    def __init__(self, agent: str, host: str = "127.0.0.1"):
+        self.agent = agent
+        self.host = host
+        self._clients: Dict[int, ZmqServiceClient] = {}
+
+    def get_client(self, port: int) -> ZmqServiceClient:
+        client = self._clients.get(port)
+        if client is None:
+            client = self._clients[port] = ZmqServiceClient(self.agent, port, self.host)
+        return client
+
+    async def request(self, port: int, request: str, timeout: int = 30 * 1000) -> Dict[str, Any]:
+        return await self.get_client(port).request(request, timeout)
+
+    async def close(self):
+        await asyncio.gather(*(client.close() for client in self._clients.values()), return_exceptions=True)
+        self._clients.clear()
+
+    def get_stats(self) -> Dict[int, Dict[str, Any]]:
+        return {port: client.get_stats() for port, client in self._clients.items()}
@@ -1,4 +1,4 @@
-from pandas import Series
+from pandas import Series, DataFrame
 
 from csv_loggers.logger_csv import CSVLogger
 
@@ -15,3 +15,6 @@ class CandlesLogger(CSVLogger):
     def add_candle(self, candle: Series):
         dic = candle.to_dict()
         self.record(dic)
+
+    def add_candles(self, candles: DataFrame):
+        self.record_many(candles.to_dict('records'))
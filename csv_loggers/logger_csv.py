@@ -59,6 +59,14 @@ class CSVLogger:
             self._write_to_csv([event])  # Write directly to CSV
         self._add_to_buffer(event)
 
+    def record_many(self, events):
+        """Records several events at once, with a single CSV write when real-time logging is enabled."""
+        if self.real_time_logging:
+            self._write_to_csv(events)
+        self.log_buffer.extend(events)
+        if len(self.log_buffer) > self.memory_buffer_size:
+            del self.log_buffer[:len(self.log_buffer) - self.memory_buffer_size]
+
     def flush_to_csv(self):
         """Flushes the buffered log events to the CSV file."""
         if not self.real_time_logging and self.log_buffer:
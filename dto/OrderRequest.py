@@ -15,6 +15,7 @@ class OrderRequest:
     comment: str
     filling_mode: Optional[FillingType] = None
     magic_number: Optional[int] = None
+    signal_received_at: Optional[float] = None  # unix, when the enter signal reached the bot
 
     def __str__(self):
         return (f"Trade Order:\n"
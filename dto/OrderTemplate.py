@@ -0,0 +1,47 @@
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from misc_utils.enums import FillingType
+
+
+@dataclass
+class OrderTemplate:
+    """
+    Price-independent part of an order on a symbol, resolved ahead of the signal: filling mode,
+    volume constraints and rounding precision. The account balance is not kept here: it changes with
+    every closed deal, so it is read when the order is sized.
+    """
+    symbol: str
+    point: float
+    point_decimals: int
+    volume_min: float
+    volume_max: float
+    volume_step: float
+    trade_contract_size: float
+    trade_mode: int
+    filling_mode: FillingType
+    built_at: float = field(default_factory=time.time)  # unix, wall clock
+
+    @property
+    def volume_decimals(self) -> int:
+        return max(0, -int(math.floor(math.log10(self.volume_step)))) if self.volume_step else 0
+
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    def round_price(self, price: float) -> float:
+        return round(price, self.point_decimals)
+
+    def round_volume(self, volume: float) -> float:
+        """Rounds the volume to the volume step and clamps it to the broker limits."""
+        stepped = round(round(volume / self.volume_step) * self.volume_step, self.volume_decimals)
+        return max(self.volume_min, min(self.volume_max, stepped))
+
+    def volume_for_risk(self, risk_amount: float, entry_price: float, stop_loss_price: float) -> Optional[float]:
+        """Volume that loses risk_amount when the stop loss is hit, None if the stop loss equals the entry price."""
+        stop_loss_points = abs(entry_price - stop_loss_price) / self.point
+        if stop_loss_points == 0:
+            return None
+        return self.round_volume(risk_amount / (stop_loss_points * self.trade_contract_size * self.point))
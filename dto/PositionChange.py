@@ -0,0 +1,26 @@
+from dataclasses import dataclass, field
+from typing import List
+
+from dto.Position import Position
+from misc_utils.enums import PositionChangeType
+
+
+@dataclass
+class PositionChange:
+    version: int
+    change_type: PositionChangeType
+    position: Position
+
+
+@dataclass
+class PositionChangeFeed:
+    version: int
+    changes: List[PositionChange] = field(default_factory=list)
+    # False when changes older than the requested version were discarded: reload the whole snapshot
+    complete: bool = True
+
+
+@dataclass
+class OpenPositionsSnapshot:
+    version: int
+    positions: List[Position] = field(default_factory=list)
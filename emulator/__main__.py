@@ -0,0 +1,63 @@
+"""
+Runs the bot against the emulated MetaTrader5 terminal and ZMQ services, e.g. for load tests on Linux:
+
+    python -m emulator --speed 60 --data-dir data/rates bin/configs/generator.json
+
+Options before the bot arguments configure the emulator; the remaining ones are passed to main.py.
+"""
+import argparse
+import asyncio
+import sys
+import traceback
+from datetime import datetime
+
+from emulator import mt5_module
+from emulator.clock import EmulatorClock
+from emulator.market_data import MarketDataStore
+from emulator.market_stream_publisher import EmulatedMarketStreamPublisher
+from emulator.terminal import EmulatedTerminal
+from emulator.zmq_services import EmulatedZmqServices
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Runs the bot on the MetaTrader5 emulator.')
+    parser.add_argument('--data-dir', default=None, help='Directory with <SYMBOL>_<TF>.csv/.npz rates, synthetic data otherwise.')
+    parser.add_argument('--start', default=None, help='Initial UTC time of the emulated clock (ISO format), now if omitted.')
+    parser.add_argument('--speed', type=float, default=1.0, help='Clock speed, 1.0 is real time.')
+    parser.add_argument('--broker-offset', type=int, default=2, help='Broker server time offset from UTC, in hours.')
+    parser.add_argument('--balance', type=float, default=10000.0, help='Initial account balance.')
+    parser.add_argument('--events-file', default=None, help='JSON file with the economic calendar events to serve.')
+    parser.add_argument('--stream-symbols', default=None, help='Comma separated symbols published by the emulated MarketStream service.')
+    return parser.parse_known_args()
+
+
+def main():
+    args, bot_args = parse_args()
+
+    clock = EmulatorClock(datetime.fromisoformat(args.start) if args.start else None, args.speed, args.broker_offset)
+    market_data = MarketDataStore(clock, args.data_dir)
+    terminal = EmulatedTerminal(clock, market_data, balance=args.balance)
+    # Deve precedere l'import di main, che importa MetaTrader5 tramite brokers.mt5_broker
+    mt5_module.install(terminal)
+
+    services = EmulatedZmqServices(clock, events_file=args.events_file)
+    services.start()
+    publisher = EmulatedMarketStreamPublisher(clock, market_data, args.stream_symbols.split(',')) if args.stream_symbols else None
+    if publisher is not None:
+        publisher.start()
+
+    import main as bot_main
+    sys.argv = [sys.argv[0]] + bot_args
+    try:
+        asyncio.run(bot_main.main())
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        traceback.print_exc()
+    finally:
+        services.stop()
+        if publisher is not None:
+            publisher.stop()
+
+
+if __name__ == "__main__":
+    main()
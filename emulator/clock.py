@@ -0,0 +1,57 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from misc_utils.utils_functions import dt_to_unix
+
+
+class EmulatorClock:
+    """
+    Controllable clock of the emulated terminal.
+
+    By default it follows the wall clock. It can start from a given UTC instant, run faster or slower than
+    real time (speed), be frozen (speed 0) and be moved forward manually with advance(). Broker (server) time
+    is UTC shifted by broker_offset_hours, as for a real MT5 server.
+    """
+
+    def __init__(self, start_utc: Optional[datetime] = None, speed: float = 1.0, broker_offset_hours: int = 2):
+        self.broker_offset_hours = broker_offset_hours
+        self._lock = threading.Lock()
+        self._speed = speed
+        self._anchor_utc = float(dt_to_unix(start_utc)) if start_utc is not None else time.time()
+        self._anchor_monotonic = time.monotonic()
+
+    def _now(self) -> float:
+        return self._anchor_utc + (time.monotonic() - self._anchor_monotonic) * self._speed
+
+    def utc_unix(self) -> float:
+        with self._lock:
+            return self._now()
+
+    def broker_unix(self) -> float:
+        return self.utc_unix() + self.broker_offset_hours * 3600
+
+    def utc_datetime(self) -> datetime:
+        return datetime.fromtimestamp(self.utc_unix(), tz=timezone.utc).replace(tzinfo=None)
+
+    def set(self, utc: datetime):
+        with self._lock:
+            self._anchor_utc = float(dt_to_unix(utc))
+            self._anchor_monotonic = time.monotonic()
+
+    def advance(self, seconds: float):
+        with self._lock:
+            self._anchor_utc += seconds
+
+    @property
+    def speed(self) -> float:
+        return self._speed
+
+    @speed.setter
+    def speed(self, value: float):
+        with self._lock:
+            # Re-anchor so that changing the speed does not make the clock jump
+            self._anchor_utc = self._now()
+            self._anchor_monotonic = time.monotonic()
+            self._speed = value
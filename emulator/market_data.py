@@ -0,0 +1,160 @@
+import os
+import threading
+import zlib
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from emulator.clock import EmulatorClock
+
+# Same layout of the structured arrays returned by MetaTrader5.copy_rates_*
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+
+TIMEFRAME_NAMES = {60: 'M1', 300: 'M5', 900: 'M15', 1800: 'M30', 3600: 'H1', 14400: 'H4', 86400: 'D1'}
+
+
+class SymbolSpec:
+    """Contract specification of an emulated symbol."""
+
+    def __init__(self, name: str, digits: int = 5, contract_size: float = 100000, base_price: float = 1.0,
+                 volume_min: float = 0.01, volume_max: float = 100.0, volume_step: float = 0.01, spread_points: int = 10):
+        self.name = name
+        self.digits = digits
+        self.point = 10 ** -digits
+        self.contract_size = contract_size
+        self.base_price = base_price
+        self.volume_min = volume_min
+        self.volume_max = volume_max
+        self.volume_step = volume_step
+        self.spread_points = spread_points
+
+    @classmethod
+    def synthetic(cls, name: str) -> 'SymbolSpec':
+        """Deterministic specification for symbols without a configuration, so that any name can be traded."""
+        seed = zlib.crc32(name.encode())
+        if name.startswith(('XAU', 'XAG', 'BTC', 'ETH')) or 'OIL' in name:
+            return cls(name, digits=2, contract_size=100, base_price=100 + seed % 2000)
+        if name.endswith('JPY'):
+            return cls(name, digits=3, base_price=80 + seed % 80)
+        return cls(name, digits=5, base_price=0.6 + (seed % 1000) / 1000)
+
+
+class MarketDataStore:
+    """
+    Historical bars of the emulated symbols.
+
+    Bars are read from '<data_dir>/<SYMBOL>_<TF>.csv' (time in broker unix seconds, open, high, low, close,
+    tick_volume, spread, real_volume), or from the '.npz' file with a 'rates' array written by a previous load.
+    Symbols without files get a deterministic synthetic price path, computed on demand for any time range, so
+    that thousands of symbols can be served without preloading anything. The bar containing the current
+    clock time is returned as the open (partial) bar, as the terminal does.
+    """
+
+    def __init__(self, clock: EmulatorClock, data_dir: Optional[str] = None, symbols: Optional[Dict[str, SymbolSpec]] = None):
+        self.clock = clock
+        self.data_dir = data_dir
+        self._specs: Dict[str, SymbolSpec] = dict(symbols or {})
+        self._history: Dict[Tuple[str, int], Optional[np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def get_spec(self, symbol: str) -> SymbolSpec:
+        spec = self._specs.get(symbol)
+        if spec is None:
+            with self._lock:
+                spec = self._specs.setdefault(symbol, SymbolSpec.synthetic(symbol))
+        return spec
+
+    def _load_history(self, symbol: str, tf_seconds: int) -> Optional[np.ndarray]:
+        key = (symbol, tf_seconds)
+        if key in self._history:
+            return self._history[key]
+
+        rates = None
+        if self.data_dir:
+            base_path = os.path.join(self.data_dir, f"{symbol}_{TIMEFRAME_NAMES.get(tf_seconds, tf_seconds)}")
+            if os.path.exists(base_path + '.npz'):
+                rates = np.load(base_path + '.npz')['rates'].astype(RATES_DTYPE)
+            elif os.path.exists(base_path + '.csv'):
+                raw = np.genfromtxt(base_path + '.csv', delimiter=',', names=True)
+                rates = np.zeros(len(raw), dtype=RATES_DTYPE)
+                for name in RATES_DTYPE.names:
+                    if name in raw.dtype.names:
+                        rates[name] = raw[name]
+                rates.sort(order='time')
+                np.savez(base_path + '.npz', rates=rates)
+
+        with self._lock:
+            self._history[key] = rates
+        return rates
+
+    # Synthetic price path: smooth cycles plus a hashed per-bar noise, a pure function of the time
+    def _price_at(self, spec: SymbolSpec, seconds: np.ndarray) -> np.ndarray:
+        phase = (zlib.crc32(spec.name.encode()) % 628) / 100
+        t = seconds.astype(np.float64)
+        cycles = 0.004 * np.sin(2 * np.pi * t / (86400 * 5) + phase) + 0.0015 * np.sin(2 * np.pi * t / (3600 * 7) + 2 * phase)
+        return np.round(spec.base_price * (1 + cycles), spec.digits)
+
+    def _noise(self, spec: SymbolSpec, index: np.ndarray, salt: int) -> np.ndarray:
+        hashed = (index.astype(np.uint64) * np.uint64(2654435761) + np.uint64(zlib.crc32(spec.name.encode()) + salt)) % np.uint64(2 ** 32)
+        return hashed.astype(np.float64) / 2 ** 32
+
+    def _synthetic_rates(self, spec: SymbolSpec, tf_seconds: int, first_index: int, last_index: int, now: float) -> np.ndarray:
+        index = np.arange(first_index, last_index + 1, dtype=np.int64)
+        rates = np.zeros(len(index), dtype=RATES_DTYPE)
+        rates['time'] = index * tf_seconds
+        opens = self._price_at(spec, rates['time'])
+        # The open bar closes at the current price
+        closes = self._price_at(spec, np.minimum(rates['time'] + tf_seconds, int(now)))
+        wick = spec.base_price * 0.0005 * np.sqrt(tf_seconds / 60)
+        rates['open'] = opens
+        rates['close'] = closes
+        rates['high'] = np.round(np.maximum(opens, closes) + wick * self._noise(spec, index, 1), spec.digits)
+        rates['low'] = np.round(np.minimum(opens, closes) - wick * self._noise(spec, index, 2), spec.digits)
+        rates['tick_volume'] = (50 + 1000 * self._noise(spec, index, 3)).astype(np.uint64)
+        rates['spread'] = spec.spread_points
+        return rates
+
+    def rates_from_pos(self, symbol: str, tf_seconds: int, start_pos: int, count: int) -> np.ndarray:
+        now = self.clock.broker_unix()
+        history = self._load_history(symbol, tf_seconds)
+        if history is not None:
+            available = int(np.searchsorted(history['time'], now, side='right'))
+            end = max(0, available - start_pos)
+            return history[max(0, end - count):end].copy()
+
+        current_index = int(now // tf_seconds)
+        last_index = current_index - start_pos
+        return self._synthetic_rates(self.get_spec(symbol), tf_seconds, last_index - count + 1, last_index, now)
+
+    def rates_range(self, symbol: str, tf_seconds: int, date_from: int, date_to: int) -> np.ndarray:
+        now = self.clock.broker_unix()
+        date_to = min(date_to, int(now))
+        history = self._load_history(symbol, tf_seconds)
+        if history is not None:
+            start = int(np.searchsorted(history['time'], date_from, side='left'))
+            end = int(np.searchsorted(history['time'], date_to, side='right'))
+            return history[start:end].copy()
+
+        first_index = -(-date_from // tf_seconds)
+        last_index = date_to // tf_seconds
+        if last_index < first_index:
+            return np.zeros(0, dtype=RATES_DTYPE)
+        return self._synthetic_rates(self.get_spec(symbol), tf_seconds, first_index, last_index, now)
+
+    def current_price(self, symbol: str) -> Tuple[float, float, int]:
+        """Returns bid, ask and broker time of the last tick of the symbol."""
+        spec = self.get_spec(symbol)
+        now = self.clock.broker_unix()
+        history = self._load_history(symbol, 60)
+        if history is None:
+            history = self._load_history(symbol, 3600)
+        if history is not None and len(history) > 0:
+            index = max(0, int(np.searchsorted(history['time'], now, side='right')) - 1)
+            bid = float(history['close'][index])
+        else:
+            bid = float(self._price_at(spec, np.array([int(now)]))[0])
+        ask = round(bid + spec.spread_points * spec.point, spec.digits)
+        return bid, ask, int(now)
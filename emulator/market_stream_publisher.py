@@ -0,0 +1,109 @@
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import zmq
+
+from emulator.clock import EmulatorClock
+from emulator.market_data import MarketDataStore
+from misc_utils.bot_logger import BotLogger
+
+MARKET_STREAM_SERVICE_PORT = 5558
+
+TIMEFRAME_SECONDS = {'M1': 60, 'M5': 300, 'M15': 900, 'M30': 1800, 'H1': 3600, 'H4': 14400, 'D1': 86400}
+
+
+class EmulatedMarketStreamPublisher:
+    """
+    Python stand-in of the MarketStream MQL5 service.
+
+    Publishes on a PUB socket the same two-frame messages of the MQL5 service: the last tick of each symbol
+    every tick_interval seconds, the bar just closed for each symbol/timeframe as soon as the EmulatorClock
+    crosses a bar boundary, and a heartbeat. Bars come from the MarketDataStore, so they match what
+    copy_rates_from_pos returns afterwards.
+    """
+
+    def __init__(self, clock: EmulatorClock, market_data: MarketDataStore, symbols: List[str],
+                 timeframes: Optional[List[str]] = None, host: str = "127.0.0.1", port: int = MARKET_STREAM_SERVICE_PORT,
+                 tick_interval: float = 1.0, poll_interval: float = 0.05, heartbeat_interval: float = 1.0):
+        self.logger = BotLogger.get_logger("EmulatedMarketStream")
+        self.clock = clock
+        self.market_data = market_data
+        self.symbols = symbols
+        self.timeframes = timeframes or list(TIMEFRAME_SECONDS.keys())
+        self.endpoint = f"tcp://{host}:{port}"
+        self.tick_interval = tick_interval
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.published: Dict[str, int] = {"ticks": 0, "bars": 0, "heartbeats": 0}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="EmulatedMarketStream", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Emulated market stream publishing {len(self.symbols)} symbols on {self.endpoint}")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        socket = zmq.Context.instance().socket(zmq.PUB)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.bind(self.endpoint)
+        offset = self.clock.broker_offset_hours * 3600
+        # Ultima apertura di barra vista per simbolo/timeframe: alla partenza non si pubblica nulla
+        last_bar_open: Dict[Tuple[str, str], int] = {}
+        now = self.clock.broker_unix()
+        for symbol in self.symbols:
+            for timeframe in self.timeframes:
+                last_bar_open[(symbol, timeframe)] = int(now // TIMEFRAME_SECONDS[timeframe] * TIMEFRAME_SECONDS[timeframe])
+        last_tick = last_heartbeat = 0.0
+
+        try:
+            while not self._stop_event.wait(self.poll_interval):
+                now = self.clock.broker_unix()
+                publish_ticks = now - last_tick >= self.tick_interval * max(self.clock.speed, 1e-9)
+                for symbol in self.symbols:
+                    if publish_ticks:
+                        self._publish_tick(socket, symbol, offset)
+                    for timeframe in self.timeframes:
+                        tf_seconds = TIMEFRAME_SECONDS[timeframe]
+                        bar_open = int(now // tf_seconds * tf_seconds)
+                        if bar_open > last_bar_open[(symbol, timeframe)]:
+                            last_bar_open[(symbol, timeframe)] = bar_open
+                            self._publish_bar(socket, symbol, timeframe, offset)
+                if publish_ticks:
+                    last_tick = now
+                if now - last_heartbeat >= self.heartbeat_interval * max(self.clock.speed, 1e-9):
+                    last_heartbeat = now
+                    socket.send_multipart([b"HEARTBEAT", json.dumps({"time_server_unix": int(now), "server_offset": offset}).encode("utf-8")])
+                    self.published["heartbeats"] += 1
+        finally:
+            socket.close()
+
+    def _publish_tick(self, socket: zmq.Socket, symbol: str, offset: int):
+        bid, ask, time = self.market_data.current_price(symbol)
+        payload = {"symbol": symbol, "time_msc": time * 1000, "server_offset": offset, "bid": bid, "ask": ask, "last": 0.0, "volume": 0}
+        socket.send_multipart([f"TICK:{symbol}".encode("utf-8"), json.dumps(payload).encode("utf-8")])
+        self.published["ticks"] += 1
+
+    def _publish_bar(self, socket: zmq.Socket, symbol: str, timeframe: str, offset: int):
+        rates = self.market_data.rates_from_pos(symbol, TIMEFRAME_SECONDS[timeframe], 1, 1)
+        if len(rates) == 0:
+            return
+        bar = rates[0]
+        payload = {
+            "symbol": symbol, "timeframe": timeframe, "time": int(bar['time']), "server_offset": offset,
+            "open": float(bar['open']), "high": float(bar['high']), "low": float(bar['low']), "close": float(bar['close']),
+            "tick_volume": int(bar['tick_volume']), "spread": int(bar['spread']), "real_volume": int(bar['real_volume'])
+        }
+        socket.send_multipart([f"BAR:{symbol}:{timeframe}".encode("utf-8"), json.dumps(payload).encode("utf-8")])
+        self.published["bars"] += 1
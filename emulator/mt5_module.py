@@ -0,0 +1,151 @@
+"""
+Drop-in replacement of the MetaTrader5 package backed by an EmulatedTerminal.
+
+Exposes, with the same names, signatures and constant values, the subset of the MetaTrader5 API used by
+MT5Broker. install() registers this module as 'MetaTrader5' in sys.modules, so that 'import MetaTrader5 as mt5'
+resolves to the emulator; it must be called before brokers.mt5_broker is imported.
+"""
+import sys
+from datetime import datetime
+from typing import Optional
+
+from emulator.clock import EmulatorClock
+from emulator.market_data import MarketDataStore
+from emulator.terminal import (EmulatedTerminal, ORDER_TYPE_BUY, ORDER_TYPE_SELL, TRADE_ACTION_DEAL, ORDER_FILLING_FOK,
+                               ORDER_FILLING_IOC, ORDER_FILLING_RETURN, SYMBOL_TRADE_MODE_DISABLED, SYMBOL_TRADE_MODE_FULL,
+                               DEAL_ENTRY_IN, DEAL_ENTRY_OUT, TRADE_RETCODE_DONE)
+
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+
+ORDER_TIME_GTC = 0
+
+_TIMEFRAME_SECONDS = {
+    TIMEFRAME_M1: 60, TIMEFRAME_M5: 300, TIMEFRAME_M15: 900, TIMEFRAME_M30: 1800,
+    TIMEFRAME_H1: 3600, TIMEFRAME_H4: 14400, TIMEFRAME_D1: 86400
+}
+
+_terminal: Optional[EmulatedTerminal] = None
+_connected = False
+_last_error = (1, 'Success')
+
+
+def configure(terminal: EmulatedTerminal):
+    global _terminal
+    _terminal = terminal
+
+
+def get_terminal() -> EmulatedTerminal:
+    global _terminal
+    if _terminal is None:
+        clock = EmulatorClock()
+        _terminal = EmulatedTerminal(clock, MarketDataStore(clock))
+    return _terminal
+
+
+def install(terminal: Optional[EmulatedTerminal] = None):
+    if terminal is not None:
+        configure(terminal)
+    sys.modules['MetaTrader5'] = sys.modules[__name__]
+
+
+def _fail(code: int, message: str):
+    global _last_error
+    _last_error = (code, message)
+    return None
+
+
+def initialize(path: Optional[str] = None, **kwargs) -> bool:
+    global _connected, _last_error
+    get_terminal()
+    _connected = True
+    _last_error = (1, 'Success')
+    return True
+
+
+def login(login: int, password: Optional[str] = None, server: Optional[str] = None, timeout: int = 60000) -> bool:
+    if not _connected:
+        return _fail(-10004, 'No IPC connection') or False
+    terminal = get_terminal()
+    terminal.login_id = int(login)
+    if server:
+        terminal.server = server
+    return True
+
+
+def shutdown() -> bool:
+    global _connected
+    _connected = False
+    return True
+
+
+def last_error():
+    return _last_error
+
+
+def account_info():
+    return get_terminal().account_info() if _connected else _fail(-10004, 'No IPC connection')
+
+
+def terminal_info():
+    return get_terminal().terminal_info() if _connected else _fail(-10004, 'No IPC connection')
+
+
+def symbol_info(symbol: str):
+    return get_terminal().symbol_info(symbol)
+
+
+def symbol_info_tick(symbol: str):
+    return get_terminal().symbol_info_tick(symbol)
+
+
+def copy_rates_from_pos(symbol: str, timeframe: int, start_pos: int, count: int):
+    if timeframe not in _TIMEFRAME_SECONDS:
+        return _fail(-2, 'Invalid timeframe')
+    return get_terminal().market_data.rates_from_pos(symbol, _TIMEFRAME_SECONDS[timeframe], start_pos, count)
+
+
+def copy_rates_range(symbol: str, timeframe: int, date_from, date_to):
+    if timeframe not in _TIMEFRAME_SECONDS:
+        return _fail(-2, 'Invalid timeframe')
+    return get_terminal().market_data.rates_range(symbol, _TIMEFRAME_SECONDS[timeframe],
+                                                  EmulatedTerminal._to_unix(date_from), EmulatedTerminal._to_unix(date_to))
+
+
+def copy_rates_from(symbol: str, timeframe: int, date_from, count: int):
+    if timeframe not in _TIMEFRAME_SECONDS:
+        return _fail(-2, 'Invalid timeframe')
+    tf_seconds = _TIMEFRAME_SECONDS[timeframe]
+    date_to = EmulatedTerminal._to_unix(date_from)
+    return get_terminal().market_data.rates_range(symbol, tf_seconds, date_to - (count - 1) * tf_seconds, date_to)[-count:]
+
+
+def order_check(request: dict):
+    return get_terminal().order_check(request)
+
+
+def order_send(request: dict):
+    return get_terminal().order_send(request)
+
+
+def positions_get(symbol: Optional[str] = None, group: Optional[str] = None, ticket: Optional[int] = None):
+    return get_terminal().positions_get(symbol=symbol, group=group, ticket=ticket)
+
+
+def positions_total() -> int:
+    return len(get_terminal().positions)
+
+
+def history_deals_get(date_from: Optional[datetime] = None, date_to: Optional[datetime] = None, group: Optional[str] = None,
+                      ticket: Optional[int] = None, position: Optional[int] = None):
+    return get_terminal().history_deals_get(date_from, date_to, group=group, ticket=ticket, position=position)
+
+
+def history_orders_get(date_from: Optional[datetime] = None, date_to: Optional[datetime] = None, group: Optional[str] = None,
+                       ticket: Optional[int] = None, position: Optional[int] = None):
+    return get_terminal().history_orders_get(date_from, date_to, group=group, ticket=ticket, position=position)
@@ -0,0 +1,277 @@
+import fnmatch
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from emulator.clock import EmulatorClock
+from emulator.market_data import MarketDataStore
+from misc_utils.utils_functions import dt_to_unix
+
+# Trade constants, same values of the MetaTrader5 module
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+TRADE_ACTION_DEAL = 1
+ORDER_FILLING_FOK = 0
+ORDER_FILLING_IOC = 1
+ORDER_FILLING_RETURN = 2
+ORDER_STATE_FILLED = 4
+DEAL_ENTRY_IN = 0
+DEAL_ENTRY_OUT = 1
+DEAL_REASON_EXPERT = 3
+DEAL_REASON_SL = 4
+DEAL_REASON_TP = 5
+SYMBOL_TRADE_MODE_DISABLED = 0
+SYMBOL_TRADE_MODE_FULL = 4
+
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_MARKET_CLOSED = 10018
+TRADE_RETCODE_POSITION_CLOSED = 10036
+TRADE_RETCODE_INVALID_FILL = 10030
+
+# Records with the same fields of the MetaTrader5 named tuples used by the bot
+AccountInfo = namedtuple('AccountInfo', 'login trade_mode leverage balance credit profit equity margin margin_free margin_level name server currency company')
+TerminalInfo = namedtuple('TerminalInfo', 'connected trade_allowed name company path data_path commondata_path')
+SymbolInfo = namedtuple('SymbolInfo', 'name description visible digits point spread trade_mode trade_contract_size volume_min volume_max volume_step filling_mode bid ask time')
+Tick = namedtuple('Tick', 'time bid ask last volume time_msc flags volume_real')
+TradePosition = namedtuple('TradePosition', 'ticket time time_msc time_update time_update_msc type magic identifier reason volume price_open sl tp price_current swap profit symbol comment external_id')
+TradeDeal = namedtuple('TradeDeal', 'ticket order time time_msc type entry magic position_id reason volume price commission swap profit fee symbol comment external_id')
+TradeOrder = namedtuple('TradeOrder', 'ticket time_setup time_setup_msc time_done time_done_msc time_expiration type type_time type_filling state magic position_id position_by_id reason volume_initial volume_current price_open sl tp price_current price_stoplimit symbol comment external_id')
+OrderSendResult = namedtuple('OrderSendResult', 'retcode deal order volume price bid ask comment request_id retcode_external request')
+OrderCheckResult = namedtuple('OrderCheckResult', 'retcode balance equity profit margin margin_free margin_level comment request')
+
+
+class _OpenPosition:
+
+    def __init__(self, ticket: int, symbol: str, position_type: int, volume: float, price_open: float,
+                 sl: float, tp: float, magic: int, comment: str, time: int):
+        self.ticket = ticket
+        self.symbol = symbol
+        self.type = position_type
+        self.volume = volume
+        self.price_open = price_open
+        self.sl = sl
+        self.tp = tp
+        self.magic = magic
+        self.comment = comment
+        self.time = time
+
+
+class EmulatedTerminal:
+    """
+    In-process replacement of a MetaTrader5 terminal connected to a hedging account.
+
+    Market orders (TRADE_ACTION_DEAL) are filled immediately at the current bid/ask of the MarketDataStore;
+    a request with 'position' closes (also partially) that position. Every fill produces the history order
+    and deal records the real terminal would produce, with broker-time timestamps. Stop loss and take profit
+    levels are checked against the current price whenever the account state is read. All methods are
+    thread-safe.
+    """
+
+    def __init__(self, clock: EmulatorClock, market_data: MarketDataStore, login: int = 1000001, balance: float = 10000.0,
+                 leverage: int = 100, currency: str = "USD", server: str = "Emulator-Server", company: str = "Emulator Ltd.",
+                 data_path: Optional[str] = None, supported_filling_modes: Optional[Set[int]] = None,
+                 disabled_symbols: Optional[Set[str]] = None):
+        self.clock = clock
+        self.market_data = market_data
+        self.login_id = login
+        self.balance = balance
+        self.leverage = leverage
+        self.currency = currency
+        self.server = server
+        self.company = company
+        self.data_path = data_path or os.path.join(tempfile.gettempdir(), "mt5_emulator")
+        self.supported_filling_modes = supported_filling_modes if supported_filling_modes is not None else {ORDER_FILLING_FOK}
+        self.disabled_symbols = disabled_symbols or set()
+        # The bot builds the sandbox path with Windows separators
+        os.makedirs(self.data_path + "\\MQL5\\Files", exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._next_ticket = 100000
+        self.positions: Dict[int, _OpenPosition] = {}
+        self.deals: List[TradeDeal] = []
+        self.orders: List[TradeOrder] = []
+        self.last_error = (1, 'Success')
+
+    def _ticket(self) -> int:
+        self._next_ticket += 1
+        return self._next_ticket
+
+    # Account and symbols
+
+    def account_info(self) -> AccountInfo:
+        with self._lock:
+            self._check_stops()
+            profit = sum(self._position_profit(p) for p in self.positions.values())
+            margin = sum(p.volume * self.market_data.get_spec(p.symbol).contract_size * p.price_open / self.leverage for p in self.positions.values())
+            equity = self.balance + profit
+            return AccountInfo(self.login_id, 0, self.leverage, round(self.balance, 2), 0.0, round(profit, 2), round(equity, 2),
+                               round(margin, 2), round(equity - margin, 2), round(equity / margin * 100, 2) if margin else 0.0,
+                               "Emulated account", self.server, self.currency, self.company)
+
+    def terminal_info(self) -> TerminalInfo:
+        return TerminalInfo(True, True, "MetaTrader 5 Emulator", self.company, self.data_path, self.data_path, self.data_path)
+
+    def symbol_info(self, symbol: str) -> SymbolInfo:
+        spec = self.market_data.get_spec(symbol)
+        bid, ask, time = self.market_data.current_price(symbol)
+        trade_mode = SYMBOL_TRADE_MODE_DISABLED if symbol in self.disabled_symbols else SYMBOL_TRADE_MODE_FULL
+        filling_flags = (1 if ORDER_FILLING_FOK in self.supported_filling_modes else 0) | (2 if ORDER_FILLING_IOC in self.supported_filling_modes else 0)
+        return SymbolInfo(symbol, symbol, True, spec.digits, spec.point, spec.spread_points, trade_mode, spec.contract_size,
+                          spec.volume_min, spec.volume_max, spec.volume_step, filling_flags, bid, ask, time)
+
+    def symbol_info_tick(self, symbol: str) -> Tick:
+        bid, ask, time = self.market_data.current_price(symbol)
+        return Tick(time, bid, ask, 0.0, 0, time * 1000, 6, 0.0)
+
+    # Trading
+
+    def _position_profit(self, position: _OpenPosition, volume: Optional[float] = None, close_price: Optional[float] = None) -> float:
+        if close_price is None:
+            bid, ask, _ = self.market_data.current_price(position.symbol)
+            close_price = bid if position.type == ORDER_TYPE_BUY else ask
+        direction = 1 if position.type == ORDER_TYPE_BUY else -1
+        volume = position.volume if volume is None else volume
+        return round(direction * (close_price - position.price_open) * volume * self.market_data.get_spec(position.symbol).contract_size, 2)
+
+    def _validate(self, request: Dict[str, Any]) -> Optional[OrderSendResult]:
+        def reject(retcode: int, comment: str) -> OrderSendResult:
+            return OrderSendResult(retcode, 0, 0, 0.0, 0.0, 0.0, 0.0, comment, 0, 0, request)
+
+        if request.get("action") != TRADE_ACTION_DEAL or request.get("type") not in (ORDER_TYPE_BUY, ORDER_TYPE_SELL):
+            return reject(TRADE_RETCODE_INVALID, "Invalid request")
+        if request.get("type_filling", ORDER_FILLING_FOK) not in self.supported_filling_modes:
+            return reject(TRADE_RETCODE_INVALID_FILL, "Unsupported filling mode")
+        symbol = request.get("symbol")
+        if symbol in self.disabled_symbols:
+            return reject(TRADE_RETCODE_MARKET_CLOSED, "Market closed")
+        spec = self.market_data.get_spec(symbol)
+        volume = request.get("volume", 0.0)
+        steps = round(volume / spec.volume_step, 6)
+        if volume < spec.volume_min or volume > spec.volume_max or abs(steps - round(steps)) > 1e-6:
+            return reject(TRADE_RETCODE_INVALID_VOLUME, "Invalid volume")
+        position_ticket = request.get("position")
+        if position_ticket:
+            position = self.positions.get(position_ticket)
+            if position is None:
+                return reject(TRADE_RETCODE_POSITION_CLOSED, "Position doesn't exist")
+            if position.type == request["type"] or volume > position.volume + 1e-9:
+                return reject(TRADE_RETCODE_INVALID, "Invalid request")
+        return None
+
+    def order_check(self, request: Dict[str, Any]) -> OrderCheckResult:
+        with self._lock:
+            rejection = self._validate(request)
+            account = self.account_info()
+            if rejection is not None:
+                return OrderCheckResult(rejection.retcode, account.balance, account.equity, account.profit, account.margin,
+                                        account.margin_free, account.margin_level, rejection.comment, request)
+            return OrderCheckResult(0, account.balance, account.equity, account.profit, account.margin,
+                                    account.margin_free, account.margin_level, "Done", request)
+
+    def order_send(self, request: Dict[str, Any]) -> OrderSendResult:
+        with self._lock:
+            self._check_stops()
+            rejection = self._validate(request)
+            if rejection is not None:
+                return rejection
+
+            bid, ask, _ = self.market_data.current_price(request["symbol"])
+            price = ask if request["type"] == ORDER_TYPE_BUY else bid
+            magic = request.get("magic", 0)
+            comment = request.get("comment", "")
+            position_ticket = request.get("position")
+            if position_ticket:
+                deal = self._close(self.positions[position_ticket], request["volume"], price, DEAL_REASON_EXPERT, magic, comment, request.get("type_filling", 0))
+            else:
+                deal = self._open(request, price, magic, comment)
+            return OrderSendResult(TRADE_RETCODE_DONE, deal.ticket, deal.order, deal.volume, deal.price, bid, ask,
+                                   "Request executed", 0, 0, request)
+
+    def _record(self, symbol: str, order_type: int, entry: int, volume: float, price: float, position_id: int, reason: int,
+                magic: int, comment: str, type_filling: int, sl: float = 0.0, tp: float = 0.0, profit: float = 0.0,
+                ticket: Optional[int] = None) -> TradeDeal:
+        now = int(self.clock.broker_unix())
+        order_ticket = ticket or self._ticket()
+        self.orders.append(TradeOrder(order_ticket, now, now * 1000, now, now * 1000, 0, order_type, 0, type_filling,
+                                      ORDER_STATE_FILLED, magic, position_id, 0, reason, volume, 0.0, price, sl, tp, price,
+                                      0.0, symbol, comment, ""))
+        deal = TradeDeal(self._ticket(), order_ticket, now, now * 1000, order_type, entry, magic, position_id, reason,
+                         volume, price, 0.0, 0.0, profit, 0.0, symbol, comment, "")
+        self.deals.append(deal)
+        return deal
+
+    def _open(self, request: Dict[str, Any], price: float, magic: int, comment: str) -> TradeDeal:
+        # As in MT5 the position id is the ticket of the order that opened it
+        ticket = self._ticket()
+        sl, tp = request.get("sl") or 0.0, request.get("tp") or 0.0
+        self.positions[ticket] = _OpenPosition(ticket, request["symbol"], request["type"], request["volume"], price,
+                                               sl, tp, magic, comment, int(self.clock.broker_unix()))
+        return self._record(request["symbol"], request["type"], DEAL_ENTRY_IN, request["volume"], price, ticket,
+                            DEAL_REASON_EXPERT, magic, comment, request.get("type_filling", 0), sl, tp, ticket=ticket)
+
+    def _close(self, position: _OpenPosition, volume: float, price: float, reason: int, magic: int, comment: str, type_filling: int) -> TradeDeal:
+        profit = self._position_profit(position, volume, price)
+        close_type = ORDER_TYPE_SELL if position.type == ORDER_TYPE_BUY else ORDER_TYPE_BUY
+        deal = self._record(position.symbol, close_type, DEAL_ENTRY_OUT, volume, price, position.ticket, reason,
+                            magic, comment, type_filling, profit=profit)
+        self.balance += profit
+        position.volume = round(position.volume - volume, 8)
+        if position.volume <= 0:
+            del self.positions[position.ticket]
+        return deal
+
+    def _check_stops(self):
+        for position in list(self.positions.values()):
+            bid, ask, _ = self.market_data.current_price(position.symbol)
+            price = bid if position.type == ORDER_TYPE_BUY else ask
+            direction = 1 if position.type == ORDER_TYPE_BUY else -1
+            if position.sl and direction * (price - position.sl) <= 0:
+                self._close(position, position.volume, position.sl, DEAL_REASON_SL, position.magic, "[sl]", ORDER_FILLING_FOK)
+            elif position.tp and direction * (price - position.tp) >= 0:
+                self._close(position, position.volume, position.tp, DEAL_REASON_TP, position.magic, "[tp]", ORDER_FILLING_FOK)
+
+    # Positions and history
+
+    def positions_get(self, symbol: Optional[str] = None, group: Optional[str] = None, ticket: Optional[int] = None) -> tuple:
+        with self._lock:
+            self._check_stops()
+            result = []
+            for p in self.positions.values():
+                if (symbol and p.symbol != symbol) or (group and not fnmatch.fnmatch(p.symbol, group)) or (ticket and p.ticket != ticket):
+                    continue
+                bid, ask, now = self.market_data.current_price(p.symbol)
+                result.append(TradePosition(p.ticket, p.time, p.time * 1000, now, now * 1000, p.type, p.magic, p.ticket,
+                                            DEAL_REASON_EXPERT, p.volume, p.price_open, p.sl, p.tp,
+                                            bid if p.type == ORDER_TYPE_BUY else ask, 0.0, self._position_profit(p), p.symbol, p.comment, ""))
+            return tuple(result)
+
+    def _history(self, records: List[Any], time_attr: str, date_from, date_to, group: Optional[str], ticket: Optional[int], position: Optional[int]) -> tuple:
+        with self._lock:
+            self._check_stops()
+            if ticket is not None:
+                # As in MT5, the ticket filter of both history functions is the order ticket
+                order_attr = 'order' if time_attr == 'time' else 'ticket'
+                return tuple(r for r in records if getattr(r, order_attr) == ticket)
+            if position is not None:
+                return tuple(r for r in records if r.position_id == position)
+            if date_from is None or date_to is None:
+                return None
+            from_unix, to_unix = self._to_unix(date_from), self._to_unix(date_to)
+            return tuple(r for r in records
+                         if from_unix <= getattr(r, time_attr) <= to_unix and (not group or fnmatch.fnmatch(r.symbol, group)))
+
+    @staticmethod
+    def _to_unix(value) -> int:
+        # Datetimes are wall-clock broker time, as for the real terminal
+        return int(dt_to_unix(value)) if isinstance(value, datetime) else int(value)
+
+    def history_deals_get(self, date_from=None, date_to=None, group: Optional[str] = None, ticket: Optional[int] = None, position: Optional[int] = None):
+        return self._history(self.deals, 'time', date_from, date_to, group, ticket, position)
+
+    def history_orders_get(self, date_from=None, date_to=None, group: Optional[str] = None, ticket: Optional[int] = None, position: Optional[int] = None):
+        return self._history(self.orders, 'time_setup', date_from, date_to, group, ticket, position)
@@ -0,0 +1,148 @@
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import zmq
+
+from emulator.clock import EmulatorClock
+from misc_utils.bot_logger import BotLogger
+
+DAY_NAMES = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+SERVER_TIME_SERVICE_PORT = 5555
+MARKET_HOURS_SERVICE_PORT = 9999
+ECONOMIC_CALENDAR_SERVICE_PORT = 5557
+
+
+def forex_sessions(symbol: str) -> List[Dict[str, str]]:
+    """Default schedule: crypto trades all week, everything else from Monday to Friday (broker time)."""
+    days = DAY_NAMES if symbol.startswith(('BTC', 'ETH')) else DAY_NAMES[1:6]
+    return [{"day": day, "start_time": "00:00", "end_time": "24:00"} for day in days]
+
+
+class EmulatedZmqServices:
+    """
+    Python stand-ins of the ServerTime, MarketHours and EconomicCalendar MQL5 services.
+
+    Each service is a ROUTER socket bound on the same port and answering with the same JSON payloads of the
+    MQL5 implementation, so that MT5Broker talks to it unmodified. Times follow the EmulatorClock.
+    Calendar events are read from a JSON file with the records produced by the MQL5 service
+    (country_code, event_id, event_type, event_importance, event_source_url, event_code, event_name,
+    event_time as 'YYYY.MM.DD HH:MM' broker time). All sockets are served by a single background thread.
+    """
+
+    def __init__(self, clock: EmulatorClock, host: str = "127.0.0.1",
+                 sessions_provider: Callable[[str], List[Dict[str, str]]] = forex_sessions,
+                 events_file: Optional[str] = None,
+                 ports: Optional[Dict[str, int]] = None):
+        self.logger = BotLogger.get_logger("EmulatedZmqServices")
+        self.clock = clock
+        self.host = host
+        self.sessions_provider = sessions_provider
+        self.events: List[dict] = []
+        if events_file:
+            with open(events_file, 'r', encoding='utf-8') as f:
+                self.events = json.load(f)
+        ports = ports or {}
+        self._handlers = {
+            ports.get("server_time", SERVER_TIME_SERVICE_PORT): self._server_time,
+            ports.get("market_hours", MARKET_HOURS_SERVICE_PORT): self._market_hours,
+            ports.get("economic_calendar", ECONOMIC_CALENDAR_SERVICE_PORT): self._economic_calendar,
+        }
+        self._context = zmq.Context.instance()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.requests_served = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        sockets = {}
+        for port, handler in self._handlers.items():
+            socket = self._context.socket(zmq.ROUTER)
+            socket.setsockopt(zmq.LINGER, 0)
+            socket.bind(f"tcp://{self.host}:{port}")
+            sockets[socket] = handler
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._serve, args=(sockets,), name="EmulatedZmqServices", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Emulated ZMQ services listening on ports {list(self._handlers.keys())}")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _serve(self, sockets: Dict[zmq.Socket, Callable[[str], str]]):
+        poller = zmq.Poller()
+        for socket in sockets:
+            poller.register(socket, zmq.POLLIN)
+        try:
+            while not self._stop_event.is_set():
+                for socket, _ in poller.poll(100):
+                    # Come per i servizi MQL5: [identity, payload] in ingresso e in uscita
+                    frames = socket.recv_multipart()
+                    request = frames[-1].decode("utf-8")
+                    try:
+                        response = sockets[socket](request)
+                    except Exception as e:
+                        self.logger.error(f"Error serving request '{request}': {e}")
+                        response = json.dumps({"error": str(e)})
+                    socket.send_multipart([frames[0], response.encode("utf-8")])
+                    self.requests_served += 1
+        finally:
+            for socket in sockets:
+                socket.close()
+
+    # ServerTime
+
+    def _server_time(self, request: str) -> str:
+        utc_unix = int(self.clock.utc_unix())
+        server_unix = int(self.clock.broker_unix())
+
+        def fmt(ts: int) -> str:
+            return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y.%m.%d %H:%M:%S")
+
+        return json.dumps({
+            "time_utc": fmt(utc_unix),
+            "time_server": fmt(server_unix),
+            "time_utc_unix": utc_unix,
+            "time_server_unix": server_unix,
+            "time_difference": self.clock.broker_offset_hours
+        })
+
+    # MarketHours
+
+    def _market_hours(self, symbol: str) -> str:
+        return json.dumps({"symbol": symbol, "sessions": self.sessions_provider(symbol)})
+
+    # EconomicCalendar
+
+    def _events_between(self, countries: List[str], start_unix: int, end_unix: int, min_importance: int = 0) -> List[dict]:
+        selected = []
+        for event in self.events:
+            event_unix = int(datetime.strptime(event["event_time"], "%Y.%m.%d %H:%M").replace(tzinfo=timezone.utc).timestamp())
+            if event["country_code"] in countries and start_unix <= event_unix <= end_unix and event["event_importance"] >= min_importance:
+                selected.append(event)
+        return selected
+
+    def _economic_calendar(self, request: str) -> str:
+        params = request.split(":")
+        if len(params) < 4:
+            return json.dumps({"error": "Invalid request format"})
+        command, countries, start_unix, end_unix = params[0], params[1].split(","), int(params[2]), int(params[3])
+
+        if command == "LIST_IDS":
+            return json.dumps([event["event_id"] for event in self._events_between(countries, start_unix, end_unix)])
+        if command == "GET_EVENT" and len(params) > 4:
+            for event in self._events_between(countries, start_unix, end_unix):
+                if str(event["event_id"]) == params[4]:
+                    return json.dumps(event)
+            return json.dumps({"error": "Event not found"})
+        if command == "LIST_EVENTS":
+            min_importance = int(params[4]) if len(params) > 4 else 0
+            return json.dumps(self._events_between(countries, start_unix, end_unix, min_importance))
+        return json.dumps({"error": "Invalid command"})
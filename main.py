@@ -13,6 +13,9 @@ from agents.middleware import MiddlewareService
 from agents.sentinel_closed_deals_agent import ClosedDealsAgent
 from agents.sentinel_event_manager import EconomicEventsManagerAgent
 # Custom module imports
+from brokers.broker_pool import BrokerPool, DEFAULT_POOL_BASE_PORT
+from brokers.gateway_broker import GatewayBroker
+from brokers.market_stream import MarketStreamSubscriber
 from brokers.mt5_broker import MT5Broker
 from brokers.broker_proxy import Broker
 from misc_utils.config import ConfigReader
@@ -134,18 +137,74 @@ class BotLauncher:
         if self.mode == Mode.MIDDLEWARE:
             return
 
-        await Broker().initialize(
-            MT5Broker,
-            f"{self.config.get_bot_name()}_MT5Broker",
-            {
-                'account': self.config.get_broker_account(),
-                'password': self.config.get_broker_password(),
-                'server': self.config.get_broker_server(),
-                'path': self.config.get_broker_mt5_path()
-            }
-        )
+        # With several accounts configured each one is served by its own worker process of the BrokerPool
+        pool_accounts = self.config.get_broker_accounts()
+        if pool_accounts:
+            await BrokerPool().initialize(
+                f"{self.config.get_bot_name()}_BrokerPool",
+                [
+                    {
+                        'account': account['account'],
+                        'password': account['password'],
+                        'server': account['server'],
+                        'path': account['mt5_path'],
+                        'max_concurrency': account.get('max_concurrency')
+                    }
+                    for account in pool_accounts
+                ],
+                default_account=self.config.get_broker_account(),
+                base_port=self.config.get_broker_pool_base_port() or DEFAULT_POOL_BASE_PORT,
+                timeout=self.config.get_broker_timeout()
+            )
+            if not await BrokerPool().start():
+                raise Exception("Not all the broker pool workers are available")
+
+        # With a gateway endpoint configured the MT5 terminal is shared through the MT5Gateway process
+        gateway_endpoint = self.config.get_broker_gateway_endpoint()
+        if BrokerPool().is_initialized:
+            # Il proxy Broker serve i dati di mercato tramite il worker dell'account di default
+            await Broker().initialize(
+                GatewayBroker,
+                f"{self.config.get_bot_name()}_GatewayBroker",
+                {
+                    'gateway_endpoint': BrokerPool().get_endpoint(),
+                    'gateway_token': BrokerPool().token,
+                    'timeout': self.config.get_broker_timeout()
+                }
+            )
+        elif gateway_endpoint:
+            await Broker().initialize(
+                GatewayBroker,
+                f"{self.config.get_bot_name()}_GatewayBroker",
+                {
+                    'gateway_endpoint': gateway_endpoint,
+                    'gateway_token': self.config.get_broker_gateway_token(),
+                    'timeout': self.config.get_broker_timeout()
+                }
+            )
+        else:
+            await Broker().initialize(
+                MT5Broker,
+                f"{self.config.get_bot_name()}_MT5Broker",
+                {
+                    'account': self.config.get_broker_account(),
+                    'password': self.config.get_broker_password(),
+                    'server': self.config.get_broker_server(),
+                    'path': self.config.get_broker_mt5_path()
+                }
+            )
         await Broker().startup()
 
+        # Preload symbol metadata (symbol info, filling mode) of all configured symbols
+        await Broker().warm_up_symbol_metadata([tc.get_symbol() for tc in self.config.get_trading_configurations()])
+
+        # Bar closes pushed by the MarketStream service instead of waiting for the timeframe on the local clock
+        market_stream_port = self.config.get_broker_market_stream_port()
+        if market_stream_port:
+            await NotifierTickUpdates().enable_market_stream(
+                MarketStreamSubscriber(f"{self.config.get_bot_name()}_MarketStream", port=market_stream_port)
+            )
+
     async def stop_services(self):
         """
         Stops all services and routines gracefully.
@@ -156,6 +215,8 @@ class BotLauncher:
         await RabbitMQService.stop()
         if self.mode != Mode.MIDDLEWARE:
             await Broker().shutdown()
+            if BrokerPool().is_initialized:
+                await BrokerPool().stop()
         self.executor.shutdown()
         print("All services have been stopped.")
 
@@ -0,0 +1,164 @@
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Bucket logaritmici in base 2 con 4 sotto-bucket lineari: errore relativo massimo del 25%, 64 bit di nanosecondi
+SUB_BUCKET_BITS = 2
+BUCKETS = 64 << SUB_BUCKET_BITS
+# Campioni accumulati per metodo/simbolo prima di essere riversati negli istogrammi
+FLUSH_SAMPLES = 1024
+
+
+def _bucket_index(ns: int) -> int:
+    """Histogram bucket of a duration: the value itself below 4 ns, otherwise its bit length and its 2 next bits."""
+    bit_length = ns.bit_length()
+    return ns if bit_length < 3 else (bit_length << SUB_BUCKET_BITS) | ((ns >> (bit_length - 3)) & 3)
+
+
+def _bucket_bounds(index: int) -> Tuple[int, int]:
+    """Nanosecond range [low, high) covered by a histogram bucket."""
+    if index < 4:
+        return index, index + 1
+    bit_length, sub_bucket = index >> SUB_BUCKET_BITS, index & 3
+    shift = bit_length - 3
+    return (4 | sub_bucket) << shift, ((4 | sub_bucket) + 1) << shift
+
+
+class LogHistogram:
+    """
+    Log-bucketed histogram of durations in nanoseconds, with constant time recording and fixed memory.
+    Each power of two is split into 4 linear sub-buckets, so percentiles are within 25% of the true value.
+    """
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, ns: int):
+        self.counts[_bucket_index(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def record_many(self, samples: List[int]):
+        """Records a batch of durations at once, computing their buckets with numpy."""
+        if not samples:
+            return
+        values = np.asarray(samples, dtype=np.int64)
+        # frexp restituisce la bit length esatta per valori interi sotto 2**53
+        bit_lengths = np.frexp(values.astype(np.float64))[1].astype(np.int64)
+        sub_buckets = (values >> np.maximum(bit_lengths - 3, 0)) & 3
+        indexes = np.where(bit_lengths < 3, values, (bit_lengths << SUB_BUCKET_BITS) | sub_buckets)
+        for index, bucket_count in zip(*np.unique(indexes, return_counts=True)):
+            self.counts[int(index)] += int(bucket_count)
+        self.count += len(samples)
+        self.total += int(values.sum())
+        self.max = max(self.max, int(values.max()))
+
+    def percentile(self, p: float) -> float:
+        """Returns the p-th percentile (0-100) in nanoseconds, as the midpoint of the bucket holding it."""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(p / 100 * self.count)))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                low, high = _bucket_bounds(index)
+                return min((low + high) / 2, self.max)
+        return float(self.max)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count / 1000 if self.count else 0.0,
+            "max_us": self.max / 1000,
+            "p50_us": self.percentile(50) / 1000,
+            "p90_us": self.percentile(90) / 1000,
+            "p99_us": self.percentile(99) / 1000,
+            "p999_us": self.percentile(99.9) / 1000,
+            # Solo i bucket non vuoti: limite inferiore in microsecondi -> conteggio
+            "buckets": {f"{_bucket_bounds(index)[0] / 1000:g}": bucket_count for index, bucket_count in enumerate(self.counts) if bucket_count}
+        }
+
+
+class CallStats:
+    __slots__ = ("calls", "errors", "lock_wait", "execution", "samples")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.lock_wait = LogHistogram()
+        self.execution = LogHistogram()
+        # Coppie (lock wait, esecuzione) non ancora riversate negli istogrammi, in un'unica lista
+        self.samples: List[int] = []
+
+    def flush(self):
+        if self.samples:
+            self.calls += len(self.samples) // 2
+            self.lock_wait.record_many(self.samples[0::2])
+            self.execution.record_many(self.samples[1::2])
+            self.samples.clear()
+
+
+class CallMetrics:
+    """
+    Call counts, error counts, lock wait and execution time histograms per method and symbol.
+
+    Meant to be recorded from the event loop thread on every call: recording is a dict lookup and two list
+    appends, without locks. The samples are moved into the histograms FLUSH_SAMPLES at a time with
+    numpy, and before every snapshot. Snapshots are plain dictionaries (method -> symbol -> stats, '*' for calls
+    without a symbol) and can be dumped to a JSON file.
+    """
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, Optional[str]], CallStats] = {}
+        self.started_at = time.time()
+
+    def record(self, method: str, symbol: Optional[str], lock_wait_ns: int, execution_ns: int, failed: bool):
+        stats = self._stats.get((method, symbol))
+        if stats is None:
+            stats = self._stats[(method, symbol)] = CallStats()
+        if failed:
+            stats.errors += 1
+        samples = stats.samples
+        samples.append(lock_wait_ns)
+        samples.append(execution_ns)
+        if len(samples) >= 2 * FLUSH_SAMPLES:
+            stats.flush()
+
+    def snapshot(self, method: Optional[str] = None, symbol: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for (stats_method, stats_symbol), stats in list(self._stats.items()):
+            if (method is not None and stats_method != method) or (symbol is not None and stats_symbol != symbol):
+                continue
+            stats.flush()
+            result.setdefault(stats_method, {})[stats_symbol if stats_symbol is not None else "*"] = {
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "lock_wait": stats.lock_wait.to_dict(),
+                "execution": stats.execution.to_dict()
+            }
+        return result
+
+    def dump(self, path: Optional[str] = None) -> str:
+        """Writes the snapshot to a JSON file (logs/broker_metrics_<pid>_<time>.json by default) and returns its path."""
+        if path is None:
+            path = os.path.join("logs", f"broker_metrics_{os.getpid()}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"pid": os.getpid(), "since": self.started_at, "dumped_at": time.time(), "methods": self.snapshot()}, f, indent=2)
+        return path
+
+    def reset(self):
+        self._stats.clear()
+        self.started_at = time.time()
@@ -36,7 +36,8 @@ class TradingConfiguration:
     Represents an individual trading configuration.
     """
 
-    def __init__(self, bot_name: str, agent: Optional[str], symbol: str, timeframe: Timeframe, trading_direction: TradingDirection, risk_percent: float, telegram_config: TelegramConfiguration):
+    def __init__(self, bot_name: str, agent: Optional[str], symbol: str, timeframe: Timeframe, trading_direction: TradingDirection, risk_percent: float, telegram_config: TelegramConfiguration,
+                 account: Optional[int] = None):
         self.bot_name = bot_name
         self.agent = agent
         self.symbol = symbol
@@ -44,11 +45,12 @@ class TradingConfiguration:
         self.trading_direction = trading_direction
         self.risk_percent = risk_percent
         self.telegram_config = telegram_config
+        self.account = account
 
     def __repr__(self):
         return (f"TradingConfiguration(bot_name={self.bot_name}, agent={self.agent}, symbol={self.symbol}, "
                 f"timeframe={self.timeframe.name}, trading_direction={self.trading_direction.name}, "
-                f"risk_percent={self.risk_percent}, telegram_config={self.telegram_config})")
+                f"risk_percent={self.risk_percent}, account={self.account}, telegram_config={self.telegram_config})")
 
     # Accessors
     def get_bot_name(self) -> str:
@@ -72,6 +74,10 @@ class TradingConfiguration:
     def get_telegram_config(self) -> TelegramConfiguration:
         return self.telegram_config
 
+    def get_account_id(self) -> Optional[int]:
+        """Broker account of the configuration, None for the default account."""
+        return self.account
+
     # Mutators
     def set_bot_name(self, bot_name: str):
         self.bot_name = bot_name
@@ -229,7 +235,8 @@ class ConfigReader:
                 timeframe=string_to_enum(Timeframe, timeframe),
                 trading_direction=string_to_enum(TradingDirection, trading_direction),
                 risk_percent=risk_percent,
-                telegram_config=telegram_configuration
+                telegram_config=telegram_configuration,
+                account=int(item["account"]) if item.get("account") is not None else None
             )
             configurations.append(config)
         return configurations
@@ -263,6 +270,22 @@ class ConfigReader:
     def get_broker_mt5_path(self) -> str:
         return self.broker_config.get("mt5_path")
 
+    def get_broker_gateway_endpoint(self) -> Optional[str]:
+        return self.broker_config.get("gateway_endpoint")
+
+    def get_broker_gateway_token(self) -> Optional[str]:
+        return self.broker_config.get("gateway_token")
+
+    def get_broker_market_stream_port(self) -> Optional[int]:
+        return self.broker_config.get("market_stream_port")
+
+    def get_broker_accounts(self) -> List[Dict[str, Any]]:
+        """Accounts served by the broker pool, each with account, password, server, mt5_path and optionally max_concurrency."""
+        return self.broker_config.get("accounts") or []
+
+    def get_broker_pool_base_port(self) -> Optional[int]:
+        return self.broker_config.get("pool_base_port")
+
     # Trading Config
     def get_trading_configurations(self) -> List[TradingConfiguration]:
         return self.trading_configs
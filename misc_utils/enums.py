@@ -97,6 +97,8 @@ class OrderType(Enum):
 class DealType(Enum):
     EXIT = "Exit"
     ENTER = "Enter"
+    INOUT = "InOut"
+    EXIT_BY = "ExitBy"
     OTHER = "Other"
 
 
@@ -106,6 +108,12 @@ class PositionType(Enum):
     OTHER = "OTHER"
 
 
+class PositionChangeType(Enum):
+    OPENED = "Opened"
+    MODIFIED = "Modified"
+    CLOSED = "Closed"
+
+
 class OrderSource(Enum):
     STOP_LOSS = "Stop Loss"
     TAKE_PROFIT = "Take Profit"
@@ -5,6 +5,18 @@ from typing import Callable, Awaitable, TypeVar, Optional
 R = TypeVar('R')
 
 
+def log_exception(func: Callable, args: tuple, e: Exception):
+    """Logs an exception raised by func with the logger of its instance (args[0]), falling back to print."""
+    instance = args[0] if args else None
+    logger = getattr(instance, 'logger', None)
+    if logger and callable(getattr(logger, 'error', None)):
+        logger.error(f"Exception in {func.__name__}: {e}")
+    else:
+        # Fallback if an appropriate logger does not exist
+        print(f"Exception in {func.__name__}: {e}")
+        traceback.print_exc()
+
+
 def exception_handler(func: Callable[..., Awaitable[R]]) -> Callable[..., Awaitable[Optional[R]]]:
     """
     Decorator to handle exceptions in asynchronous static or instance methods.
@@ -24,14 +36,9 @@ def exception_handler(func: Callable[..., Awaitable[R]]) -> Callable[..., Awaita
             return await func(*args, **kwargs)
         except Exception as e:
             # If `self` is provided, use its logger; otherwise, fallback to print
-            instance = args[0] if args else None
-            logger = getattr(instance, 'logger', None)
-            if logger and callable(getattr(logger, 'error', None)):
-                logger.error(f"Exception in {func.__name__}: {e}")
-            else:
-                # Fallback if an appropriate logger does not exist
-                print(f"Exception in {func.__name__}: {e}")
-                traceback.print_exc()
+            log_exception(func, args, e)
             return None  # Returns None instead of raising the exception
 
+    # Chi deve sapere se la chiamata è fallita (es. le metriche del proxy Broker) invoca la funzione originale
+    wrapper.handled_function = func
     return wrapper
@@ -0,0 +1,84 @@
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+
+class LatencyStats:
+    """
+    Accumulates latency samples (expressed in seconds) for a single measured operation.
+    Keeps running aggregates plus a bounded window of recent samples used for percentiles.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.count: int = 0
+        self.total: float = 0.0
+        self.min: Optional[float] = None
+        self.max: float = 0.0
+        self.last: float = 0.0
+        self._samples = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self._samples.append(seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Returns the p-th percentile (0-100) of the recent samples window."""
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": self.mean * 1000,
+            "min_ms": (self.min or 0.0) * 1000,
+            "max_ms": self.max * 1000,
+            "last_ms": self.last * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000
+        }
+
+
+class LatencyRegistry:
+    """
+    Thread-safe collection of named LatencyStats.
+    Samples can be recorded from any thread, snapshots are returned as plain dictionaries.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._window = window
+        self._stats: Dict[str, LatencyStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = LatencyStats(self._window)
+            stats.add(seconds)
+
+    def get(self, name: str) -> Optional[Dict[str, float]]:
+        with self._lock:
+            stats = self._stats.get(name)
+            return stats.to_dict() if stats is not None else None
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,79 @@
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, List
+
+from dto.Deal import Deal
+from misc_utils.bot_logger import BotLogger
+from misc_utils.utils_functions import create_directories, dt_to_unix, unix_to_datetime
+
+
+class ClosedDealsLedger:
+    """
+    Persistent high-water mark of the account deals processed by the ClosedDealsNotifier.
+
+    Stores, per account, the last processed deal ticket and time together with the ids of the last positions
+    notified as closed, so that after a restart only newer deals are fetched and no position is notified twice.
+    """
+
+    def __init__(self, account_id: int, output_path: str = "output/ledger", max_emitted_positions: int = 1000):
+        self.logger = BotLogger.get_logger("ClosedDealsLedger")
+        self.account_id = account_id
+        self.max_emitted_positions = max_emitted_positions
+        create_directories(output_path)
+        self.file_path = os.path.join(output_path, f"closed_deals_{account_id}.json")
+        self.last_deal_ticket: int = 0
+        self.last_deal_time: Optional[datetime] = None
+        self._emitted_positions: OrderedDict[int, None] = OrderedDict()
+
+    @property
+    def is_initialized(self) -> bool:
+        return self.last_deal_time is not None
+
+    def load(self) -> 'ClosedDealsLedger':
+        if not os.path.exists(self.file_path):
+            return self
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.last_deal_ticket = int(data.get("last_deal_ticket", 0))
+            self.last_deal_time = unix_to_datetime(data["last_deal_time"]) if data.get("last_deal_time") is not None else None
+            self._emitted_positions = OrderedDict((int(position_id), None) for position_id in data.get("emitted_positions", []))
+            self.logger.info(f"Ledger loaded for account {self.account_id}: last deal {self.last_deal_ticket} at {self.last_deal_time}")
+        except Exception as e:
+            self.logger.error(f"Error loading closed deals ledger {self.file_path}, starting from scratch: {e}")
+        return self
+
+    def save(self):
+        data = {
+            "account_id": self.account_id,
+            "last_deal_ticket": self.last_deal_ticket,
+            "last_deal_time": dt_to_unix(self.last_deal_time) if self.last_deal_time is not None else None,
+            "emitted_positions": list(self._emitted_positions.keys())
+        }
+        # Scrittura atomica: file temporaneo e poi rename
+        tmp_path = self.file_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.file_path)
+
+    def start_from(self, start_time: datetime):
+        """Initializes an empty ledger: only deals executed from start_time onward will be processed."""
+        self.last_deal_ticket = 0
+        self.last_deal_time = start_time
+
+    def is_emitted(self, position_id: int) -> bool:
+        return position_id in self._emitted_positions
+
+    def mark_emitted(self, position_id: int):
+        self._emitted_positions[position_id] = None
+        while len(self._emitted_positions) > self.max_emitted_positions:
+            self._emitted_positions.popitem(last=False)
+
+    def advance(self, deals: List[Deal]):
+        """Moves the high-water mark to the last of the given deals."""
+        for deal in deals:
+            if deal.ticket > self.last_deal_ticket:
+                self.last_deal_ticket = deal.ticket
+                self.last_deal_time = max(self.last_deal_time, deal.time) if self.last_deal_time else deal.time
@@ -1,16 +1,22 @@
 import asyncio
+import time
 from typing import Optional
 
 from agents.agent_registration_aware import RegistrationAwareAgent
 from dto.OrderRequest import OrderRequest
+from dto.OrderTemplate import OrderTemplate
 from dto.QueueMessage import QueueMessage
 from misc_utils.config import ConfigReader, TradingConfiguration
 from misc_utils.enums import Timeframe, TradingDirection, OpType, RabbitExchange
 from misc_utils.error_handler import exception_handler
-from misc_utils.utils_functions import string_to_enum, round_to_point, round_to_step, unix_to_datetime, extract_properties
+from misc_utils.latency_stats import LatencyRegistry
+from misc_utils.utils_functions import string_to_enum, round_to_point, unix_to_datetime, extract_properties
 from notifiers.notifier_closed_deals import ClosedDealsNotifier
 from services.service_rabbitmq import RabbitMQService
 
+# Oltre questa età il template viene ricostruito al momento del segnale
+ORDER_TEMPLATE_MAX_AGE = 5 * 60
+
 
 class ExecutorAgent(RegistrationAwareAgent):
 
@@ -18,6 +24,9 @@ class ExecutorAgent(RegistrationAwareAgent):
         super().__init__(config, trading_config)
         self.signal_confirmations = []
         self.market_open_event = asyncio.Event()
+        self.order_template: Optional[OrderTemplate] = None
+        self._template_refresh_task: Optional[asyncio.Task] = None
+        self.order_latency = LatencyRegistry()
 
     @exception_handler
     async def start(self):
@@ -80,8 +89,15 @@ class ExecutorAgent(RegistrationAwareAgent):
             self.logger.info(f"Adding new confirmation for {symbol} {timeframe}")
             self.signal_confirmations.append(signal_confirmation)
 
+        if signal_confirmation.get("confirmed"):
+            # Il segnale di ingresso può arrivare a breve: il template viene aggiornato ora
+            self.schedule_order_template_refresh()
+
     @exception_handler
     async def on_enter_signal(self, routing_key: str, message: QueueMessage):
+        signal_received_at = time.time()
+        if message.timestamp is not None:
+            self.order_latency.record("signal_transit", max(0.0, signal_received_at - message.timestamp))
         self.logger.info(f"Received enter signal for {routing_key}: {message.payload}")
 
         symbol = self.trading_config.get_symbol()
@@ -120,7 +136,7 @@ class ExecutorAgent(RegistrationAwareAgent):
             if existing_confirmation:
                 if existing_confirmation["confirmed"]:
                     self.logger.info(f"Confirmation found for {symbol} - {timeframe} - {direction} - {candle_open_time_str} - {candle_close_time_str}")
-                    order = await self.prepare_order_to_place(cur_candle)
+                    order = await self.prepare_order_to_place(cur_candle, signal_received_at)
 
                     if order is None:
                         self.logger.error(f"Error while preparing order for signal of {candle_open_time_str} - {candle_close_time_str}")
@@ -139,6 +155,10 @@ class ExecutorAgent(RegistrationAwareAgent):
         self.logger.info(f"[place_order] Placing order: {order}")
 
         response = await self.broker.place_order(order)
+        if order.signal_received_at is not None:
+            elapsed = time.time() - order.signal_received_at
+            self.order_latency.record("signal_to_order_result", elapsed)
+            self.logger.info(f"[place_order] Signal to order result latency: {elapsed * 1000:.1f} ms")
 
         self.logger.debug(f"[place_order] Result of order placement: {response.success}")
 
@@ -225,66 +245,99 @@ class ExecutorAgent(RegistrationAwareAgent):
         # Return the price rounded to the symbol's point value.
         return round_to_point(adjusted_price, symbol_point)
 
-    def get_volume(self, account_balance, symbol_info, entry_price, stop_loss_price):
+    def get_volume(self, account_balance, order_template: OrderTemplate, entry_price, stop_loss_price):
         risk_percent = self.trading_config.get_risk_percent()
         self.logger.info(
-            f"Calculating volume for account balance {account_balance}, symbol info {symbol_info}, entry price {entry_price}, stop loss price {stop_loss_price}, and risk percent {risk_percent}")
-        risk_amount = account_balance * risk_percent
-        stop_loss_pips = abs(entry_price - stop_loss_price) / symbol_info.point
-        pip_value = symbol_info.trade_contract_size * symbol_info.point
-        volume = risk_amount / (stop_loss_pips * pip_value)
-        # Adjust volume to meet broker's constraints
-        adjusted_volume = max(
-            symbol_info.volume_min,
-            min(symbol_info.volume_max, round_to_step(volume, symbol_info.volume_step))
-        )
-        return adjusted_volume
+            f"Calculating volume for account balance {account_balance}, symbol {order_template.symbol}, entry price {entry_price}, stop loss price {stop_loss_price}, and risk percent {risk_percent}")
+        # Adjusted to meet broker's constraints (volume step, min and max volume)
+        return order_template.volume_for_risk(account_balance * risk_percent, entry_price, stop_loss_price)
+
+    def schedule_order_template_refresh(self):
+        if self._template_refresh_task is None or self._template_refresh_task.done():
+            self._template_refresh_task = asyncio.create_task(self.refresh_order_template())
+
+    @exception_handler
+    async def refresh_order_template(self) -> Optional[OrderTemplate]:
+        symbol = self.trading_config.get_symbol()
+        order_template = await self.broker.get_order_template(symbol)
+        if order_template is None:
+            self.logger.warning(f"Order template for {symbol} not available.")
+            return None
+        self.order_template = order_template
+        self.logger.debug(f"Order template refreshed: {order_template}")
+        return order_template
+
+    async def get_order_template(self) -> Optional[OrderTemplate]:
+        order_template = self.order_template
+        if order_template is not None and order_template.age() <= ORDER_TEMPLATE_MAX_AGE:
+            return order_template
+        # Percorso lento: template mai costruito o scaduto
+        if self._template_refresh_task is not None and not self._template_refresh_task.done():
+            return await self._template_refresh_task
+        return await self.refresh_order_template()
 
     @exception_handler
-    async def prepare_order_to_place(self, cur_candle: dict) -> Optional[OrderRequest]:
+    async def prepare_order_to_place(self, cur_candle: dict, signal_received_at: Optional[float] = None) -> Optional[OrderRequest]:
         symbol = self.trading_config.get_symbol()
         trading_direction = self.trading_config.get_trading_direction()
         order_type_enter = OpType.BUY if trading_direction == TradingDirection.LONG else OpType.SELL
         timeframe = self.trading_config.get_timeframe()
         magic_number = self.config.get_bot_magic_number()
 
-        symbol_info = await self.broker.get_market_info(symbol)
+        order_template = await self.get_order_template()
 
-        if symbol_info is None:
+        if order_template is None:
             self.logger.error("[place_order] Symbol info not found.")
             await self.send_message_update("🚫 Symbol info not found for placing the order.")
             raise Exception(f"Symbol info {symbol} not found.")
 
-        point = symbol_info.point
-        volume_min = symbol_info.volume_min
+        # Saldo letto al momento dell'ordine: cambia a ogni deal chiuso, il template no
+        account_balance = await self.broker.get_account_balance()
+        if account_balance is None:
+            self.logger.error("[place_order] Account balance not available.")
+            await self.send_message_update(f"🚫 Account balance not available, order on {symbol} not placed.")
+            return None
+
+        # Da qui in poi solo calcoli dipendenti dal prezzo, nessuna chiamata al broker
+        point = order_template.point
+        volume_min = order_template.volume_min
 
         price = self.get_order_price(cur_candle, point, trading_direction)
         sl = self.get_stop_loss(cur_candle, point, trading_direction)
         tp = self.get_take_profit(cur_candle, price, point, timeframe, trading_direction)
 
-        account_balance = await self.broker.get_account_balance()
+        volume = self.get_volume(account_balance=account_balance, order_template=order_template, entry_price=price, stop_loss_price=sl)
 
-        volume = self.get_volume(account_balance=account_balance, symbol_info=symbol_info, entry_price=price, stop_loss_price=sl)
+        self.logger.info(f"[place_order] Account balance: {account_balance}, Calculated volume for the order on {symbol} at price {price}: {volume}")
 
-        self.logger.info(f"[place_order] Account balance retrieved: {account_balance}, Calculated volume for the order on {symbol} at price {price}: {volume}")
+        if volume is None:
+            self.logger.warning(f"[place_order] Stop loss {sl} equals the order price {price}, cannot size the order")
+            await self.send_message_update(f"❗ Stop loss equals the order price for {symbol}, order not placed.")
+            return None
 
         if volume < volume_min:
             self.logger.warning(f"[place_order] Volume of {volume} is less than minimum of {volume_min}")
             await self.send_message_update(f"❗ Volume of {volume} is less than the minimum of {volume_min} for {symbol}.")
             return None
 
-        filling_mode = await self.broker.get_filling_mode(symbol)
-        self.logger.debug(f"Filling mode for {symbol}: {filling_mode}")
-
-        return OrderRequest(order_type=order_type_enter,
-                            symbol=symbol,
-                            order_price=price,
-                            volume=volume,
-                            sl=sl,
-                            tp=tp,
-                            comment="bot-enter-signal",
-                            filling_mode=filling_mode,
-                            magic_number=magic_number)
+        self.logger.debug(f"Filling mode for {symbol}: {order_template.filling_mode}")
+
+        order = OrderRequest(order_type=order_type_enter,
+                             symbol=symbol,
+                             order_price=price,
+                             volume=volume,
+                             sl=sl,
+                             tp=tp,
+                             comment="bot-enter-signal",
+                             filling_mode=order_template.filling_mode,
+                             magic_number=magic_number,
+                             signal_received_at=signal_received_at)
+        if signal_received_at is not None:
+            self.order_latency.record("signal_to_order_request", time.time() - signal_received_at)
+        return order
+
+    def get_order_latency_stats(self):
+        return self.order_latency.snapshot()
 
     @exception_handler
     async def send_queue_message(self, exchange: RabbitExchange,
@@ -316,5 +369,6 @@ class ExecutorAgent(RegistrationAwareAgent):
             self.logger.info(f"Market for {symbol} has {'opened' if is_open else 'closed'} at {unix_to_datetime(time_ref)}.")
             if is_open:
                 self.market_open_event.set()
+                self.schedule_order_template_refresh()
             else:
                 self.market_open_event.clear()
@@ -3,13 +3,19 @@ import threading
 from typing import Dict, List, Optional, Callable, Awaitable
 
 from brokers.broker_interface import BrokerAPI
+from dto.Deal import Deal
 from dto.Position import Position
 from misc_utils.bot_logger import BotLogger
+from misc_utils.enums import DealType
 from misc_utils.error_handler import exception_handler
 from misc_utils.utils_functions import now_utc
+from notifiers.closed_deals_ledger import ClosedDealsLedger
 
 ObserverCallback = Callable[[Position], Awaitable[None]]
 
+# Deal che chiudono volume di una posizione: uscita, chiusura con posizione opposta e inversione
+EXIT_DEAL_TYPES = {DealType.EXIT, DealType.EXIT_BY, DealType.INOUT}
+
 
 class SymbolDealsObserver:
     """Rappresenta un observer per le posizioni chiuse di un simbolo."""
@@ -21,7 +27,7 @@ class SymbolDealsObserver:
 
 
 class ClosedDealsNotifier:
-    """Manager thread-safe per monitorare le posizioni chiuse."""
+    """Manager thread-safe per monitorare le posizioni chiuse, con un unico loop per l'intero account."""
 
     _instance: Optional['ClosedDealsNotifier'] = None
     _instance_lock: threading.Lock = threading.Lock()
@@ -42,7 +48,7 @@ class ClosedDealsNotifier:
                 self._observers_lock: asyncio.Lock = asyncio.Lock()
                 # Dizionari per gli observers e i task
                 self.observers: Dict[str, Dict[int, Dict[str, SymbolDealsObserver]]] = {}
-                self.tasks: Dict[str, asyncio.Task] = {}
+                self.monitor_task: Optional[asyncio.Task] = None
                 self.logger: BotLogger = BotLogger.get_logger("ClosedDealsManager")
                 self.interval_seconds: int = 60  # 1 minuto
                 self._initialized = True
@@ -68,10 +74,10 @@ class ClosedDealsNotifier:
                 f"Registered observer {observer_id} for symbol {symbol} with magic number {magic_number}"
             )
 
-            # Avvia un nuovo task di monitoraggio per questo simbolo se non già in esecuzione
-            if symbol not in self.tasks:
-                self.tasks[symbol] = asyncio.create_task(self._monitor_symbol(symbol, broker))
-                self.logger.info(f"Started monitoring for symbol {symbol}")
+            # Avvia il task di monitoraggio dell'account se non già in esecuzione
+            if self.monitor_task is None:
+                self.monitor_task = asyncio.create_task(self._monitor_account(broker))
+                self.logger.info("Started closed deals monitoring")
 
     @exception_handler
     async def unregister_observer(self, symbol: str, magic_number: int, observer_id: str) -> None:
@@ -93,64 +99,33 @@ class ClosedDealsNotifier:
                     del self.observers[symbol]
                     self.logger.info(f"Stopped monitoring for symbol {symbol}")
 
-                    # Cancella il task di monitoraggio per questo simbolo
-                    if symbol in self.tasks:
-                        self.tasks[symbol].cancel()
-                        try:
-                            await self.tasks[symbol]
-                        except asyncio.CancelledError:
-                            pass
-                        del self.tasks[symbol]
-                        self.logger.info(f"Stopped monitoring task for symbol {symbol}")
-
-    async def _monitor_symbol(self, symbol: str, broker: BrokerAPI) -> None:
-        """Loop di monitoraggio per un simbolo specifico."""
+            # Cancella il task di monitoraggio quando non ci sono più observers
+            if not self.observers and self.monitor_task is not None:
+                self.monitor_task.cancel()
+                try:
+                    await self.monitor_task
+                except asyncio.CancelledError:
+                    pass
+                self.monitor_task = None
+                self.logger.info("Stopped closed deals monitoring task")
+
+    async def _monitor_account(self, broker: BrokerAPI) -> None:
+        """
+        Loop di monitoraggio unico per l'intero account: recupera solo i deal successivi all'ultimo
+        elaborato (high-water mark persistito nel ledger), ricostruisce le posizioni chiuse e le notifica una sola volta.
+        """
         try:
-            last_check_time = now_utc()
-            while True:
-                current_time = now_utc()
-                prev_check_time = last_check_time
-                last_check_time = current_time
-
-                # Verifica se il mercato è aperto
-                if not await broker.is_market_open(symbol):
-                    await asyncio.sleep(self.interval_seconds)
-                    continue
+            account_id = await broker.get_account_id()
+            ledger = ClosedDealsLedger(account_id).load()
+            if not ledger.is_initialized:
+                ledger.start_from(now_utc())
+                ledger.save()
 
-                async with self._observers_lock:
-                    magic_observers = self.observers.get(symbol, {}).copy()
-
-                for magic_number, observers in magic_observers.items():
-                    try:
-                        # Ottieni le posizioni chiuse per il simbolo e magic number
-                        positions: List[Position] = await broker.get_historical_positions(
-                            prev_check_time,
-                            current_time,
-                            symbol,
-                            magic_number
-                        )
-
-                        if not positions:
-                            continue
-
-                        # Notifica tutti gli observers per questo magic number
-                        notification_tasks = [
-                            observer.callback(position)
-                            for observer in observers.values()
-                            for position in positions
-                        ]
-
-                        if notification_tasks:
-                            await asyncio.gather(*notification_tasks, return_exceptions=True)
-                            self.logger.debug(
-                                f"Notified {len(positions)} closed positions for "
-                                f"symbol {symbol} with magic number {magic_number} "
-                                f"to {len(observers)} observers"
-                            )
-                    except Exception as e:
-                        self.logger.error(
-                            f"Error processing symbol {symbol} with magic number {magic_number}: {e}"
-                        )
+            while True:
+                try:
+                    await self._process_new_deals(broker, ledger)
+                except Exception as e:
+                    self.logger.error(f"Error processing closed deals for account {account_id}: {e}")
 
                 await asyncio.sleep(self.interval_seconds)
 
@@ -158,14 +133,82 @@ class ClosedDealsNotifier:
             # Il task è stato cancellato
             pass
         except Exception as e:
-            self.logger.error(f"Error in monitor loop for symbol {symbol}: {e}")
+            self.logger.error(f"Error in closed deals monitor loop: {e}")
+
+    async def _process_new_deals(self, broker: BrokerAPI, ledger: ClosedDealsLedger) -> None:
+        new_deals: List[Deal] = await broker.get_deals_since(ledger.last_deal_ticket, ledger.last_deal_time, include_orders=False)
+        if not new_deals:
+            return
+
+        async with self._observers_lock:
+            observers = {symbol: {magic: dict(obs) for magic, obs in magics.items()} for symbol, magics in self.observers.items()}
+
+        # Posizioni con un nuovo deal di uscita, raggruppate per simbolo
+        closing_positions: Dict[str, List[int]] = {}
+        for deal in new_deals:
+            if deal.deal_type in EXIT_DEAL_TYPES and deal.position_id and not ledger.is_emitted(deal.position_id):
+                closing_positions.setdefault(deal.symbol, [])
+                if deal.position_id not in closing_positions[deal.symbol]:
+                    closing_positions[deal.symbol].append(deal.position_id)
+
+        # Posizioni chiuse i cui deal non sono ancora visibili nello storico
+        unresolved_positions = set()
+        for symbol, position_ids in closing_positions.items():
+            all_deals = await broker.get_deals_by_position(position_ids, symbol, None, include_orders=True)
+            if all_deals is None:
+                # Il ledger non viene avanzato: i deal verranno rielaborati al prossimo ciclo
+                raise Exception(f"Unable to retrieve the deals of positions {position_ids} of symbol {symbol}")
+
+            for position_id in position_ids:
+                position_deals = all_deals.get(position_id)
+                if not position_deals:
+                    unresolved_positions.add(position_id)
+                    continue
+                if not self._is_position_closed(position_deals):
+                    # Chiusura parziale: la posizione verrà notificata alla chiusura completa
+                    continue
+
+                ledger.mark_emitted(position_id)
+                notification_tasks = []
+                for magic_number, magic_observers in observers.get(symbol, {}).items():
+                    magic_deals = [deal for deal in position_deals if deal.magic_number == magic_number]
+                    if not magic_deals:
+                        continue
+                    position = Position(
+                        position_id=position_id,
+                        symbol=symbol,
+                        open=False,
+                        deals=magic_deals,
+                        profit=sum(deal.profit for deal in magic_deals)
+                    )
+                    notification_tasks.extend(observer.callback(position) for observer in magic_observers.values())
+
+                if notification_tasks:
+                    await asyncio.gather(*notification_tasks, return_exceptions=True)
+                    self.logger.debug(f"Notified closed position {position_id} of symbol {symbol} to {len(notification_tasks)} observers")
+
+        if unresolved_positions:
+            # Il ledger si ferma prima della prima uscita non risolta: verrà rielaborata al prossimo ciclo
+            first_unresolved = min(deal.ticket for deal in new_deals
+                                   if deal.deal_type in EXIT_DEAL_TYPES and deal.position_id in unresolved_positions)
+            self.logger.warning(f"Deals of closed positions {sorted(unresolved_positions)} not available yet, retrying from deal {first_unresolved}")
+            new_deals = [deal for deal in new_deals if deal.ticket < first_unresolved]
+        ledger.advance(new_deals)
+        ledger.save()
+
+    @staticmethod
+    def _is_position_closed(deals: List[Deal]) -> bool:
+        """A position is closed when the volume of its exit deals (out, out by, in/out) matches the volume of its entry deals."""
+        volume_in = sum(deal.volume for deal in deals if deal.deal_type == DealType.ENTER)
+        volume_out = sum(deal.volume for deal in deals if deal.deal_type in EXIT_DEAL_TYPES)
+        return volume_in > 0 and volume_out >= volume_in - 1e-8
 
     async def shutdown(self) -> None:
         """Ferma tutti i task di monitoraggio e pulisce le risorse."""
         async with self._observers_lock:
-            for task in self.tasks.values():
-                task.cancel()
-            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
-            self.tasks.clear()
+            if self.monitor_task is not None:
+                self.monitor_task.cancel()
+                await asyncio.gather(self.monitor_task, return_exceptions=True)
+                self.monitor_task = None
             self.observers.clear()
             self.logger.info("ClosedDealsManager shutdown completed")
@@ -156,12 +156,12 @@ class NotifierEconomicEvents:
                 countries.extend(countries_set)  # Converti il set in una lista
             _from = now_utc() + hours_delta
             _to = _from + timedelta(days=20) + hours_delta
-            for country in countries:
-                events_tmp: List[EconomicEvent] = await self.broker.get_economic_calendar(country, _from, _to)
-                if events_tmp:
-                    for event in events_tmp:
-                        event.time = event.time - hours_delta
-                    events.extend(events_tmp)
+            # Tutti i paesi con un'unica richiesta al servizio del calendario
+            events_tmp: List[EconomicEvent] = await self.broker.get_economic_calendar_events(countries, _from, _to)
+            if events_tmp:
+                for event in events_tmp:
+                    event.time = event.time - hours_delta
+                events.extend(events_tmp)
 
             e = EconomicEvent(
                 event_id="309r78n48cx",
@@ -3,19 +3,23 @@ import threading
 from datetime import datetime
 from typing import Dict, Callable, Awaitable, Optional
 
+from brokers.market_stream import MarketStreamSubscriber, StreamBar
 from misc_utils.enums import Timeframe
 from misc_utils.bot_logger import BotLogger
 from misc_utils.error_handler import exception_handler
-from misc_utils.utils_functions import now_utc
+from misc_utils.utils_functions import now_utc, unix_to_datetime, dt_to_unix
 
 ObserverCallback = Callable[[Timeframe, datetime], Awaitable[None]]
 
 
 class TickObserver:
-    """Rappresenta un osservatore per un tick di un timeframe."""
+    """Rappresenta un osservatore per un tick di un timeframe, opzionalmente legato a un simbolo."""
 
-    def __init__(self, callback: ObserverCallback):
+    def __init__(self, callback: ObserverCallback, symbol: Optional[str] = None):
         self.callback = callback
+        self.symbol = symbol
+        # Chiusura dell'ultima barra notificata, evita doppie notifiche tra stream e orologio
+        self.last_notified: Optional[datetime] = None
 
 
 class NotifierTickUpdates:
@@ -39,21 +43,43 @@ class NotifierTickUpdates:
                 self._observers_lock = asyncio.Lock()
                 self.observers: Dict[Timeframe, Dict[str, TickObserver]] = {}
                 self.tasks: Dict[Timeframe, asyncio.Task] = {}
+                self.market_stream: Optional[MarketStreamSubscriber] = None
+                self.stream_grace_seconds: int = 60
                 self.logger = BotLogger.get_logger("TickManager")
                 self._initialized = True
 
+    @exception_handler
+    async def enable_market_stream(self, market_stream: MarketStreamSubscriber):
+        """
+        Notifica gli osservatori legati a un simbolo alla chiusura della barra pubblicata dal servizio MarketStream,
+        invece che allo scadere del timeframe sull'orologio locale. L'orologio resta attivo come fallback
+        quando lo stream non riceve messaggi.
+        """
+        async with self._observers_lock:
+            self.market_stream = market_stream
+            for timeframe, observers in self.observers.items():
+                for observer in observers.values():
+                    if observer.symbol is not None:
+                        market_stream.register_bar_observer(observer.symbol, timeframe, self._on_stream_bar, "TickManager")
+            market_stream.start()
+            self.logger.info(f"Market stream enabled on {market_stream.endpoint}")
+
     @exception_handler
     async def register_observer(self,
                                 timeframe: Timeframe,
                                 callback: ObserverCallback,
-                                observer_id: str):
-        """Registra un nuovo osservatore per un timeframe."""
+                                observer_id: str,
+                                symbol: Optional[str] = None):
+        """Registra un nuovo osservatore per un timeframe. Con il simbolo può essere notificato dallo stream delle barre."""
         async with self._observers_lock:
             if timeframe not in self.observers:
                 self.observers[timeframe] = {}
-            self.observers[timeframe][observer_id] = TickObserver(callback)
+            self.observers[timeframe][observer_id] = TickObserver(callback, symbol)
             self.logger.info(f"Registered observer {observer_id} for timeframe {timeframe.name}")
 
+            if symbol is not None and self.market_stream is not None:
+                self.market_stream.register_bar_observer(symbol, timeframe, self._on_stream_bar, "TickManager")
+
             # Avvia un nuovo task per questo timeframe se non già in esecuzione
             if timeframe not in self.tasks:
                 self.tasks[timeframe] = asyncio.create_task(self._monitor_timeframe(timeframe))
@@ -64,9 +90,14 @@ class NotifierTickUpdates:
         """Rimuove un osservatore per un timeframe."""
         async with self._observers_lock:
             if timeframe in self.observers and observer_id in self.observers[timeframe]:
-                del self.observers[timeframe][observer_id]
+                observer = self.observers[timeframe].pop(observer_id)
                 self.logger.info(f"Unregistered observer {observer_id} for timeframe {timeframe.name}")
 
+                # Il topic dello stream resta sottoscritto finché altri osservatori usano lo stesso simbolo
+                if observer.symbol is not None and self.market_stream is not None \
+                        and not any(o.symbol == observer.symbol for o in self.observers[timeframe].values()):
+                    self.market_stream.unregister_bar_observer(observer.symbol, timeframe, "TickManager")
+
                 # Se non ci sono più osservatori per questo timeframe, cancella il task
                 if not self.observers[timeframe]:
                     del self.observers[timeframe]
@@ -93,21 +124,22 @@ class NotifierTickUpdates:
                 await asyncio.sleep(sleep_seconds)
                 self.logger.info(f"New tick for {timeframe.name}.")
                 tick_time = now_utc()
+                bar_close = unix_to_datetime(int(dt_to_unix(tick_time)) // timeframe_seconds * timeframe_seconds)
 
                 # Notifica gli osservatori
                 async with self._observers_lock:
                     observers = self.observers.get(timeframe, {}).copy()
-
-                notification_tasks = []
-                for observer_id, observer in observers.items():
-                    try:
-                        notification_tasks.append(observer.callback(timeframe, tick_time))
-                    except Exception as e:
-                        self.logger.error(f"Error preparing notification for observer {observer_id}: {e}")
-
-                if notification_tasks:
-                    await asyncio.gather(*notification_tasks, return_exceptions=True)
-                    self.logger.debug(f"Notified observers for timeframe {timeframe.name} at {tick_time}")
+                    # Gli osservatori di un simbolo sono serviti dallo stream finché questo è attivo
+                    stream_alive = self.market_stream is not None and self.market_stream.is_alive()
+
+                clock_observers = {observer_id: observer for observer_id, observer in observers.items()
+                                   if not (observer.symbol is not None and stream_alive)}
+                stream_observers = {observer_id: observer for observer_id, observer in observers.items()
+                                    if observer_id not in clock_observers}
+                if stream_observers:
+                    # Se la barra non arriva dallo stream entro il tempo di grazia, notifica comunque
+                    asyncio.create_task(self._stream_fallback(timeframe, stream_observers, bar_close))
+                await self._notify_observers(timeframe, clock_observers, tick_time, bar_close)
 
         except asyncio.CancelledError:
             # Il task è stato cancellato, pulizia se necessario
@@ -115,6 +147,37 @@ class NotifierTickUpdates:
         except Exception as e:
             self.logger.error(f"Error in timeframe monitor loop for {timeframe.name}: {e}")
 
+    async def _on_stream_bar(self, bar: StreamBar):
+        """Notifica la chiusura di una barra ricevuta dallo stream agli osservatori del simbolo."""
+        async with self._observers_lock:
+            observers = {observer_id: observer for observer_id, observer in self.observers.get(bar.timeframe, {}).items()
+                         if observer.symbol == bar.symbol}
+        self.logger.info(f"New {bar.timeframe.name} bar closed at {bar.time_close} for {bar.symbol}.")
+        await self._notify_observers(bar.timeframe, observers, bar.time_close, bar.time_close)
+
+    async def _stream_fallback(self, timeframe: Timeframe, observers: Dict[str, TickObserver], bar_close: datetime):
+        await asyncio.sleep(self.stream_grace_seconds)
+        late_observers = {observer_id: observer for observer_id, observer in observers.items()
+                          if observer.last_notified is None or observer.last_notified < bar_close}
+        if late_observers:
+            self.logger.warning(f"{timeframe.name} bar closed at {bar_close} not received from the market stream, notifying {len(late_observers)} observers by clock.")
+            await self._notify_observers(timeframe, late_observers, now_utc(), bar_close)
+
+    async def _notify_observers(self, timeframe: Timeframe, observers: Dict[str, TickObserver], tick_time: datetime, bar_close: datetime):
+        notification_tasks = []
+        for observer_id, observer in observers.items():
+            if observer.last_notified is not None and observer.last_notified >= bar_close:
+                continue
+            observer.last_notified = bar_close
+            try:
+                notification_tasks.append(observer.callback(timeframe, tick_time))
+            except Exception as e:
+                self.logger.error(f"Error preparing notification for observer {observer_id}: {e}")
+
+        if notification_tasks:
+            await asyncio.gather(*notification_tasks, return_exceptions=True)
+            self.logger.debug(f"Notified observers for timeframe {timeframe.name} at {tick_time}")
+
     async def shutdown(self):
         """Ferma tutti i task di monitoraggio e pulisce le risorse."""
         async with self._observers_lock:
@@ -123,4 +186,7 @@ class NotifierTickUpdates:
             await asyncio.gather(*self.tasks.values(), return_exceptions=True)
             self.tasks.clear()
             self.observers.clear()
+            if self.market_stream is not None:
+                await self.market_stream.stop()
+                self.market_stream = None
             self.logger.info("TickManager shutdown completed")
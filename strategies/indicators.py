@@ -1,4 +1,11 @@
-import pandas_ta as ta
+import math
+import sys
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 
 from misc_utils.enums import Indicators
 
@@ -6,47 +13,459 @@ STOCHASTIC_K = Indicators.STOCHASTIC_K.name
 STOCHASTIC_D = Indicators.STOCHASTIC_D.name
 SUPERTREND = Indicators.SUPERTREND.name
 MOVING_AVERAGE = Indicators.MOVING_AVERAGE.name
+ATR = Indicators.ATR.name
 
 
 def moving_average(window, df):
     if len(df) < window:
         raise ValueError(f"Not enough values in data frames: required {window} and {len(df)} values in")
 
-    df[MOVING_AVERAGE + '_' + str(window)] = ta.sma(df['HA_close'], length=window)
+    df[MOVING_AVERAGE + '_' + str(window)] = sma(df['HA_close'].values, window)
 
 
 def stochastic(k_period, d_period, smooth_k, df):
     if not {'HA_high', 'HA_low', 'HA_close'}.issubset(df.columns):
         raise ValueError("DataFrame must contain 'High', 'Low', and 'Close' columns")
 
-        # Calculate the Stochastic Oscillator
-    stochastic_values = ta.stoch(high=df['HA_high'], low=df['HA_low'], close=df['HA_close'], k=k_period, d=d_period, smoothK=smooth_k)
+    stoch_k, stoch_d = IndicatorKernels(df['HA_high'].values, df['HA_low'].values, df['HA_close'].values).stochastic(k_period, d_period, smooth_k)
 
     suffix = str(k_period) + '_' + str(d_period) + '_' + str(smooth_k)
 
     # Add the Stochastic Oscillator to the DataFrame
-    df[STOCHASTIC_K + '_' + suffix] = stochastic_values['STOCHk_' + suffix]
-    df[STOCHASTIC_D + '_' + suffix] = stochastic_values['STOCHd_' + suffix]
+    df[STOCHASTIC_K + '_' + suffix] = stoch_k
+    df[STOCHASTIC_D + '_' + suffix] = stoch_d
 
 
 def supertrend(period, multiplier, df):
     if not {'HA_high', 'HA_low', 'HA_close'}.issubset(df.columns):
         raise ValueError("DataFrame must contain 'High', 'Low', and 'Close' columns")
 
-    # Calculate the Supertrend
-    _supertrend = ta.supertrend(high=df['HA_high'], low=df['HA_low'], close=df['HA_close'], length=period, multiplier=multiplier)
-
-    # Correctly format the column name to match pandas_ta output
-    formatted_col_name = 'SUPERT_' + str(period) + '_' + f"{multiplier:.1f}"
-
     suffix = str(period) + '_' + str(multiplier)
 
     # Add the Supertrend to the DataFrame
-    df[SUPERTREND + '_' + suffix] = _supertrend[formatted_col_name]
+    df[SUPERTREND + '_' + suffix] = IndicatorKernels(df['HA_high'].values, df['HA_low'].values, df['HA_close'].values).supertrend(period, multiplier)
 
 
 def average_true_range(length, df):
     if not {'HA_high', 'HA_low', 'HA_close'}.issubset(df.columns):
         raise ValueError("DataFrame must contain 'High', 'Low', and 'Close' columns")
 
-    df['ATR' + '_' + str(length)] = ta.atr(high=df['HA_high'], low=df['HA_low'], close=df['HA_close'], length=length)
+    df[ATR + '_' + str(length)] = IndicatorKernels(df['HA_high'].values, df['HA_low'].values, df['HA_close'].values).atr(length)
+
+
+# Numpy kernels: same values of the pandas_ta 0.3.14b functions previously used (sma, stoch, supertrend, atr)
+
+_FILTER_BLOCK = 64
+
+
+def linear_filter(values: np.ndarray, decay: float) -> np.ndarray:
+    """
+    Solves y[t] = values[t] + decay * y[t - 1] (y[-1] = 0, 0 <= decay < 1) without a Python loop over the values:
+    inside blocks of up to 64 values the response is a scaled cumulative sum, and the values carried between
+    blocks follow the same recurrence with decay^block, solved recursively.
+    """
+    n = len(values)
+    if n == 0 or decay < 2 ** -53:
+        # Contributo dei valori precedenti sotto la precisione di un float64
+        return np.array(values, dtype=float)
+    # Blocchi abbastanza corti da non far sparire decay^k in underflow
+    block = max(1, min(_FILTER_BLOCK, int(1000 / -math.log2(decay))))
+    blocks = -(-n // block)
+    padded = np.zeros(blocks * block)
+    padded[:n] = values
+    padded = padded.reshape(blocks, block)
+    powers = decay ** np.arange(block, dtype=float)
+    response = np.cumsum(padded / powers, axis=1)
+    response *= powers
+    if blocks > 1:
+        # Valore alla fine di ogni blocco, propagato nei blocchi successivi
+        carry = linear_filter(response[:-1, -1], decay ** block)
+        response[1:] += carry[:, None] * (powers * decay)
+    return response.ravel()[:n]
+
+
+def sma(values: np.ndarray, length: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Simple moving average, NaN until length values (after the leading NaNs) are available."""
+    n = len(values)
+    out = np.empty(n) if out is None else out
+    out.fill(np.nan)
+    start = _first_valid(values)
+    if n - start >= length:
+        np.add.reduce(sliding_window_view(values[start:], length), axis=1, out=out[start + length - 1:])
+        out[start + length - 1:] /= length
+    return out
+
+
+def rma(values: np.ndarray, length: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Wilder's moving average as pandas_ta.rma: adjusted exponential mean with alpha 1 / length, min_periods length."""
+    n = len(values)
+    out = np.empty(n) if out is None else out
+    out.fill(np.nan)
+    start = _first_valid(values)
+    if n - start >= length:
+        decay = 1.0 - 1.0 / length
+        weighted_sum = linear_filter(values[start:], decay)
+        # Somma dei pesi: 1 + decay + ... + decay^t
+        weights = (1.0 - decay ** np.arange(1, n - start + 1, dtype=float)) / (1.0 - decay) if decay else np.ones(n - start)
+        np.divide(weighted_sum[length - 1:], weights[length - 1:], out=out[start + length - 1:])
+    return out
+
+
+def _first_valid(values: np.ndarray) -> int:
+    valid = np.flatnonzero(~np.isnan(values))
+    return int(valid[0]) if len(valid) else len(values)
+
+
+class IndicatorKernels:
+    """
+    Numpy indicator kernels on a high/low/close series. Intermediates shared by several indicators (true range,
+    ATR of each length, median price, rolling highest high and lowest low) are computed once and kept.
+    Every output is a new float64 array unless a preallocated one is passed as out.
+    """
+
+    def __init__(self, high: np.ndarray, low: np.ndarray, close: np.ndarray):
+        self.high = np.asarray(high, dtype=float)
+        self.low = np.asarray(low, dtype=float)
+        self.close = np.asarray(close, dtype=float)
+        self._true_range: Optional[np.ndarray] = None
+        self._hl2: Optional[np.ndarray] = None
+        self._atr: Dict[int, np.ndarray] = {}
+        self._extremes: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @property
+    def true_range(self) -> np.ndarray:
+        if self._true_range is None:
+            high, low, close = self.high, self.low, self.close
+            true_range = np.empty(len(close))
+            if len(close) > 0:
+                prev_close = close[:-1]
+                tail = true_range[1:]
+                np.subtract(high[1:], low[1:], out=tail)
+                np.maximum(tail, np.abs(high[1:] - prev_close), out=tail)
+                np.maximum(tail, np.abs(prev_close - low[1:]), out=tail)
+                true_range[0] = np.nan
+            self._true_range = true_range
+        return self._true_range
+
+    @property
+    def hl2(self) -> np.ndarray:
+        if self._hl2 is None:
+            self._hl2 = (self.high + self.low) / 2
+        return self._hl2
+
+    def _atr_values(self, length: int) -> np.ndarray:
+        atr = self._atr.get(length)
+        if atr is None:
+            atr = self._atr[length] = rma(self.true_range, length)
+        return atr
+
+    def atr(self, length: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        atr = self._atr_values(length)
+        if out is not None:
+            out[:] = atr
+            return out
+        return atr.copy()
+
+    def supertrend(self, period: int, multiplier: float, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Supertrend line: the final bands follow the trend direction, so the last step is sequential."""
+        n = len(self.close)
+        out = np.empty(n) if out is None else out
+        if n == 0:
+            return out
+        band_width = multiplier * self._atr_values(period)
+        upper_bands = (self.hl2 + band_width).tolist()
+        lower_bands = (self.hl2 - band_width).tolist()
+        closes = self.close.tolist()
+        trend = [0.0] * n
+        direction = 1
+        prev_upper, prev_lower = upper_bands[0], lower_bands[0]
+        # Confronti con NaN (ATR non ancora disponibile) falsi come in pandas_ta; il primo valore è 0
+        for i in range(1, n):
+            close, upper, lower = closes[i], upper_bands[i], lower_bands[i]
+            if close > prev_upper:
+                direction = 1
+            elif close < prev_lower:
+                direction = -1
+            else:
+                if direction > 0 and lower < prev_lower:
+                    lower = prev_lower
+                if direction < 0 and upper > prev_upper:
+                    upper = prev_upper
+            trend[i] = lower if direction > 0 else upper
+            prev_upper, prev_lower = upper, lower
+        out[:] = trend
+        return out
+
+    def _rolling_extremes(self, k_period: int) -> Tuple[np.ndarray, np.ndarray]:
+        extremes = self._extremes.get(k_period)
+        if extremes is None:
+            n = len(self.close)
+            highest_high, lowest_low = np.full(n, np.nan), np.full(n, np.nan)
+            if n >= k_period:
+                np.max(sliding_window_view(self.high, k_period), axis=1, out=highest_high[k_period - 1:])
+                np.min(sliding_window_view(self.low, k_period), axis=1, out=lowest_low[k_period - 1:])
+            extremes = self._extremes[k_period] = (highest_high, lowest_low)
+        return extremes
+
+    def stochastic(self, k_period: int, d_period: int, smooth_k: int,
+                   out_k: Optional[np.ndarray] = None, out_d: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Stochastic %K (raw stochastic smoothed over smooth_k bars) and %D (%K smoothed over d_period bars)."""
+        highest_high, lowest_low = self._rolling_extremes(k_period)
+        price_range = highest_high - lowest_low
+        if np.any(price_range == 0):
+            # Come pandas_ta (non_zero_range): epsilon aggiunto a tutto l'intervallo se uno è nullo
+            price_range += sys.float_info.epsilon
+        raw = self.close - lowest_low
+        raw *= 100
+        raw /= price_range
+        stoch_k = sma(raw, smooth_k, out_k)
+        return stoch_k, sma(stoch_k, d_period, out_d)
+
+# Heikin-Ashi
+
+# Lunghezza dei blocchi della scansione: 2^-64 è sotto la precisione di un float64
+_HA_BLOCK = 64
+_HA_WEIGHTS = np.exp2(np.arange(_HA_BLOCK, dtype=float))
+
+
+def _point_decimals(point: float) -> int:
+    # Stessa precisione di round_to_point
+    return abs(int(math.log10(point)))
+
+
+def heikin_ashi_open(first_open: float, ha_close: np.ndarray) -> np.ndarray:
+    """
+    Unrounded HA_open series: HA_open[0] = first_open, HA_open[i] = (HA_open[i - 1] + HA_close[i - 1]) / 2.
+
+    The recurrence is a first-order linear filter, solved in blocks of 64 bars: inside a block the response
+    to the previous HA_close values is a scaled cumulative sum, and the contribution of the value carried
+    into a block decays by 2^-64 across it, so the carries of all blocks are computed at once too.
+    """
+    n = len(ha_close)
+    if n == 0:
+        return np.zeros(0)
+    ha_open = np.empty(n)
+    ha_open[0] = first_open
+    inputs = 0.5 * ha_close[:-1]
+    if len(inputs) == 0:
+        return ha_open
+
+    blocks = -(-len(inputs) // _HA_BLOCK)
+    padded = np.zeros(blocks * _HA_BLOCK)
+    padded[:len(inputs)] = inputs
+    padded = padded.reshape(blocks, _HA_BLOCK)
+    # Risposta di ogni blocco partendo da zero: y[k] = sum(0.5^(k - m) * u[m]) per m <= k
+    local = np.cumsum(padded * _HA_WEIGHTS, axis=1) / _HA_WEIGHTS
+
+    # Valore entrante in ogni blocco: fine del blocco precedente, più il suo valore entrante attenuato di 2^-64
+    carry = np.empty(blocks)
+    carry[0] = first_open
+    if blocks > 1:
+        carry[1:] = local[:-1, -1]
+        carry[1] += first_open * 0.5 ** _HA_BLOCK
+        carry[2:] += local[:-2, -1] * 0.5 ** _HA_BLOCK
+    values = local + carry[:, None] * (0.5 / _HA_WEIGHTS)
+    ha_open[1:] = values.ravel()[:len(inputs)]
+    return ha_open
+
+
+def heikin_ashi(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray, point: float) -> np.ndarray:
+    """
+    Heikin-Ashi candles rounded to the symbol point, as rows HA_open, HA_high, HA_low and HA_close of a 4 x n array.
+    HA_high and HA_low are computed on the unrounded HA values, then all the rows are rounded together.
+    """
+    ha = np.empty((4, len(close)))
+    ha_close = ha[3]
+    np.add(open_, high, out=ha_close)
+    ha_close += low
+    ha_close += close
+    ha_close /= 4
+    if len(close) > 0:
+        ha[0] = heikin_ashi_open((open_[0] + close[0]) / 2, ha_close)
+    np.maximum(np.maximum(ha[0], ha_close), high, out=ha[1])
+    np.minimum(np.minimum(ha[0], ha_close), low, out=ha[2])
+    return np.round(ha, _point_decimals(point), out=ha)
+
+
+# Incremental indicators: same results as the batch kernels above, updated in O(1) per closed bar
+
+class RollingMean:
+    """Simple moving average over the last length values, NaN until length values were seen."""
+
+    def __init__(self, length: int):
+        self.length = length
+        self._values: Deque[float] = deque()
+        self._sum = 0.0
+
+    def update(self, value: float) -> float:
+        self._values.append(value)
+        self._sum += value
+        if len(self._values) > self.length:
+            self._sum -= self._values.popleft()
+        return self._sum / self.length if len(self._values) == self.length else math.nan
+
+
+class IncrementalATR:
+    """
+    Average true range smoothed with Wilder's RMA, computed as pandas_ta.atr does: an adjusted exponential
+    mean (alpha 1 / length) of the true range, NaN for the first length bars.
+    """
+
+    def __init__(self, length: int):
+        self.length = length
+        self._decay = 1.0 - 1.0 / length
+        self._weighted_sum = 0.0
+        self._weights = 0.0
+        self._count = 0
+        self._prev_close: Optional[float] = None
+
+    def update(self, high: float, low: float, close: float) -> float:
+        prev_close = self._prev_close
+        self._prev_close = close
+        if prev_close is None:
+            # Il true range della prima barra non è definito
+            return math.nan
+        true_range = max(high - low, abs(high - prev_close), abs(prev_close - low))
+        self._weighted_sum = true_range + self._decay * self._weighted_sum
+        self._weights = 1.0 + self._decay * self._weights
+        self._count += 1
+        return self._weighted_sum / self._weights if self._count >= self.length else math.nan
+
+
+class IncrementalSupertrend:
+    """Supertrend line of pandas_ta.supertrend, keeping the trend direction and the last final bands."""
+
+    def __init__(self, period: int, multiplier: float):
+        self.multiplier = multiplier
+        self._atr = IncrementalATR(period)
+        self._direction = 1
+        self._upper_band: Optional[float] = None
+        self._lower_band: Optional[float] = None
+
+    def update(self, high: float, low: float, close: float) -> float:
+        hl2 = (high + low) / 2
+        band_width = self.multiplier * self._atr.update(high, low, close)
+        upper_band = hl2 + band_width
+        lower_band = hl2 - band_width
+        prev_upper_band, prev_lower_band = self._upper_band, self._lower_band
+        self._upper_band, self._lower_band = upper_band, lower_band
+        if prev_upper_band is None:
+            # Come pandas_ta: il valore della prima barra è 0
+            return 0.0
+
+        # Confronti con NaN (ATR non ancora disponibile) falsi come in pandas_ta
+        if close > prev_upper_band:
+            self._direction = 1
+        elif close < prev_lower_band:
+            self._direction = -1
+        else:
+            if self._direction > 0 and lower_band < prev_lower_band:
+                self._lower_band = lower_band = prev_lower_band
+            if self._direction < 0 and upper_band > prev_upper_band:
+                self._upper_band = upper_band = prev_upper_band
+        return lower_band if self._direction > 0 else upper_band
+
+
+class IncrementalStochastic:
+    """
+    Stochastic oscillator %K and %D of pandas_ta.stoch: highest high and lowest low of the last k_period
+    bars are kept in monotonic deques, %K and %D are simple moving averages of the raw and the %K values.
+    """
+
+    def __init__(self, k_period: int, d_period: int, smooth_k: int):
+        self.k_period = k_period
+        self._index = 0
+        # Coppie (indice, valore) con valori decrescenti (massimi) e crescenti (minimi)
+        self._highs: Deque[Tuple[int, float]] = deque()
+        self._lows: Deque[Tuple[int, float]] = deque()
+        self._k_mean = RollingMean(smooth_k)
+        self._d_mean = RollingMean(d_period)
+
+    def update(self, high: float, low: float, close: float) -> Tuple[float, float]:
+        index = self._index
+        self._index += 1
+        while self._highs and self._highs[-1][1] <= high:
+            self._highs.pop()
+        self._highs.append((index, high))
+        if self._highs[0][0] <= index - self.k_period:
+            self._highs.popleft()
+        while self._lows and self._lows[-1][1] >= low:
+            self._lows.pop()
+        self._lows.append((index, low))
+        if self._lows[0][0] <= index - self.k_period:
+            self._lows.popleft()
+        if index < self.k_period - 1:
+            return math.nan, math.nan
+
+        highest_high, lowest_low = self._highs[0][1], self._lows[0][1]
+        price_range = highest_high - lowest_low
+        raw_k = 100 * (close - lowest_low) / price_range if price_range != 0 else 0.0
+        k_value = self._k_mean.update(raw_k)
+        if math.isnan(k_value):
+            return math.nan, math.nan
+        return k_value, self._d_mean.update(k_value)
+
+
+class IndicatorEngine:
+    """
+    Computes a set of incremental indicators on the closed candles of a rolling window.
+
+    The indicators are seeded once over the whole window; on later windows only the candles after the last
+    processed one are fed to them, and the output columns are rebuilt from the stored outputs. The engine
+    is seeded again when the window does not contain the last processed candle (e.g. after a gap).
+    """
+
+    def __init__(self, high: str = 'HA_high', low: str = 'HA_low', close: str = 'HA_close', time: str = 'time_open'):
+        self.high, self.low, self.close, self.time = high, low, close, time
+        self._factories: List[Tuple[Tuple[str, ...], Callable[[], Any]]] = []
+        self._indicators: List[Tuple[Tuple[str, ...], Any]] = []
+        self._outputs: Dict[str, List[float]] = {}
+        self._last_time = None
+        self.counters: Dict[str, int] = {"seeds": 0, "updates": 0}
+
+    def add(self, columns: Tuple[str, ...], factory: Callable[[], Any]) -> 'IndicatorEngine':
+        """Adds an indicator whose update returns one value per column (a scalar for a single column)."""
+        self._factories.append((columns, factory))
+        return self
+
+    def _seed(self):
+        self._indicators = [(columns, factory()) for columns, factory in self._factories]
+        self._outputs = {column: [] for columns, _ in self._factories for column in columns}
+        self._last_time = None
+        self.counters["seeds"] += 1
+
+    def _feed(self, highs: List[float], lows: List[float], closes: List[float]):
+        for columns, indicator in self._indicators:
+            update = indicator.update
+            if len(columns) == 1:
+                output = self._outputs[columns[0]]
+                output.extend([update(h, l, c) for h, l, c in zip(highs, lows, closes)])
+            else:
+                values = [update(h, l, c) for h, l, c in zip(highs, lows, closes)]
+                for position, column in enumerate(columns):
+                    self._outputs[column].extend([value[position] for value in values])
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Adds the indicator columns to the candles frame, feeding the indicators only with the new candles."""
+        times = df[self.time].values
+        start = 0
+        if self._last_time is not None:
+            position = int(np.searchsorted(times, self._last_time))
+            stored = len(next(iter(self._outputs.values()), []))
+            if position < len(times) and times[position] == self._last_time and stored >= position + 1:
+                start = position + 1
+        if start == 0:
+            self._seed()
+        else:
+            self.counters["updates"] += 1
+
+        if start < len(df):
+            self._feed(df[self.high].values[start:].tolist(), df[self.low].values[start:].tolist(), df[self.close].values[start:].tolist())
+            self._last_time = times[-1]
+
+        rows = len(df)
+        for column, output in self._outputs.items():
+            if len(output) > 2 * rows:
+                del output[:-rows]
+            df[column] = np.array(output[-rows:], dtype=float) if rows else np.zeros(0)
+        return df
@@ -0,0 +1,66 @@
+"""
+heikin_ashi against the row loop previously used by the agent (same rounded values), at 1k, 10k and 100k bars.
+
+    python tests/benchmarks/bench_heikin_ashi.py [bars ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+import pandas as pd
+
+from misc_utils.utils_functions import round_to_point
+from strategies.indicators import heikin_ashi
+
+POINT = 0.00001
+COLUMNS = ('HA_open', 'HA_high', 'HA_low', 'HA_close')
+
+
+def heikin_ashi_loop(df: pd.DataFrame, point: float) -> pd.DataFrame:
+    df['HA_close'] = (df['open'] + df['high'] + df['low'] + df['close']) / 4
+    ha_open = [(df['open'][0] + df['close'][0]) / 2]
+    for i in range(1, len(df)):
+        ha_open.append((ha_open[i - 1] + df['HA_close'].iloc[i - 1]) / 2)
+    df['HA_open'] = pd.Series(ha_open, index=df.index)
+    df['HA_high'] = df[['HA_open', 'HA_close', 'high']].max(axis=1)
+    df['HA_low'] = df[['HA_open', 'HA_close', 'low']].min(axis=1)
+    for column in COLUMNS:
+        df[column] = round_to_point(df[column], point)
+    return df
+
+
+def candles(n: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = np.round(1.1 + np.cumsum(rng.normal(0, 0.0008, n)), 5)
+    open_ = np.round(np.r_[close[0], close[:-1]], 5)
+    high = np.round(np.maximum(open_, close) + rng.random(n) * 0.0005, 5)
+    low = np.round(np.minimum(open_, close) - rng.random(n) * 0.0005, 5)
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close})
+
+
+def best_of(repeat: int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench(n: int):
+    df = candles(n)
+    open_, high, low, close = (df[column].values for column in ('open', 'high', 'low', 'close'))
+    loop_time = best_of(1 if n >= 100000 else 3, lambda: heikin_ashi_loop(df.copy(), POINT))
+    vector_time = best_of(20, lambda: heikin_ashi(open_, high, low, close, POINT))
+    expected = heikin_ashi_loop(df.copy(), POINT)
+    ha = heikin_ashi(open_, high, low, close, POINT)
+    mismatches = sum(int(np.count_nonzero(ha[row] != expected[column].values)) for row, column in enumerate(COLUMNS))
+    print(f"{n:>7} bars: loop {loop_time * 1e3:10.1f} ms | heikin_ashi {vector_time * 1e3:8.3f} ms | x{loop_time / vector_time:7.0f} | mismatches {mismatches}/{4 * n}")
+
+
+if __name__ == '__main__':
+    for bars in [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]:
+        bench(bars)
@@ -0,0 +1,83 @@
+"""
+Per-bar cost of the incremental indicators against a batch recompute of the window, with the parameters of the
+Adrastea strategy.
+
+    python tests/benchmarks/bench_indicators.py [window ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+import pandas as pd
+
+from strategies.indicators import (average_true_range, stochastic, supertrend, IncrementalATR, IncrementalStochastic, IncrementalSupertrend,
+                                   IndicatorEngine)
+
+BARS = 20000
+
+
+def candles(n: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = np.round(1.1 + np.cumsum(rng.normal(0, 0.0008, n)), 5)
+    open_ = np.round(np.r_[close[0], close[:-1]], 5)
+    high = np.round(np.maximum(open_, close) + rng.random(n) * 0.0005, 5)
+    low = np.round(np.minimum(open_, close) - rng.random(n) * 0.0005, 5)
+    times = (1_700_000_000 // 900 * 900 + np.arange(n) * 900).astype('datetime64[s]')
+    return pd.DataFrame({'time_open': times, 'HA_high': high, 'HA_low': low, 'HA_close': close})
+
+
+def engine() -> IndicatorEngine:
+    return IndicatorEngine() \
+        .add(('SUPERTREND_10_1',), lambda: IncrementalSupertrend(10, 1)) \
+        .add(('SUPERTREND_40_3',), lambda: IncrementalSupertrend(40, 3)) \
+        .add(('STOCHASTIC_K_24_5_3', 'STOCHASTIC_D_24_5_3'), lambda: IncrementalStochastic(24, 5, 3)) \
+        .add(('ATR_5',), lambda: IncrementalATR(5)) \
+        .add(('ATR_2',), lambda: IncrementalATR(2))
+
+
+def batch(df: pd.DataFrame):
+    supertrend(10, 1, df)
+    supertrend(40, 3, df)
+    stochastic(24, 5, 3, df)
+    average_true_range(5, df)
+    average_true_range(2, df)
+
+
+def bench_updates(df: pd.DataFrame):
+    rows = list(zip(df['HA_high'].tolist(), df['HA_low'].tolist(), df['HA_close'].tolist()))
+    for name, indicator in (('IncrementalATR(5)', IncrementalATR(5)), ('IncrementalSupertrend(40, 3)', IncrementalSupertrend(40, 3)),
+                            ('IncrementalStochastic(24, 5, 3)', IncrementalStochastic(24, 5, 3))):
+        update = indicator.update
+        start = time.perf_counter()
+        for row in rows:
+            update(*row)
+        print(f"{name:<32} {(time.perf_counter() - start) / len(rows) * 1e6:8.2f} us/bar")
+
+
+def bench_window(full: pd.DataFrame, window: int, bars: int = 200):
+    # Engine: seed sulla prima finestra, poi una candela nuova per chiamata
+    incremental = engine()
+    incremental.apply(full.iloc[:window].reset_index(drop=True))
+    frames = [full.iloc[end - window:end].reset_index(drop=True) for end in range(window + 1, window + bars + 1)]
+    start = time.perf_counter()
+    for df in frames:
+        incremental.apply(df)
+    engine_time = (time.perf_counter() - start) / bars
+
+    frames = [df[['time_open', 'HA_high', 'HA_low', 'HA_close']].copy() for df in frames[:20]]
+    start = time.perf_counter()
+    for df in frames:
+        batch(df)
+    batch_time = (time.perf_counter() - start) / len(frames)
+    print(f"window {window:>6}: IndicatorEngine.apply {engine_time * 1e3:8.3f} ms/bar | batch recompute {batch_time * 1e3:8.3f} ms/bar | x{batch_time / engine_time:.1f}")
+
+
+if __name__ == '__main__':
+    windows = [int(arg) for arg in sys.argv[1:]] or [1000, 5000, 10000]
+    data = candles(BARS)
+    bench_updates(data)
+    for size in windows:
+        bench_window(data, size)
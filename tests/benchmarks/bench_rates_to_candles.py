@@ -0,0 +1,86 @@
+"""
+Time and allocations of MT5Broker._rates_to_candles against the DataFrame conversion previously used by
+get_last_candles, at 1k, 10k and 100k bars.
+
+    python tests/benchmarks/bench_rates_to_candles.py [bars ...]
+"""
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+import pandas as pd
+
+try:
+    import MetaTrader5  # noqa: F401
+except ImportError:
+    from emulator import mt5_module
+    mt5_module.install()
+
+from brokers.mt5_broker import MT5Broker
+from emulator.market_data import RATES_DTYPE
+from misc_utils.enums import Timeframe
+from misc_utils.utils_functions import now_utc
+
+TIMEFRAME = Timeframe.M15
+TIMEZONE_OFFSET = 2
+
+
+def dataframe_conversion(rates: np.ndarray, timeframe: Timeframe, timezone_offset: int, count: int) -> pd.DataFrame:
+    df = pd.DataFrame(rates)
+    df['time_open'] = pd.to_datetime(df['time'], unit='s')
+    df.drop(columns=['time'], inplace=True)
+    df['time_close'] = df['time_open'] + pd.to_timedelta(timeframe.to_seconds(), unit='s')
+    df['time_open_broker'] = df['time_open']
+    df['time_close_broker'] = df['time_close']
+    df['time_open'] -= pd.to_timedelta(timezone_offset, unit='h')
+    df['time_close'] -= pd.to_timedelta(timezone_offset, unit='h')
+    columns_order = ['time_open', 'time_close', 'time_open_broker', 'time_close_broker']
+    df = df[columns_order + [col for col in df.columns if col not in columns_order]]
+    if now_utc() < df.iloc[-1]['time_close']:
+        df = df.iloc[:-1]
+    return df.iloc[-count:].reset_index(drop=True)
+
+
+def rates(n: int) -> np.ndarray:
+    values = np.zeros(n + 1, dtype=RATES_DTYPE)
+    last_open = int(time.time()) // TIMEFRAME.to_seconds() * TIMEFRAME.to_seconds()
+    values['time'] = last_open + TIMEZONE_OFFSET * 3600 - TIMEFRAME.to_seconds() * np.arange(n, -1, -1)
+    values['close'] = 1.1 + np.random.default_rng(n).normal(0, 1e-4, n + 1).cumsum()
+    values['open'], values['high'], values['low'] = values['close'], values['close'] + 1e-4, values['close'] - 1e-4
+    return values
+
+
+def measure(function, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def bench(broker: MT5Broker, n: int):
+    source = rates(n)
+    repeat = 20 if n < 100000 else 5
+    new_time, new_peak = measure(lambda: broker._rates_to_candles(source, TIMEFRAME, TIMEZONE_OFFSET, n), repeat)
+    old_time, old_peak = measure(lambda: dataframe_conversion(source, TIMEFRAME, TIMEZONE_OFFSET, n), repeat)
+    candles = broker._rates_to_candles(source, TIMEFRAME, TIMEZONE_OFFSET, n)
+    shared = all(np.shares_memory(candles[name].values, source) for name in ('open', 'high', 'low', 'close'))
+    print(f"{n:>7} bars: _rates_to_candles {new_time * 1e3:7.3f} ms, peak {new_peak / 1024:8.0f} KiB | "
+          f"DataFrame conversion {old_time * 1e3:7.3f} ms, peak {old_peak / 1024:8.0f} KiB | rates {source.nbytes / 1024:.0f} KiB, prices shared {shared}")
+
+
+if __name__ == '__main__':
+    mt5_broker = MT5Broker.__new__(MT5Broker)
+    mt5_broker.logger = logging.getLogger("bench_rates_to_candles")
+    for bars in [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]:
+        bench(mt5_broker, bars)
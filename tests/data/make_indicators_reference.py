@@ -0,0 +1,128 @@
+"""
+Generates indicators_reference.csv: Heikin-Ashi high/low/close of a random walk (with a flat stretch, to hit the
+zero ranges) and the outputs of pandas_ta 0.3.14b sma, stoch, supertrend and atr on them, with the parameters of
+the Adrastea strategy.
+
+The reference functions below follow the pandas_ta 0.3.14b sources (no TA-Lib); when pandas_ta is installed its
+outputs are checked against them before writing the file.
+
+    python tests/data/make_indicators_reference.py
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'indicators_reference.csv')
+
+SUPERTRENDS = ((10, 1), (40, 3))
+STOCHASTICS = ((24, 5, 3),)
+ATR_LENGTHS = (5, 2)
+MOVING_AVERAGES = (50,)
+
+
+def non_zero_range(high, low):
+    diff = high - low
+    if diff.eq(0).any().any():
+        diff += sys.float_info.epsilon
+    return diff
+
+
+def sma(close, length):
+    return close.rolling(length, min_periods=length).mean()
+
+
+def atr(high, low, close, length):
+    prev_close = close.shift(1)
+    true_range = pd.concat([non_zero_range(high, low), high - prev_close, prev_close - low], axis=1).abs().max(axis=1)
+    true_range.iloc[:1] = np.nan
+    return true_range.ewm(alpha=1 / length, min_periods=length).mean()
+
+
+def supertrend(high, low, close, length, multiplier):
+    hl2 = 0.5 * (high + low)
+    matr = multiplier * atr(high, low, close, length)
+    upperband, lowerband = hl2 + matr, hl2 - matr
+    m = close.size
+    direction, trend = [1] * m, [0] * m
+    for i in range(1, m):
+        if close.iloc[i] > upperband.iloc[i - 1]:
+            direction[i] = 1
+        elif close.iloc[i] < lowerband.iloc[i - 1]:
+            direction[i] = -1
+        else:
+            direction[i] = direction[i - 1]
+            if direction[i] > 0 and lowerband.iloc[i] < lowerband.iloc[i - 1]:
+                lowerband.iloc[i] = lowerband.iloc[i - 1]
+            if direction[i] < 0 and upperband.iloc[i] > upperband.iloc[i - 1]:
+                upperband.iloc[i] = upperband.iloc[i - 1]
+        trend[i] = lowerband.iloc[i] if direction[i] > 0 else upperband.iloc[i]
+    return pd.Series(trend, index=close.index, dtype=float)
+
+
+def stoch(high, low, close, k, d, smooth_k):
+    lowest_low, highest_high = low.rolling(k).min(), high.rolling(k).max()
+    values = 100 * (close - lowest_low)
+    values /= non_zero_range(highest_high, lowest_low)
+    stoch_k = sma(values.loc[values.first_valid_index():], smooth_k)
+    stoch_d = sma(stoch_k.loc[stoch_k.first_valid_index():], d)
+    return stoch_k.reindex(close.index), stoch_d.reindex(close.index)
+
+
+def candles(n: int = 400, seed: int = 20240101) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = np.round(1.1 + np.cumsum(rng.normal(0, 0.0008, n)), 5)
+    open_ = np.round(np.r_[close[0], close[:-1]], 5)
+    high = np.round(np.maximum(open_, close) + rng.random(n) * 0.0005, 5)
+    low = np.round(np.minimum(open_, close) - rng.random(n) * 0.0005, 5)
+    # Tratto piatto: intervalli nulli per true range e stocastico
+    open_[150:185] = high[150:185] = low[150:185] = close[150:185] = close[149]
+
+    from strategies.indicators import heikin_ashi
+    ha = heikin_ashi(open_, high, low, close, 0.00001)
+    return pd.DataFrame({'HA_high': ha[1], 'HA_low': ha[2], 'HA_close': ha[3]})
+
+
+def reference(df: pd.DataFrame) -> pd.DataFrame:
+    high, low, close = df['HA_high'], df['HA_low'], df['HA_close']
+    out = df.copy()
+    for period, multiplier in SUPERTRENDS:
+        out[f'SUPERTREND_{period}_{multiplier}'] = supertrend(high, low, close, period, multiplier)
+    for k, d, smooth_k in STOCHASTICS:
+        out[f'STOCHASTIC_K_{k}_{d}_{smooth_k}'], out[f'STOCHASTIC_D_{k}_{d}_{smooth_k}'] = stoch(high, low, close, k, d, smooth_k)
+    for length in ATR_LENGTHS:
+        out[f'ATR_{length}'] = atr(high, low, close, length)
+    for window in MOVING_AVERAGES:
+        out[f'MOVING_AVERAGE_{window}'] = sma(close, window)
+    return out
+
+
+def check_pandas_ta(df: pd.DataFrame, out: pd.DataFrame):
+    try:
+        import pandas_ta as ta
+    except ImportError:
+        return
+    high, low, close = df['HA_high'], df['HA_low'], df['HA_close']
+    expected = {}
+    for period, multiplier in SUPERTRENDS:
+        expected[f'SUPERTREND_{period}_{multiplier}'] = ta.supertrend(high=high, low=low, close=close, length=period, multiplier=multiplier)[f'SUPERT_{period}_{multiplier:.1f}']
+    for k, d, smooth_k in STOCHASTICS:
+        values = ta.stoch(high=high, low=low, close=close, k=k, d=d, smoothK=smooth_k)
+        expected[f'STOCHASTIC_K_{k}_{d}_{smooth_k}'] = values[f'STOCHk_{k}_{d}_{smooth_k}']
+        expected[f'STOCHASTIC_D_{k}_{d}_{smooth_k}'] = values[f'STOCHd_{k}_{d}_{smooth_k}']
+    for length in ATR_LENGTHS:
+        expected[f'ATR_{length}'] = ta.atr(high=high, low=low, close=close, length=length)
+    for window in MOVING_AVERAGES:
+        expected[f'MOVING_AVERAGE_{window}'] = ta.sma(close, length=window)
+    for column, values in expected.items():
+        np.testing.assert_allclose(out[column].values, values.reindex(df.index).values, rtol=1e-12, atol=1e-15, equal_nan=True, err_msg=column)
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    frame = candles()
+    result = reference(frame)
+    check_pandas_ta(frame, result)
+    result.to_csv(OUTPUT, index=False, float_format='%.17g')
+    print(f"{len(result)} rows written to {OUTPUT}")
@@ -0,0 +1,99 @@
+import asyncio
+
+from brokers.broker_concurrency import BrokerConcurrencyPolicy, _SymbolGate
+from misc_utils.error_handler import exception_handler
+
+
+def test_cancelled_queued_writer_releases_waiting_readers():
+    async def scenario():
+        gate = _SymbolGate()
+        await gate.acquire_read()
+
+        writer = asyncio.create_task(gate.acquire_write())
+        await asyncio.sleep(0)
+        assert gate.writers_waiting == 1
+
+        reader = asyncio.create_task(gate.acquire_read())
+        await asyncio.sleep(0)
+        assert not reader.done()
+
+        writer.cancel()
+        await asyncio.gather(writer, return_exceptions=True)
+        assert gate.writers_waiting == 0
+
+        # Il reader in coda deve entrare senza attendere un rilascio non correlato
+        await asyncio.wait_for(reader, 1)
+        assert gate.readers == 2
+        assert not gate.writer_active
+
+    asyncio.run(scenario())
+
+
+def test_writer_waits_for_readers_and_blocks_new_ones():
+    async def scenario():
+        gate = _SymbolGate()
+        await gate.acquire_read()
+        writer = asyncio.create_task(gate.acquire_write())
+        await asyncio.sleep(0)
+        reader = asyncio.create_task(gate.acquire_read())
+        await asyncio.sleep(0)
+        assert not writer.done() and not reader.done()
+
+        await gate.release_read()
+        await asyncio.wait_for(writer, 1)
+        assert gate.writer_active and not reader.done()
+
+        await gate.release_write()
+        await asyncio.wait_for(reader, 1)
+        assert gate.readers == 1
+
+    asyncio.run(scenario())
+
+
+class _Request:
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+
+class _Broker:
+    async def get_symbol_price(self, symbol, timeout=None):
+        pass
+
+    async def place_order(self, request):
+        pass
+
+    async def close_position(self, position, comment=None, magic_number=None):
+        pass
+
+    async def get_positions(self, *, symbol=None, magic_number=None):
+        pass
+
+    async def get_broker_name(self):
+        pass
+
+
+def test_resolve_symbol_from_positional_and_keyword_arguments():
+    policy, broker = BrokerConcurrencyPolicy(), _Broker()
+    assert policy.resolve_symbol('get_symbol_price', broker.get_symbol_price, ('EURUSD',), {}) == 'EURUSD'
+    assert policy.resolve_symbol('get_symbol_price', broker.get_symbol_price, (), {'symbol': 'GBPUSD'}) == 'GBPUSD'
+    assert policy.resolve_symbol('get_positions', broker.get_positions, (), {'symbol': 'USDJPY'}) == 'USDJPY'
+    assert policy.resolve_symbol('get_positions', broker.get_positions, (), {}) is None
+    assert policy.resolve_symbol('get_broker_name', broker.get_broker_name, (), {}) is None
+
+
+def test_resolve_symbol_from_request_and_position():
+    policy, broker = BrokerConcurrencyPolicy(), _Broker()
+    assert policy.resolve_symbol('place_order', broker.place_order, (_Request('XAUUSD'),), {}) == 'XAUUSD'
+    assert policy.resolve_symbol('place_order', broker.place_order, (), {'request': _Request('EURUSD')}) == 'EURUSD'
+    assert policy.resolve_symbol('close_position', broker.close_position, (_Request('GBPUSD'), 'comment'), {}) == 'GBPUSD'
+    assert policy.resolve_symbol('close_position', broker.close_position, (object(),), {}) is None
+
+
+def test_resolve_symbol_through_exception_handler():
+    class Broker:
+        @exception_handler
+        async def get_symbol_info(self, symbol):
+            pass
+
+    policy = BrokerConcurrencyPolicy()
+    assert policy.resolve_symbol('get_symbol_info', Broker().get_symbol_info, ('EURUSD',), {}) == 'EURUSD'
@@ -0,0 +1,177 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from misc_utils.utils_functions import round_to_point
+from strategies.indicators import (average_true_range, moving_average, stochastic, supertrend, heikin_ashi, IncrementalATR, IncrementalStochastic,
+                                   IncrementalSupertrend, IndicatorEngine, IndicatorKernels)
+
+# Output di pandas_ta 0.3.14b con i parametri della strategia Adrastea (vedi data/make_indicators_reference.py)
+REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'indicators_reference.csv')
+
+
+@pytest.fixture(scope='module')
+def reference() -> pd.DataFrame:
+    return pd.read_csv(REFERENCE, float_precision='round_trip')
+
+
+@pytest.fixture
+def candles(reference) -> pd.DataFrame:
+    return reference[['HA_high', 'HA_low', 'HA_close']].copy()
+
+
+def assert_same_values(actual: pd.Series, expected: pd.Series):
+    # Stesse righe NaN di riscaldamento, valori uguali a meno degli arrotondamenti
+    np.testing.assert_array_equal(np.isnan(actual.values), np.isnan(expected.values), err_msg=f"NaN rows of {expected.name}")
+    np.testing.assert_allclose(actual.values, expected.values, rtol=1e-9, atol=1e-12, equal_nan=True, err_msg=str(expected.name))
+
+
+@pytest.mark.parametrize('period, multiplier', [(10, 1), (40, 3)])
+def test_supertrend_matches_pandas_ta(candles, reference, period, multiplier):
+    supertrend(period, multiplier, candles)
+    column = f'SUPERTREND_{period}_{multiplier}'
+    assert_same_values(candles[column], reference[column])
+    assert candles[column].iloc[0] == 0
+    assert candles[column].iloc[1:period].isna().all() and not np.isnan(candles[column].iloc[period])
+
+
+def test_stochastic_matches_pandas_ta(candles, reference):
+    stochastic(24, 5, 3, candles)
+    for column, warm_up in (('STOCHASTIC_K_24_5_3', 24 + 3 - 2), ('STOCHASTIC_D_24_5_3', 24 + 3 + 5 - 3)):
+        assert_same_values(candles[column], reference[column])
+        assert candles[column].iloc[:warm_up].isna().all() and not np.isnan(candles[column].iloc[warm_up])
+
+
+@pytest.mark.parametrize('length', [5, 2])
+def test_average_true_range_matches_pandas_ta(candles, reference, length):
+    average_true_range(length, candles)
+    column = f'ATR_{length}'
+    assert_same_values(candles[column], reference[column])
+    assert candles[column].iloc[:length].isna().all() and not np.isnan(candles[column].iloc[length])
+
+
+def test_moving_average_matches_pandas_ta(candles, reference):
+    moving_average(50, candles)
+    assert_same_values(candles['MOVING_AVERAGE_50'], reference['MOVING_AVERAGE_50'])
+    assert candles['MOVING_AVERAGE_50'].iloc[:49].isna().all()
+
+
+def test_moving_average_requires_window_values(candles):
+    with pytest.raises(ValueError):
+        moving_average(len(candles) + 1, candles)
+
+
+# Indicatori incrementali: stessi valori dei kernel batch sulle stesse candele
+
+def random_candles(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = np.round(1.1 + np.cumsum(rng.normal(0, 0.0008, n)), 5)
+    open_ = np.round(np.r_[close[0], close[:-1]], 5)
+    high = np.round(np.maximum(open_, close) + rng.random(n) * 0.0005, 5)
+    low = np.round(np.minimum(open_, close) - rng.random(n) * 0.0005, 5)
+    # Tratto piatto: intervalli nulli
+    high[300:340] = low[300:340] = close[300:340] = close[299]
+    times = (1_700_000_000 // 900 * 900 + np.arange(n) * 900).astype('datetime64[s]')
+    return pd.DataFrame({'time_open': times, 'HA_high': high, 'HA_low': low, 'HA_close': close})
+
+
+def strategy_engine() -> IndicatorEngine:
+    return IndicatorEngine() \
+        .add(('SUPERTREND_10_1',), lambda: IncrementalSupertrend(10, 1)) \
+        .add(('SUPERTREND_40_3',), lambda: IncrementalSupertrend(40, 3)) \
+        .add(('STOCHASTIC_K_24_5_3', 'STOCHASTIC_D_24_5_3'), lambda: IncrementalStochastic(24, 5, 3)) \
+        .add(('ATR_5',), lambda: IncrementalATR(5)) \
+        .add(('ATR_2',), lambda: IncrementalATR(2))
+
+
+def batch_columns(df: pd.DataFrame) -> dict:
+    kernels = IndicatorKernels(df['HA_high'].values, df['HA_low'].values, df['HA_close'].values)
+    stoch_k, stoch_d = kernels.stochastic(24, 5, 3)
+    return {'SUPERTREND_10_1': kernels.supertrend(10, 1), 'SUPERTREND_40_3': kernels.supertrend(40, 3),
+            'STOCHASTIC_K_24_5_3': stoch_k, 'STOCHASTIC_D_24_5_3': stoch_d, 'ATR_5': kernels.atr(5), 'ATR_2': kernels.atr(2)}
+
+
+def assert_same_arrays(actual: np.ndarray, expected: np.ndarray, name: str):
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected), err_msg=f"NaN rows of {name}")
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=name)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental_indicators_match_batch(seed):
+    df = random_candles(2000, seed)
+    rows = list(zip(df['HA_high'].tolist(), df['HA_low'].tolist(), df['HA_close'].tolist()))
+    kernels = IndicatorKernels(df['HA_high'].values, df['HA_low'].values, df['HA_close'].values)
+    for length in (2, 5, 14):
+        atr = IncrementalATR(length)
+        assert_same_arrays(np.array([atr.update(*row) for row in rows]), kernels.atr(length), f'ATR_{length}')
+    for period, multiplier in ((10, 1), (40, 3)):
+        trend = IncrementalSupertrend(period, multiplier)
+        assert_same_arrays(np.array([trend.update(*row) for row in rows]), kernels.supertrend(period, multiplier), f'SUPERTREND_{period}_{multiplier}')
+    stoch = IncrementalStochastic(24, 5, 3)
+    values = np.array([stoch.update(*row) for row in rows])
+    stoch_k, stoch_d = kernels.stochastic(24, 5, 3)
+    assert_same_arrays(values[:, 0], stoch_k, 'STOCHASTIC_K')
+    assert_same_arrays(values[:, 1], stoch_d, 'STOCHASTIC_D')
+
+
+def test_indicator_engine_matches_batch_on_a_rolling_window():
+    full, window = random_candles(1600, 3), 1000
+    engine = strategy_engine()
+    for end in range(window, len(full) + 1):
+        df = full.iloc[end - window:end].reset_index(drop=True)
+        engine.apply(df)
+        if end == window or end % 50 == 0 or end == len(full):
+            # Lo stato degli indicatori parte dal seed: confronto con il batch su tutte le candele elaborate
+            expected = batch_columns(full.iloc[:end])
+            for column, values in expected.items():
+                assert_same_arrays(df[column].values, values[-window:], column)
+    assert engine.counters == {"seeds": 1, "updates": len(full) - window}
+
+
+def test_indicator_engine_seeds_again_after_a_gap():
+    full = random_candles(1200, 4)
+    engine = strategy_engine()
+    engine.apply(full.iloc[:500].reset_index(drop=True))
+    # La finestra successiva non contiene l'ultima candela elaborata
+    df = full.iloc[600:1100].reset_index(drop=True)
+    engine.apply(df)
+    assert engine.counters["seeds"] == 2
+    for column, values in batch_columns(df).items():
+        assert_same_arrays(df[column].values, values, column)
+
+
+# Heikin-Ashi: stessi valori del calcolo a ciclo usato in precedenza dall'agente
+
+def heikin_ashi_loop(df: pd.DataFrame, point: float) -> pd.DataFrame:
+    df['HA_close'] = (df['open'] + df['high'] + df['low'] + df['close']) / 4
+    ha_open = [(df['open'][0] + df['close'][0]) / 2]
+    for i in range(1, len(df)):
+        ha_open.append((ha_open[i - 1] + df['HA_close'].iloc[i - 1]) / 2)
+    df['HA_open'] = pd.Series(ha_open, index=df.index)
+    df['HA_high'] = df[['HA_open', 'HA_close', 'high']].max(axis=1)
+    df['HA_low'] = df[['HA_open', 'HA_close', 'low']].min(axis=1)
+    for column in ('HA_open', 'HA_close', 'HA_high', 'HA_low'):
+        df[column] = round_to_point(df[column], point)
+    return df
+
+
+@pytest.mark.parametrize('point, price', [(0.00001, 1.1), (0.001, 150.0), (0.01, 2000.0)])
+def test_heikin_ashi_matches_loop_implementation(point, price):
+    rng = np.random.default_rng(int(price))
+    n, digits = 3000, round(-np.log10(point))
+    close = np.round(price * (1 + np.cumsum(rng.normal(0, 0.0008, n))), digits)
+    open_ = np.round(np.r_[close[0], close[:-1]], digits)
+    high = np.round(np.maximum(open_, close) + rng.random(n) * price * 0.0005, digits)
+    low = np.round(np.minimum(open_, close) - rng.random(n) * price * 0.0005, digits)
+    expected = heikin_ashi_loop(pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close}), point)
+    ha = heikin_ashi(open_, high, low, close, point)
+    for row, column in enumerate(('HA_open', 'HA_high', 'HA_low', 'HA_close')):
+        np.testing.assert_array_equal(ha[row], expected[column].values, err_msg=column)
+
+
+def test_heikin_ashi_empty_and_single_candle():
+    assert heikin_ashi(np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0), 0.00001).shape == (4, 0)
+    ha = heikin_ashi(np.array([1.1]), np.array([1.2]), np.array([1.0]), np.array([1.15]), 0.00001)
+    np.testing.assert_array_equal(ha[:, 0], [1.125, 1.2, 1.0, 1.1125])
@@ -0,0 +1,68 @@
+import logging
+import time
+
+import numpy as np
+import pytest
+
+try:
+    import MetaTrader5  # noqa: F401
+except ImportError:
+    # Fuori da Windows il modulo dell'emulatore prende il posto di MetaTrader5, come in emulator/__main__.py
+    from emulator import mt5_module
+    mt5_module.install()
+
+from brokers.mt5_broker import MT5Broker
+from emulator.market_data import RATES_DTYPE
+from misc_utils.enums import Timeframe
+
+TIMEZONE_OFFSET = 2
+
+
+@pytest.fixture
+def broker() -> MT5Broker:
+    # Solo la conversione delle rates: nessun terminale, executor o servizio
+    broker = MT5Broker.__new__(MT5Broker)
+    broker.logger = logging.getLogger("test_mt5_broker")
+    return broker
+
+
+def rates(n: int, last_open: int, timeframe: Timeframe = Timeframe.M15) -> np.ndarray:
+    """Broker-time rates of n bars, the last opening at last_open (UTC)."""
+    values = np.zeros(n, dtype=RATES_DTYPE)
+    values['time'] = last_open + TIMEZONE_OFFSET * 3600 - timeframe.to_seconds() * np.arange(n - 1, -1, -1)
+    values['close'] = 1.1 + np.arange(n) * 1e-5
+    values['open'], values['high'], values['low'] = values['close'] - 1e-5, values['close'] + 2e-5, values['close'] - 2e-5
+    values['tick_volume'] = np.arange(n)
+    return values
+
+
+def test_rates_to_candles_shares_memory_with_rates(broker):
+    closed = int(time.time()) // 900 * 900 - 900 * 10
+    source = rates(1000, closed)
+    candles = broker._rates_to_candles(source, Timeframe.M15, TIMEZONE_OFFSET, 500)
+
+    assert len(candles) == 500
+    for name in ('open', 'high', 'low', 'close', 'tick_volume', 'spread', 'real_volume'):
+        assert np.shares_memory(candles[name].values, source), name
+        np.testing.assert_array_equal(candles[name].values, source[name][-500:])
+    # Tempi: int64 dei secondi, letti come datetime64[s] senza conversioni
+    assert candles['time_open_broker'].values.dtype == np.dtype('datetime64[s]')
+    assert candles['time_open'].iloc[-1].timestamp() == closed
+    assert (candles['time_close'] - candles['time_open']).dt.total_seconds().eq(900).all()
+    assert (candles['time_open_broker'] - candles['time_open']).dt.total_seconds().eq(TIMEZONE_OFFSET * 3600).all()
+
+
+def test_rates_to_candles_excludes_the_open_bar(broker):
+    open_bar = int(time.time()) // 900 * 900
+    source = rates(101, open_bar)
+    candles = broker._rates_to_candles(source, Timeframe.M15, TIMEZONE_OFFSET, 100)
+
+    assert len(candles) == 100
+    assert candles['time_open'].iloc[-1].timestamp() == open_bar - 900
+    assert np.shares_memory(candles['close'].values, source)
+
+
+def test_rates_to_candles_with_fewer_rates_than_count(broker):
+    source = rates(10, int(time.time()) // 900 * 900 - 900 * 5)
+    assert len(broker._rates_to_candles(source, Timeframe.M15, TIMEZONE_OFFSET, 50)) == 10
+    assert len(broker._rates_to_candles(source[:0], Timeframe.M15, TIMEZONE_OFFSET, 50)) == 0
@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import brokers.session_calendar as session_calendar
+from brokers.session_calendar import SessionCalendarCache
+
+MARKET_HOURS = {'sessions': [{'day': day, 'start_time': '00:00', 'end_time': '24:00'} for day in ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday')]}
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2024, 1, 3, 12, 0)
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+        self.fail = True
+
+    async def __call__(self, symbol: str):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("MarketHours service not available")
+        return MARKET_HOURS
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(session_calendar, 'now_utc', clock)
+    return clock
+
+
+def test_failed_first_load_is_not_retried_before_the_retry_interval(clock):
+    loader = Loader()
+    cache = SessionCalendarCache("test", loader, retry_interval=timedelta(seconds=30))
+
+    async def scenario():
+        assert await cache.get_calendar('EURUSD') is None
+        clock.now += timedelta(seconds=10)
+        assert await cache.get_calendar('EURUSD') is None
+        assert loader.calls == 1
+
+        clock.now += timedelta(seconds=25)
+        loader.fail = False
+        assert await cache.get_calendar('EURUSD') is not None
+        assert loader.calls == 2
+
+        # Caricato: nessun caricamento fino al refresh_interval
+        assert await cache.get_calendar('EURUSD') is not None
+        assert loader.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_forced_refresh_ignores_the_retry_interval(clock):
+    loader = Loader()
+    cache = SessionCalendarCache("test", loader)
+
+    async def scenario():
+        await cache.refresh('EURUSD')
+        loader.fail = False
+        assert await cache.refresh('EURUSD', force=True) is not None
+        assert loader.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_failed_reload_keeps_the_previous_calendar(clock):
+    loader = Loader()
+    loader.fail = False
+    cache = SessionCalendarCache("test", loader, refresh_interval=timedelta(hours=1))
+
+    async def scenario():
+        calendar = await cache.get_calendar('EURUSD')
+        loader.fail = True
+        clock.now += timedelta(hours=2)
+        assert await cache.get_calendar('EURUSD') is calendar
+        assert await cache.get_calendar('EURUSD') is calendar
+        assert loader.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_callers_share_one_failed_load(clock):
+    loader = Loader()
+    cache = SessionCalendarCache("test", loader)
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_calendar('EURUSD') for _ in range(5)))
+        assert results == [None] * 5
+        assert loader.calls == 1
+
+    asyncio.run(scenario())